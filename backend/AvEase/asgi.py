@@ -2,6 +2,8 @@
 ASGI config for AvEase project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Live event streams (api/events/<link>/stream/) are only served through it,
+e.g. ``uvicorn AvEase.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -12,5 +14,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AvEase.settings')
+# Read by settings.py: no persistent database connections under ASGI
+os.environ.setdefault('DJANGO_ASGI', '1')
 
 application = get_asgi_application()
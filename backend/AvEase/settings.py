@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'myapp.middleware.RequestProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,13 +80,99 @@ WSGI_APPLICATION = 'AvEase.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default, tuned for concurrent availability writes: WAL lets reads
+# run alongside a writer, IMMEDIATE transactions take the write lock up front
+# (so two writers queue on the busy timeout instead of failing with "database
+# is locked" on lock upgrade), and connections are kept open between requests
+# under WSGI. Under ASGI (AvEase/asgi.py sets DJANGO_ASGI) every request runs
+# in its own thread, so persistent connections would pile up, one per thread,
+# and are disabled as Django recommends. Set DATABASE_ENGINE=postgresql (needs
+# psycopg[pool]) to use PostgreSQL with Django's connection pool instead.
+
+ASGI = os.environ.get('DJANGO_ASGI') == '1'
+
+if os.environ.get('DATABASE_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'avease'),
+            'USER': os.environ.get('POSTGRES_USER', 'avease'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # The pool replaces persistent connections, so CONN_MAX_AGE stays 0
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX', 20)),
+                    'timeout': 10,
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': 0 if ASGI else 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                # Seconds a writer waits for the lock (SQLite busy timeout)
+                'timeout': 20,
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA mmap_size=134217728;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
     }
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Event responses are cached per event link and version (see myapp.cache). The
+# file backend is shared by all worker processes on a host without extra services.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'events': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'events',
+        # Version keys and rendered bodies of every active event share this
+        # cache; the default of 300 entries would cull them under real traffic
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
 }
 
+EVENT_CACHE_ALIAS = 'events'
+EVENT_CACHE_TIMEOUT = 300
+# Seconds a version created by a read lives until the read finds its event
+EVENT_VERSION_PROVISIONAL_TIMEOUT = 60
+# Hit / miss counters behind cache-stats/; kept out of the events cache so
+# counting costs no file I/O. With locmem they are per process.
+EVENT_CACHE_STATS_ALIAS = 'default'
+
+# Live updates for events/<link>/stream/ (served by AvEase/asgi.py). The broker
+# fans change messages out to subscribers; swap the class to share across processes.
+EVENT_STREAM_BROKER = 'myapp.pubsub.InProcessBroker'
+EVENT_STREAM_HEARTBEAT = 15
+
+# Change log behind events/<link>/availabilities/?since=<cursor>. Replays longer
+# than CHANGE_LOG_MAX_REPLAY entries get a full snapshot instead; entries older
+# than CHANGE_LOG_RETENTION_HOURS are compacted by `manage.py compact_event_changes`.
+CHANGE_LOG_MAX_REPLAY = 500
+CHANGE_LOG_RETENTION_HOURS = 72
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -103,6 +192,37 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing policy: PASSWORD_HASHER=argon2 (the default when argon2-cffi is
+# installed), scrypt or pbkdf2. The other hashers stay listed so existing hashes
+# still verify; they are rehashed with the preferred one on the next login.
+# Guests (is_registered=False) get unusable passwords and never reach a hasher.
+PREFERRED_PASSWORD_HASHERS = {
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2' if importlib.util.find_spec('argon2') else 'pbkdf2')
+PASSWORD_HASHERS = [PREFERRED_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for hasher in [
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ] if hasher != PREFERRED_PASSWORD_HASHERS[PASSWORD_HASHER]
+]
+
+# Sessions are read from SESSION_CACHE_ALIAS and written through to the database,
+# and the logged-in user is cached there for AUTH_USER_CACHE_TIMEOUT seconds
+# (myapp.authentication.CachedModelBackend), so polling current-user costs no
+# queries. The user is only cached when that cache is shared by all processes
+# (Redis, Memcached, file-based), so password changes, deactivation and logout
+# invalidate everywhere; with the per-process locmem default it is loaded from
+# the database on every request.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['myapp.authentication.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 60
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -151,7 +271,77 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    # Same bytes as DRF's JSONRenderer, encoded with orjson when it is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'myapp.fastpath.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Build event, participant and availability responses from values() rows instead
+# of the DRF serializers (myapp.fastpath); the output is the same.
+FAST_READ_PATH = True
+
+# Weekly availability storage: 'rows' (one WeeklyAvailability row per slot) or
+# 'bitset' (one packed WeeklyAvailabilityMask per participant). Convert existing
+# data with `python manage.py convert_weekly_availability <rows|bitset>`.
+WEEKLY_AVAILABILITY_STORAGE = 'rows'
+WEEKLY_SLOT_MINUTES = 15
+
+# Write-behind buffer for single weekly slot toggles (myapp.writebuffer), bitset
+# storage only: a participant's toggles are written as one update after
+# WEEKLY_WRITE_BUFFER_MS idle, or after WEEKLY_WRITE_BUFFER_MAX_OPS toggles.
+# Buffers are per process; 0 writes every toggle through.
+WEEKLY_WRITE_BUFFER_MS = 0
+WEEKLY_WRITE_BUFFER_MAX_OPS = 64
+
+# Date availability storage: 'rows' (one DateAvailability row per date) or
+# 'ranges' (one DateAvailabilityRange per run of consecutive dates). Convert
+# existing data with `python manage.py convert_date_availability <rows|ranges>`.
+DATE_AVAILABILITY_STORAGE = 'rows'
+
+# Background jobs (myapp.jobs), run by `python manage.py run_jobs`. Event deletes,
+# exports and guest imports are queued when the client sends Prefer: respond-async.
+# Failed jobs are retried after JOB_RETRY_BACKOFF * 2**(attempt - 1) seconds, up to
+# JOB_MAX_ATTEMPTS. A running job's heartbeat is refreshed every JOB_HEARTBEAT_SECONDS;
+# jobs without one for JOB_STALE_SECONDS (their worker died) are requeued.
+JOB_WORKER_THREADS = 4
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 5
+JOB_HEARTBEAT_SECONDS = 60
+JOB_STALE_SECONDS = 600
+JOB_PROGRESS_INTERVAL = 1.0
+JOB_RESULTS_DIR = BASE_DIR / 'job-results'
+
+# Retention for `python manage.py purge_stale`: dated events (date match, RSVP)
+# whose last date is more than EVENT_RETENTION_DAYS ago, guest users left
+# without any event and created more than GUEST_GRACE_HOURS ago, and jobs
+# finished more than JOB_RETENTION_DAYS ago are deleted PURGE_BATCH_SIZE rows
+# per transaction (also the batch size of event deletes through the API).
+EVENT_RETENTION_DAYS = 90
+GUEST_GRACE_HOURS = 24
+JOB_RETENTION_DAYS = 7
+PURGE_BATCH_SIZE = 500
+
+# Request profiling (myapp.middleware): Server-Timing headers and a JSON log line
+# per sampled request. Requests slower than REQUEST_PROFILING_CPROFILE_MS are
+# also dumped as cProfile stats; None turns cProfile off.
+REQUEST_PROFILING_ENABLED = False
+REQUEST_PROFILING_SAMPLE_RATE = 1.0
+REQUEST_PROFILING_SLOWEST = 5
+REQUEST_PROFILING_CPROFILE_MS = None
+REQUEST_PROFILING_CPROFILE_DIR = BASE_DIR / 'profiles'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'myapp.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
 CSRF_COOKIE_SECURE = False
@@ -3,7 +3,8 @@ from django.contrib.auth.admin import UserAdmin
 from .models import (
     CustomUser, Event, Participant,
     WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails, RsvpMultiDayEventDetails,
-    WeeklyAvailability, DateAvailability, RsvpStatus
+    WeeklyAvailability, WeeklyAvailabilityMask, DateAvailability, DateAvailabilityRange, RsvpStatus,
+    EventStats, Job
 )
 
 # Custom User Admin
@@ -62,5 +63,9 @@ class EventAdmin(admin.ModelAdmin):
 
 admin.site.register(Participant)
 admin.site.register(WeeklyAvailability)
+admin.site.register(WeeklyAvailabilityMask)
 admin.site.register(DateAvailability)
-admin.site.register(RsvpStatus)
\ No newline at end of file
+admin.site.register(DateAvailabilityRange)
+admin.site.register(RsvpStatus)
+admin.site.register(EventStats)
+admin.site.register(Job)
@@ -0,0 +1,134 @@
+from collections import defaultdict
+
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce
+
+from . import bitsets, intervals
+from .bitsets import DAY_ORDER
+from .models import Participant, WeeklyAvailability, DateAvailability, RsvpStatus
+from .storage import get_weekly_store, get_date_store
+
+
+def _participant_ids_by_key(queryset, *key_fields):
+    """Group participant ids by the given fields with a single flat query"""
+    grouped = defaultdict(list)
+    for *key, participant_id in queryset.order_by('participant_id').values_list(*key_fields, 'participant_id'):
+        grouped[tuple(key)].append(participant_id)
+    return grouped
+
+
+def _sort_weekly(slots):
+    slots.sort(key=lambda slot: (DAY_ORDER.index(slot['selected_day']), slot['selected_start_time']))
+    return slots
+
+
+def _weekly_heatmap_bitset(event, store):
+    ids = defaultdict(list)
+    masks = store.masks(event.participants.values('id')).order_by('participant_id')
+    for participant_id, slot_minutes, bits in masks.values_list('participant_id', 'slot_minutes', 'bits'):
+        for index in bitsets.iter_bits(bitsets.from_bytes(bits)):
+            ids[bitsets.slot_at(index, slot_minutes)].append(participant_id)
+
+    return _sort_weekly([
+        {
+            'selected_day': day,
+            'selected_start_time': start_time.isoformat(),
+            'count': len(participant_ids),
+            'participant_ids': participant_ids,
+        }
+        for (day, start_time), participant_ids in ids.items()
+    ])
+
+
+def weekly_heatmap(event):
+    """Per (day, start time) slot: number of available participants and their ids"""
+    store = get_weekly_store()
+    if store.packed:
+        return _weekly_heatmap_bitset(event, store)
+
+    rows = WeeklyAvailability.objects.filter(participant__event=event)
+    counts = (
+        rows.values('selected_day', 'selected_start_time')
+        .annotate(count=Count('participant_id'))
+        .order_by()
+    )
+    ids = _participant_ids_by_key(rows, 'selected_day', 'selected_start_time')
+
+    return _sort_weekly([
+        {
+            'selected_day': row['selected_day'],
+            'selected_start_time': row['selected_start_time'].isoformat(),
+            'count': row['count'],
+            'participant_ids': ids[(row['selected_day'], row['selected_start_time'])],
+        }
+        for row in counts
+    ])
+
+
+def _date_heatmap_ranges(event, store):
+    """Sweeps the runs' boundaries, so the work is per run of equal participants rather than per date"""
+    heatmap = []
+    for start, end, participant_ids in intervals.sweep(store.date_ranges(event.participants.values('id'))):
+        participant_ids = sorted(participant_ids)
+        for date in intervals.iter_dates([(start, end)]):
+            heatmap.append({
+                'selected_date': date.isoformat(),
+                'count': len(participant_ids),
+                'participant_ids': participant_ids,
+            })
+    return heatmap
+
+
+def date_heatmap(event):
+    """Per selected date: number of available participants and their ids"""
+    store = get_date_store()
+    if store.packed:
+        return _date_heatmap_ranges(event, store)
+
+    rows = DateAvailability.objects.filter(participant__event=event)
+    counts = rows.values('selected_date').annotate(count=Count('participant_id')).order_by('selected_date')
+    ids = _participant_ids_by_key(rows, 'selected_date')
+
+    return [
+        {
+            'selected_date': row['selected_date'].isoformat(),
+            'count': row['count'],
+            'participant_ids': ids[(row['selected_date'],)],
+        }
+        for row in counts
+    ]
+
+
+def rsvp_tally(event):
+    """Per RSVP status: number of participants and their ids (missing statuses count as no_response)"""
+    participants = Participant.objects.filter(event=event).annotate(
+        status=Coalesce('rsvp_status__status', Value('no_response'))
+    )
+    counts = dict(participants.values_list('status').annotate(count=Count('id')).order_by())
+
+    ids = defaultdict(list)
+    for participant_id, status in participants.order_by('id').values_list('id', 'status'):
+        ids[status].append(participant_id)
+
+    return {
+        status: {'count': counts.get(status, 0), 'participant_ids': ids[status]}
+        for status, _ in RsvpStatus.RSVP_CHOICES
+    }
+
+
+def event_heatmap(event):
+    """Aggregated availability for an event; size depends on the number of slots, not rows"""
+    data = {
+        'event_type': event.event_type,
+        'participant_count': event.participants.count(),
+        'weekly_match': [],
+        'date_match': [],
+        'rsvp': {},
+    }
+    if event.event_type == 'weekly_match':
+        data['weekly_match'] = weekly_heatmap(event)
+    elif event.event_type == 'date_match':
+        data['date_match'] = date_heatmap(event)
+    elif event.event_type in ('rsvp_single', 'rsvp_multi'):
+        data['rsvp'] = rsvp_tally(event)
+    return data
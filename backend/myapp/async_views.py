@@ -0,0 +1,104 @@
+"""
+Async read path for the busiest event endpoints, for use under ASGI.
+
+Data is loaded with the async ORM (aget, async for); querysets use the same
+select_related/prefetch_related as the DRF views, so once loaded the
+serializers run without touching the database and can be called directly on
+the event loop. A request waiting on the database or on a slow client
+therefore holds no worker thread.
+
+The responses match the DRF actions without query parameters, and share their
+cache entries and ETags (see myapp.cache.cached_async_event_response).
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+
+from . import writebuffer
+from .cache import cached_async_event_response
+from .changes import alatest_cursor
+from .fastpath import dumps
+from .models import Event, RsvpStatus
+from .serializers import (
+    EventSerializer, ParticipantSerializer, RsvpStatusSerializer,
+    weekly_availability_serializer_class, date_availability_serializer_class,
+)
+from .storage import get_weekly_store, get_date_store
+
+
+def _json(data, status=200):
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
+async def _get_event(link, participants=True):
+    try:
+        return await Event.objects.with_related(participants=participants).aget(link=link)
+    except Event.DoesNotExist:
+        return None
+
+
+def _not_found():
+    return _json({'detail': 'No Event matches the given query.'}, status=404)
+
+
+def flushes_write_buffer(view):
+    """Write the event's buffered weekly toggles (myapp.writebuffer) before serving, cached or not"""
+    @wraps(view)
+    async def wrapper(request, link):
+        if writebuffer.pending():
+            await sync_to_async(writebuffer.flush)(event_link=link)
+        return await view(request, link)
+    return wrapper
+
+
+@flushes_write_buffer
+@cached_async_event_response('retrieve')
+async def event_detail(request, link):
+    event = await _get_event(link)
+    if event is None:
+        return _not_found()
+    return _json(EventSerializer(event).data)
+
+
+@flushes_write_buffer
+@cached_async_event_response('participants')
+async def event_participants(request, link):
+    event = await _get_event(link)
+    if event is None:
+        return _not_found()
+    return _json(ParticipantSerializer(event.participants.all(), many=True).data)
+
+
+@flushes_write_buffer
+@cached_async_event_response('availabilities')
+async def event_availabilities(request, link):
+    event = await _get_event(link, participants=False)
+    if event is None:
+        return _not_found()
+    cursor = await alatest_cursor(event.link)
+    participant_ids = event.participants.values_list('id', flat=True)
+
+    weekly = await get_weekly_store().aevent_slots(participant_ids)
+    dates = await get_date_store().aevent_dates(participant_ids)
+    statuses = [rsvp async for rsvp in RsvpStatus.objects.filter(participant_id__in=participant_ids)]
+    return _json({
+        'weekly_match': weekly_availability_serializer_class()(weekly, many=True).data,
+        'date_match': date_availability_serializer_class()(dates, many=True).data,
+        'rsvp': RsvpStatusSerializer(statuses, many=True).data,
+        'cursor': cursor,
+    })
+
+
+async def my_events(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return _json({'detail': 'Authentication credentials were not provided.'}, status=403)
+    if writebuffer.pending():
+        await sync_to_async(writebuffer.flush)()
+    created = [event async for event in Event.objects.with_related().filter(coordinator=user)]
+    joined = [event async for event in Event.objects.with_related().filter(participants__user=user).distinct()]
+    return _json({
+        'created': EventSerializer(created, many=True).data,
+        'joined': EventSerializer(joined, many=True).data,
+    })
@@ -1,5 +1,51 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from rest_framework.authentication import SessionAuthentication
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
     def enforce_csrf(self, request):
-        return  # Bypass CSRF check
\ No newline at end of file
+        return  # Bypass CSRF check
+
+
+def _user_cache():
+    return caches[getattr(settings, 'SESSION_CACHE_ALIAS', 'default')]
+
+
+def _is_shared(cache):
+    """Whether every process sees the same entries, so forget_user reaches them all"""
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def _user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def forget_user(user_id):
+    """Drop a cached user; called when the user is saved, deleted or logs out"""
+    _user_cache().delete(_user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose get_user, which runs on every request with a session,
+    is served from the session cache for AUTH_USER_CACHE_TIMEOUT seconds.
+    Entries are dropped through forget_user (see myapp.signals). A per-process
+    session cache (locmem) is not used: forget_user would only reach the
+    process handling the save or logout, and the others would keep a stale
+    password hash and is_active until the timeout.
+    """
+
+    def get_user(self, user_id):
+        timeout = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+        cache = _user_cache()
+        if not timeout or not _is_shared(cache):
+            return super().get_user(user_id)
+        user = cache.get(_user_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(_user_key(user_id), user, timeout=timeout)
+        return user
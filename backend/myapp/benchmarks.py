@@ -0,0 +1,488 @@
+"""
+API benchmark suite, run with ``manage.py benchmark``.
+
+For every scale (participants per event) seed() builds one event of each
+event_type, with weekly slots, dates and RSVPs for each participant. run()
+drives the API through the test client and records, per endpoint and scale,
+the query count, p50/p95 latency and peak traced memory of a request; each
+scale is seeded in a transaction that is rolled back afterwards.
+check_budgets() compares the results with per-endpoint budgets. Query budgets
+are the same at every scale, so an N+1 shows up as a violation; latency and
+memory budgets may be a number or a {scale: limit} mapping.
+
+compare_async() measures throughput of the DRF (WSGI) event reads against
+myapp.async_views at the same number of concurrent requests.
+compare_serialization() times building one large event's JSON through the DRF
+serializers and through myapp.fastpath. compare_auth() measures login and
+current-user polling with and without the cached session/user lookups.
+compare_write_buffer() counts the write statements of a grid drag with and
+without the weekly write buffer.
+"""
+import asyncio
+import datetime
+import json
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.contrib.auth.hashers import get_hasher
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.test import AsyncClient, Client, TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from . import fastpath, writebuffer
+from .models import (
+    CustomUser, Event, Participant,
+    WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails, RsvpMultiDayEventDetails,
+    RsvpStatus,
+)
+from .serializers import EventSerializer
+from .storage import get_weekly_store, get_date_store
+from .views import MyEventsView
+
+DEFAULT_SCALES = [10, 100, 1000]
+EVENT_TYPES = [event_type for event_type, _ in Event.EVENT_TYPE_CHOICES]
+
+# Uncached request cost. Reads render every participant, so their latency grows with the scale;
+# their query counts must not.
+READ_LATENCY = {'10': 250, '100': 1000, '1000': 10000}
+DEFAULT_BUDGETS = {
+    'event_list': {'max_queries': 4, 'p95_ms': READ_LATENCY},
+    'event_retrieve': {'max_queries': 4, 'p95_ms': READ_LATENCY},
+    # One extra indexed MAX() for the change log cursor
+    'event_availabilities': {'max_queries': 5, 'p95_ms': READ_LATENCY},
+    'my_events': {'max_queries': 8, 'p95_ms': {'10': 500, '100': 2000, '1000': 20000}},
+    'my_events_view': {'max_queries': 5, 'p95_ms': READ_LATENCY},
+    # Summary rows only; latency must not grow with participants
+    'my_events_dashboard': {'max_queries': 1, 'p95_ms': 100},
+    # Writes include their transaction savepoints, the EventStats read-modify-write
+    # and the change log INSERT
+    'weekly_create': {'max_queries': 10, 'p95_ms': 250},
+    'weekly_remove': {'max_queries': 9, 'p95_ms': 250},
+    'date_create': {'max_queries': 10, 'p95_ms': 250},
+    'availability_replace': {'max_queries': 10, 'p95_ms': 500},
+}
+
+SEED_WEEKLY = [('mon', datetime.time(9, 0)), ('mon', datetime.time(9, 15)), ('tue', datetime.time(10, 0))]
+SEED_START_DATE = datetime.date(2025, 1, 1)
+SEED_DATES = [SEED_START_DATE + datetime.timedelta(days=offset) for offset in (1, 2, 5)]
+
+
+def _create_details(event):
+    if event.event_type == 'weekly_match':
+        WeeklyEventDetails.objects.create(
+            event=event, mon_selected=True, tue_selected=True, wed_selected=True,
+            start_time=datetime.time(9, 0), end_time=datetime.time(17, 0),
+        )
+    elif event.event_type == 'date_match':
+        DateAvailabilityEventDetails.objects.create(
+            event=event, start_date=SEED_START_DATE, end_date=SEED_START_DATE + datetime.timedelta(days=30),
+        )
+    elif event.event_type == 'rsvp_single':
+        RsvpSingleDayEventDetails.objects.create(event=event, date=SEED_START_DATE, is_all_day=True)
+    else:
+        RsvpMultiDayEventDetails.objects.create(
+            event=event, start_date=SEED_START_DATE, end_date=SEED_START_DATE + datetime.timedelta(days=2),
+            is_all_day=True,
+        )
+
+
+def seed(scale):
+    """Create the benchmark data for one scale; returns {'coordinator': user, 'events': {event_type: event}}"""
+    coordinator = CustomUser.objects.create_user(email=f'bench-{scale}@example.com', first_name='Bench')
+    users = CustomUser.objects.bulk_create([
+        CustomUser(email=f'bench-{scale}-{i}@example.com', first_name=f'P{i}', password='!')
+        for i in range(scale)
+    ])
+    statuses = [status for status, _ in RsvpStatus.RSVP_CHOICES]
+    events = {}
+    for event_type in EVENT_TYPES:
+        event = Event.objects.create(name=f'Bench {event_type} x{scale}', coordinator=coordinator, event_type=event_type)
+        _create_details(event)
+        participants = Participant.objects.bulk_create([Participant(user=user, event=event) for user in users])
+        # The coordinator also takes part, so "joined" lists are not empty
+        participants.append(Participant.objects.create(user=coordinator, event=event))
+        if event_type == 'weekly_match':
+            for participant in participants:
+                get_weekly_store().update(participant.id, add=SEED_WEEKLY, replace=True)
+        elif event_type == 'date_match':
+            for participant in participants:
+                get_date_store().update(participant.id, add=SEED_DATES, replace=True)
+        RsvpStatus.objects.bulk_create([
+            RsvpStatus(participant=participant, status=statuses[i % len(statuses)])
+            for i, participant in enumerate(participants)
+        ])
+        events[event_type] = event
+    return {'coordinator': coordinator, 'events': events}
+
+
+def _requests(fixture):
+    """(name, callable) pairs; each call performs one request and returns its status code"""
+    client = APIClient()
+    client.force_authenticate(fixture['coordinator'])
+    factory = APIRequestFactory()
+    weekly_event = fixture['events']['weekly_match']
+    participant = weekly_event.participants.order_by('id').first()
+    date_participant = fixture['events']['date_match'].participants.order_by('id').first()
+    # Slots and dates the seed never uses; weekly_remove takes back what weekly_create added
+    probe_slots = iter(
+        (day, datetime.time(minutes // 60, minutes % 60))
+        for day in ['wed', 'thur', 'fri', 'sat', 'sun'] for minutes in range(0, 24 * 60, 15)
+    )
+    added_slots = []
+    probe_dates = iter(SEED_START_DATE + datetime.timedelta(days=offset) for offset in range(10, 10_000))
+
+    def weekly_create():
+        day, start_time = next(probe_slots)
+        added_slots.append((day, start_time))
+        return client.post('/api/weekly-availabilities/', {
+            'participant': participant.id, 'selected_day': day, 'selected_start_time': start_time.isoformat(),
+        }).status_code
+
+    def weekly_remove():
+        day, start_time = added_slots.pop(0)
+        return client.delete('/api/weekly-availabilities/remove/', {
+            'participant': participant.id, 'selected_day': day, 'selected_start_time': start_time.isoformat(),
+        }, format='json').status_code
+
+    def my_events_view():
+        request = factory.get('/api/my-events/')
+        force_authenticate(request, fixture['coordinator'])
+        return MyEventsView.as_view()(request).render().status_code
+
+    def availability_replace():
+        return client.put(
+            f'/api/participants/{date_participant.id}/availability/',
+            {'dates': [date.isoformat() for date in SEED_DATES]},
+            format='json',
+        ).status_code
+
+    requests = [
+        ('event_list', lambda: client.get('/api/events/', {'expand': 'participants'}).status_code),
+        ('my_events', lambda: client.get('/api/my-events/').status_code),
+        ('my_events_view', my_events_view),
+        ('my_events_dashboard', lambda: client.get('/api/my-events/dashboard/').status_code),
+    ]
+    for event_type, event in fixture['events'].items():
+        requests += [
+            (f'event_retrieve:{event_type}', lambda event=event: client.get(f'/api/events/{event.link}/').status_code),
+            (
+                f'event_availabilities:{event_type}',
+                lambda event=event: client.get(f'/api/events/{event.link}/availabilities/').status_code,
+            ),
+        ]
+    # Writes undo each other (availability_replace resets the dates), leaving the seed as it was
+    requests += [
+        ('weekly_create', weekly_create),
+        ('weekly_remove', weekly_remove),
+        ('date_create', lambda: client.post('/api/date-availabilities/', {
+            'participant': date_participant.id, 'selected_date': next(probe_dates).isoformat(),
+        }).status_code),
+        ('availability_replace', availability_replace),
+    ]
+    return requests
+
+
+def _check(name, status_code):
+    if status_code >= 400:
+        raise RuntimeError(f'{name} returned HTTP {status_code}')
+
+
+def _measure(name, request, iterations):
+    timings = []
+    queries = 0
+    for _ in range(iterations):
+        # Measure rendering, not the response cache
+        caches['events'].clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            status_code = request()
+            timings.append((time.perf_counter() - start) * 1000)
+        _check(name, status_code)
+        queries = max(queries, len(captured))
+    return timings, queries
+
+
+def _percentile(timings, percent):
+    if len(timings) == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method='inclusive')[percent - 1]
+
+
+def _measure_scale(scale, iterations):
+    fixture = seed(scale)
+    results = []
+    for name, request in _requests(fixture):
+        # One traced request for memory; tracing would distort the timed rounds
+        tracemalloc.start()
+        caches['events'].clear()
+        _check(name, request())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings, queries = _measure(name, request, iterations)
+        results.append({
+            'endpoint': name,
+            'scale': scale,
+            'iterations': iterations,
+            'queries': queries,
+            'p50_ms': round(_percentile(timings, 50), 3),
+            'p95_ms': round(_percentile(timings, 95), 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+        })
+    return results
+
+
+def run(scales=DEFAULT_SCALES, iterations=20):
+    """Results per scale and endpoint, in the shape written by ``manage.py benchmark``"""
+    results = []
+    events_cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-events'}
+    with override_settings(
+        CACHES={'default': events_cache, 'events': events_cache}, EVENT_CACHE_ALIAS='events',
+        ALLOWED_HOSTS=['testserver'],
+    ):
+        for scale in scales:
+            with transaction.atomic():
+                results += _measure_scale(scale, iterations)
+                transaction.set_rollback(True)
+    return results
+
+
+def _throughput(timings, elapsed, peak_threads):
+    return {
+        'requests_per_s': round(len(timings) / elapsed, 1),
+        'p50_ms': round(_percentile(timings, 50), 3),
+        'p95_ms': round(_percentile(timings, 95), 3),
+        'peak_threads': peak_threads,
+    }
+
+
+def _wsgi_reads(urls, concurrency):
+    timings = []
+    peak_threads = 0
+
+    def fetch(url):
+        nonlocal peak_threads
+        start = time.perf_counter()
+        _check(url, Client().get(url).status_code)
+        timings.append((time.perf_counter() - start) * 1000)
+        peak_threads = max(peak_threads, threading.active_count())
+        connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, urls))
+    return _throughput(timings, time.perf_counter() - start, peak_threads)
+
+
+async def _asgi_reads(urls, concurrency):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+    peak_threads = 0
+
+    async def fetch(url):
+        nonlocal peak_threads
+        async with semaphore:
+            start = time.perf_counter()
+            _check(url, (await client.get(url)).status_code)
+            timings.append((time.perf_counter() - start) * 1000)
+            peak_threads = max(peak_threads, threading.active_count())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch(url) for url in urls))
+    return _throughput(timings, time.perf_counter() - start, peak_threads)
+
+
+def compare_async(scale=100, requests=200, concurrency=20):
+    """
+    Requests/s, latency and threads used by the DRF and async event reads.
+
+    Seeds (and commits) its own data, since concurrent requests run on
+    separate connections; use it only on a throwaway database.
+    """
+    fixture = seed(scale)
+    event = fixture['events']['weekly_match']
+    suffixes = ['', 'participants/', 'availabilities/']
+    paths = [f'events/{event.link}/{suffixes[i % len(suffixes)]}' for i in range(requests)]
+    events_cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-events'}
+    # A zero timeout keeps rendered responses out of the cache, so both paths render every request
+    with override_settings(
+        CACHES={'default': events_cache, 'events': events_cache}, EVENT_CACHE_ALIAS='events',
+        EVENT_CACHE_TIMEOUT=0, ALLOWED_HOSTS=['testserver'],
+    ):
+        return {
+            'scale': scale,
+            'requests': requests,
+            'concurrency': concurrency,
+            'wsgi': _wsgi_reads([f'/api/{path}' for path in paths], concurrency),
+            'asgi': asyncio.run(_asgi_reads([f'/api/async/{path}' for path in paths], concurrency)),
+        }
+
+
+def compare_serialization(scale=1000, iterations=10):
+    """
+    p50 time to load and encode a weekly event with `scale` participants (the
+    retrieve response body) through EventSerializer + JSONRenderer and through
+    myapp.fastpath; both must produce the same bytes. Rolled back afterwards.
+    """
+    events_cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-events'}
+    with override_settings(CACHES={'default': events_cache, 'events': events_cache}, EVENT_CACHE_ALIAS='events'):
+        with transaction.atomic():
+            event = seed(scale)['events']['weekly_match']
+
+            def serializers():
+                return JSONRenderer().render(EventSerializer(Event.objects.with_related().get(pk=event.pk)).data)
+
+            def fast():
+                return fastpath.dumps(fastpath.events(Event.objects.filter(pk=event.pk))[0])
+
+            if serializers() != fast():
+                raise RuntimeError('fastpath output differs from the serializers')
+            result = {'scale': scale, 'orjson': fastpath.orjson is not None}
+            for name, build in [('serializers', serializers), ('fastpath', fast)]:
+                timings = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    build()
+                    timings.append((time.perf_counter() - start) * 1000)
+                result[name] = {'p50_ms': round(_percentile(timings, 50), 2)}
+            result['speedup'] = round(result['serializers']['p50_ms'] / result['fastpath']['p50_ms'], 1)
+            transaction.set_rollback(True)
+    return result
+
+
+def _timed(request, count):
+    """Timings and the query count of the last (steady state) request"""
+    timings = []
+    for _ in range(count):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            _check('auth', request().status_code)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings, len(captured)
+
+
+def compare_auth(requests=500, logins=5):
+    """
+    current-user polling (requests/s, queries) with database sessions and user
+    lookups (the old settings) and with the cached ones, plus the p50 cost of
+    a login under the configured hasher. Rolled back afterwards.
+    """
+    uncached = {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }
+    credentials = {'email': 'bench-auth@example.com', 'password': 'bench-auth-password'}
+    result = {'hasher': get_hasher().algorithm, 'requests': requests}
+    # CachedModelBackend only caches users in a cache shared between processes
+    with tempfile.TemporaryDirectory() as directory, override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+            'events': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-auth'},
+        },
+        ALLOWED_HOSTS=['testserver'],
+    ):
+        with transaction.atomic():
+            CustomUser.objects.create_user(**credentials)
+            for name, overrides in [('uncached', uncached), ('cached', {})]:
+                with override_settings(**overrides):
+                    client = APIClient()
+                    login_timings, _ = _timed(lambda: client.post('/api/login/', credentials, format='json'), logins)
+                    timings, queries = _timed(lambda: client.get('/api/current-user/'), requests)
+                    result[name] = {
+                        'login_p50_ms': round(_percentile(login_timings, 50), 2),
+                        'current_user_per_s': round(requests / (sum(timings) / 1000), 1),
+                        'current_user_p50_ms': round(_percentile(timings, 50), 3),
+                        'current_user_queries': queries,
+                    }
+            transaction.set_rollback(True)
+    return result
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def compare_write_buffer(slots=32, passes=4):
+    """
+    One participant drags across `slots` Monday slots and back, `passes` times,
+    then reads the event. Write statements and total time with the toggles
+    written through and with them buffered (bitset storage). Rolled back afterwards.
+    """
+    times = [datetime.time(9 + index // 4, index % 4 * 15).isoformat() for index in range(slots)]
+    result = {'toggles': slots * passes * 2 - slots}
+    default_cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-writes'}
+    with override_settings(
+        CACHES={'default': default_cache, 'events': default_cache}, ALLOWED_HOSTS=['testserver'],
+        WEEKLY_AVAILABILITY_STORAGE='bitset',
+    ):
+        for name, window in [('write_through', 0), ('buffered', 60000)]:
+            # Ids are reused after the rollback; drop the participant -> event lookups cached for the last pass
+            caches['events'].clear()
+            with override_settings(WEEKLY_WRITE_BUFFER_MS=window), transaction.atomic():
+                coordinator = CustomUser.objects.create_user(email='bench-writes@example.com')
+                event = Event.objects.create(name='Bench writes', coordinator=coordinator, event_type='weekly_match')
+                participant = Participant.objects.create(user=coordinator, event=event)
+                client = APIClient()
+
+                def toggle(method, url, start_time):
+                    # Each request's on_commit hooks run as if it had committed, which the rollback here never does
+                    with TestCase.captureOnCommitCallbacks(execute=True):
+                        data = {'participant': participant.id, 'selected_day': 'mon', 'selected_start_time': start_time}
+                        method(url, data, format='json')
+
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    for index in range(passes):
+                        # Every pass but the last drags back, deselecting what it selected
+                        for start_time in times:
+                            toggle(client.post, '/api/weekly-availabilities/', start_time)
+                        if index < passes - 1:
+                            for start_time in reversed(times):
+                                toggle(client.delete, '/api/weekly-availabilities/remove/', start_time)
+                    _check('event_retrieve', client.get(f'/api/events/{event.link}/').status_code)
+                result[name] = {
+                    'write_statements': sum(query['sql'].startswith(WRITE_STATEMENTS) for query in captured),
+                    'total_ms': round((time.perf_counter() - start) * 1000, 1),
+                }
+                writebuffer.flush()
+                transaction.set_rollback(True)
+    return result
+
+
+def _limit(budget, key, scale):
+    limit = budget.get(key)
+    if isinstance(limit, dict):
+        return limit.get(str(scale))
+    return limit
+
+
+def check_budgets(results, budgets=DEFAULT_BUDGETS):
+    """Human-readable violations; endpoints are matched on the name before any ':event_type' suffix"""
+    violations = []
+    for result in results:
+        budget = budgets.get(result['endpoint'], budgets.get(result['endpoint'].split(':')[0]))
+        if not budget:
+            continue
+        label = f"{result['endpoint']} @ {result['scale']}"
+        for key, budget_key in [('queries', 'max_queries'), ('p95_ms', 'p95_ms'), ('peak_memory_kb', 'peak_memory_kb')]:
+            limit = _limit(budget, budget_key, result['scale'])
+            if limit is not None and result[key] > limit:
+                violations.append(f"{label}: {key} {result[key]} > {limit}")
+    return violations
+
+
+def load_budgets(path):
+    """DEFAULT_BUDGETS overlaid with a JSON file of {endpoint: {max_queries, p95_ms, peak_memory_kb}}"""
+    budgets = {name: dict(budget) for name, budget in DEFAULT_BUDGETS.items()}
+    if path:
+        with open(path) as f:
+            for name, budget in json.load(f).items():
+                budgets.setdefault(name, {}).update(budget)
+    return budgets
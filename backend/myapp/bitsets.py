@@ -0,0 +1,104 @@
+"""
+Packed weekly availability.
+
+A participant's week is a single integer with one bit per (day, slot), slots
+counted from midnight Monday. Bit ``day_index * slots_per_day + slot`` is set
+when the participant is available for that slot. The integer is stored
+little-endian in ``WeeklyAvailabilityMask.bits``.
+"""
+import datetime
+from collections import namedtuple
+
+from .models import WeeklyAvailability
+
+DAY_ORDER = [day for day, _ in WeeklyAvailability.DAY_CHOICES]
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Stand-in for a WeeklyAvailability row decoded from a mask
+WeeklySlot = namedtuple('WeeklySlot', ['id', 'participant_id', 'selected_day', 'selected_start_time'])
+
+
+def slots_per_day(slot_minutes):
+    return MINUTES_PER_DAY // slot_minutes
+
+
+def slot_index(day, start_time, slot_minutes):
+    """Bit index of a (day, start time) pair; raises ValueError for unknown days or unaligned times"""
+    minutes = start_time.hour * 60 + start_time.minute
+    if start_time.second or start_time.microsecond or minutes % slot_minutes:
+        raise ValueError(f'Start time must be aligned to {slot_minutes} minute slots.')
+    return DAY_ORDER.index(day) * slots_per_day(slot_minutes) + minutes // slot_minutes
+
+
+def slot_at(index, slot_minutes):
+    """Inverse of slot_index: (day, start time) for a bit index"""
+    day_index, slot = divmod(index, slots_per_day(slot_minutes))
+    minutes = slot * slot_minutes
+    return DAY_ORDER[day_index], datetime.time(minutes // 60, minutes % 60)
+
+
+def slot_id(participant_id, day, start_time):
+    """Stable id for a decoded slot, independent of the slot size"""
+    minute_of_week = DAY_ORDER.index(day) * MINUTES_PER_DAY + start_time.hour * 60 + start_time.minute
+    return participant_id * MINUTES_PER_WEEK + minute_of_week
+
+
+def parse_slot_id(value):
+    """Inverse of slot_id: (participant_id, day, start time)"""
+    participant_id, minute_of_week = divmod(int(value), MINUTES_PER_WEEK)
+    day_index, minutes = divmod(minute_of_week, MINUTES_PER_DAY)
+    return participant_id, DAY_ORDER[day_index], datetime.time(minutes // 60, minutes % 60)
+
+
+def from_bytes(bits):
+    return int.from_bytes(bytes(bits), 'little')
+
+
+def to_bytes(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def iter_bits(value):
+    """Indexes of the set bits, lowest first"""
+    while value:
+        lowest = value & -value
+        yield lowest.bit_length() - 1
+        value ^= lowest
+
+
+def overlap(values):
+    """Slots every mask has set"""
+    result = None
+    for value in values:
+        result = value if result is None else result & value
+    return result or 0
+
+
+def sliding_and(values, width):
+    """AND of every run of `width` consecutive values, in O(len(values)) (van Herk/Gil-Werman)"""
+    count = len(values)
+    if width < 1 or width > count:
+        return []
+    prefix = list(values)
+    suffix = list(values)
+    for i in range(1, count):
+        if i % width:
+            prefix[i] &= prefix[i - 1]
+    for i in range(count - 2, -1, -1):
+        if (i + 1) % width:
+            suffix[i] &= suffix[i + 1]
+    return [suffix[i] & prefix[i + width - 1] for i in range(count - width + 1)]
+
+
+def popcount(value):
+    return value.bit_count()
+
+
+def decode(participant_id, value, slot_minutes):
+    """WeeklySlot tuples for every set bit of a mask"""
+    slots = []
+    for index in iter_bits(value):
+        day, start_time = slot_at(index, slot_minutes)
+        slots.append(WeeklySlot(slot_id(participant_id, day, start_time), participant_id, day, start_time))
+    return slots
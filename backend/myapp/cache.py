@@ -0,0 +1,249 @@
+"""
+Per-event response cache.
+
+Every event link has a version counter in the cache. Rendered JSON for the
+cached endpoints is stored under (link, endpoint, version, query string), so
+bumping the version invalidates all of an event's responses at once. The same
+version doubles as the ETag, which lets polling clients get 304s. Versions
+are bumped by myapp.signals and by bulk write paths that bypass signals; a
+version first created by a read only becomes permanent once the read finds
+the event, so requests for made-up links leave nothing behind.
+"""
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .models import Event
+
+HITS_KEY = 'event-cache:hits'
+MISSES_KEY = 'event-cache:misses'
+
+
+def get_cache():
+    return caches[getattr(settings, 'EVENT_CACHE_ALIAS', 'default')]
+
+
+def _stats_cache():
+    """Hit / miss counters live apart from the event cache, in a cheap (per process by default) cache"""
+    return caches[getattr(settings, 'EVENT_CACHE_STATS_ALIAS', 'default')]
+
+
+def _incr(key):
+    cache = _stats_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_event_version(link):
+    """
+    (version, provisional): the current version of an event, initialised from
+    the clock so an evicted counter never repeats. Any well-formed link gets
+    here before its event is looked up, so a version created by this call is
+    provisional: it expires after EVENT_VERSION_PROVISIONAL_TIMEOUT unless
+    confirm_event_version() keeps it.
+    """
+    cache = get_cache()
+    key = f'event:{link}:version'
+    version = cache.get(key)
+    if version is not None:
+        return version, False
+    provisional = cache.add(key, time.time_ns(), timeout=getattr(settings, 'EVENT_VERSION_PROVISIONAL_TIMEOUT', 60))
+    return cache.get(key), provisional
+
+
+def confirm_event_version(link, found):
+    """After a provisional version: keep it if the request found the event, drop it if not"""
+    cache = get_cache()
+    key = f'event:{link}:version'
+    if found:
+        cache.touch(key, None)
+    else:
+        cache.delete(key)
+
+
+def _bump(link):
+    cache = get_cache()
+    key = f'event:{link}:version'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_event_version(link):
+    """
+    Invalidate an event's cached responses now, and again once the current
+    transaction commits, so a response rendered from pre-commit data is not kept.
+    """
+    if link is None:
+        return
+    _bump(link)
+    transaction.on_commit(lambda: _bump(link))
+
+
+def event_link(event_id):
+    """Link of an event id; links never change, so lookups are cached"""
+    cache = get_cache()
+    key = f'event-link:{event_id}'
+    link = cache.get(key)
+    if link is None:
+        link = Event.objects.filter(pk=event_id).values_list('link', flat=True).first()
+        if link is not None:
+            cache.set(key, link, timeout=None)
+    return link
+
+
+def participant_event_link(participant_id):
+    """Event link of a participant; a participant never changes event, so lookups are cached"""
+    cache = get_cache()
+    key = f'participant-event:{participant_id}'
+    link = cache.get(key)
+    if link is None:
+        row = Event.objects.filter(participants=participant_id).values_list('id', 'link').first()
+        if row is not None:
+            event_id, link = row
+            cache.set_many({key: link, f'event-link:{event_id}': link}, timeout=None)
+    return link
+
+
+def cached_event_links(event_ids):
+    """Links of those event ids whose link is cached, without querying for the others"""
+    found = get_cache().get_many([f'event-link:{event_id}' for event_id in event_ids])
+    return set(found.values())
+
+
+def participant_event_id(participant_id):
+    """Event id of a participant, cached like participant_event_link"""
+    cache = get_cache()
+    key = f'participant-event-id:{participant_id}'
+    event_id = cache.get(key)
+    if event_id is None:
+        row = Event.objects.filter(participants=participant_id).values_list('id', 'link').first()
+        if row is not None:
+            event_id, link = row
+            cache.set_many({key: event_id, f'event-link:{event_id}': link}, timeout=None)
+    return event_id
+
+
+def cache_stats():
+    cache = _stats_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else None}
+
+
+def _variant(endpoint, query):
+    storage = '{}/{}'.format(
+        getattr(settings, 'WEEKLY_AVAILABILITY_STORAGE', 'rows'), getattr(settings, 'DATE_AVAILABILITY_STORAGE', 'rows')
+    )
+    return hashlib.md5(f'{endpoint}:{storage}:{query}'.encode()).hexdigest()[:16]
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    return bool(if_none_match) and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match))
+
+
+def cached_event_response(endpoint):
+    """
+    Serve a detail action of EventViewSet from the cache. Only successful JSON
+    GET responses are cached; the body is stored pre-rendered.
+
+    Responses carry a strong ETag built from the event version, so a request
+    whose If-None-Match still matches gets a 304 without rendering anything.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or request.accepted_renderer.format != 'json':
+                return method(self, request, *args, **kwargs)
+            try:
+                link = uuid.UUID(str(kwargs[self.lookup_field]))
+            except ValueError:
+                return method(self, request, *args, **kwargs)
+
+            variant = _variant(endpoint, request.GET.urlencode())
+            version, provisional = get_event_version(link)
+            etag = f'"{version}-{variant}"'
+            # No client holds a provisional version, and its event may not exist
+            if not provisional and _not_modified(request, etag):
+                return _with_validators(HttpResponseNotModified(), etag)
+
+            key = f'event:{link}:{endpoint}:{version}:{variant}'
+            cache = get_cache()
+            content = cache.get(key)
+            if content is not None:
+                _incr(HITS_KEY)
+                return _with_validators(HttpResponse(content, content_type=request.accepted_media_type), etag)
+
+            _incr(MISSES_KEY)
+            try:
+                response = method(self, request, *args, **kwargs)
+            except Exception:
+                # NotFound among others; DRF turns it into the response
+                if provisional:
+                    confirm_event_version(link, False)
+                raise
+            if provisional:
+                confirm_event_version(link, response.status_code == 200)
+            if response.status_code != 200:
+                return response
+            content = request.accepted_renderer.render(
+                response.data, request.accepted_media_type, self.get_renderer_context()
+            )
+            cache.set(key, content, timeout=getattr(settings, 'EVENT_CACHE_TIMEOUT', 300))
+            return _with_validators(HttpResponse(content, content_type=request.accepted_media_type), etag)
+        return wrapper
+    return decorator
+
+
+def cached_async_event_response(endpoint):
+    """
+    cached_event_response for async views called as view(request, link) that
+    return rendered JSON. They take no query parameters and share cache entries
+    and ETags with the plain (no query string) DRF action of the same endpoint.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, link):
+            variant = _variant(endpoint, '')
+            version, provisional = await sync_to_async(get_event_version)(link)
+            etag = f'"{version}-{variant}"'
+            if not provisional and _not_modified(request, etag):
+                return _with_validators(HttpResponseNotModified(), etag)
+
+            key = f'event:{link}:{endpoint}:{version}:{variant}'
+            cache = get_cache()
+            content = await cache.aget(key)
+            if content is not None:
+                await sync_to_async(_incr)(HITS_KEY)
+                return _with_validators(HttpResponse(content, content_type='application/json'), etag)
+
+            await sync_to_async(_incr)(MISSES_KEY)
+            response = await view(request, link)
+            if provisional:
+                await sync_to_async(confirm_event_version)(link, response.status_code == 200)
+            if response.status_code != 200:
+                return response
+            await cache.aset(key, response.content, timeout=getattr(settings, 'EVENT_CACHE_TIMEOUT', 300))
+            return _with_validators(response, etag)
+        return wrapper
+    return decorator
+
+
+def _with_validators(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,124 @@
+"""
+Single entry point for "an event's data changed".
+
+Invalidates the event's cached responses (myapp.cache), appends the delta
+messages to the event's change log (EventChange, written in the same
+transaction) and, once the transaction commits, publishes them to stream
+subscribers (myapp.pubsub). Called from myapp.signals and from bulk write
+paths that bypass model signals.
+
+The log id is the cursor for availabilities/?since=: changes_since() replays
+the messages after a cursor, or returns None when the cursor predates
+compaction and the client needs a full snapshot.
+
+Replaying "id > cursor" is only safe if an event's entries become visible in
+id order. Ids are assigned at INSERT, not at commit, so on PostgreSQL a
+transaction holding a lower id could otherwise commit after a reader saw a
+higher one, and that entry would never be replayed. Inserts are therefore
+serialized per event: the writer locks the event's EventStats row (the row
+stats.record locks anyway; not locked twice when the transaction already
+holds it) before taking an id and holds it until commit.
+SQLite serializes all writers already and skips the lock. Entries of events
+without a stats row, or written outside the lock (raw SQL, other tools),
+have no ordering guarantee.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import stats
+from .cache import bump_event_version, cached_event_links
+from .models import Event, EventChange, EventStats
+from .pubsub import get_broker
+
+
+def _append(link, messages):
+    """Insert a log entry; ids of one event are committed in order (see the module docstring)"""
+    with transaction.atomic(savepoint=False):
+        features = connection.features
+        if features.has_select_for_update and link not in cached_event_links(stats.locked_events()):
+            of = ('self',) if features.has_select_for_update_of else ()
+            list(EventStats.objects.select_for_update(of=of).filter(event__link=link).values_list('id'))
+        EventChange.objects.create(event_link=link, messages=messages)
+
+
+def event_changed(link, messages=()):
+    if link is None:
+        return
+    bump_event_version(link)
+    messages = list(messages)
+    if messages:
+        _append(link, messages)
+        transaction.on_commit(lambda: get_broker().publish(str(link), messages))
+
+
+def latest_cursor(link):
+    """Cursor covering every change logged so far; read it before the snapshot it goes with"""
+    return EventChange.objects.filter(event_link=link).aggregate(cursor=Max('id'))['cursor'] or 0
+
+
+async def alatest_cursor(link):
+    return (await EventChange.objects.filter(event_link=link).aaggregate(cursor=Max('id')))['cursor'] or 0
+
+
+def changes_since(link, cursor):
+    """(cursor, messages) logged after cursor, or None if they were compacted or exceed CHANGE_LOG_MAX_REPLAY"""
+    limit = getattr(settings, 'CHANGE_LOG_MAX_REPLAY', 500)
+    rows = list(
+        EventChange.objects.filter(event_link=link, id__gt=cursor).order_by('id').values_list('id', 'messages')[:limit + 1]
+    )
+    # A compaction marker is always the event's oldest entry, so it can only come first
+    if len(rows) > limit or (rows and rows[0][1] is None):
+        return None
+    messages = [message for _, logged in rows for message in logged]
+    return (rows[-1][0] if rows else cursor), messages
+
+
+def compact_changes(before, batch_size=1000):
+    """
+    Fold each event's entries older than before into a single marker row (so
+    older cursors are recognised as expired) and drop the log of deleted
+    events. Returns the number of rows deleted.
+    """
+    from .storage import raw_delete  # storage reports its writes through this module
+
+    orphans = EventChange.objects.exclude(event_link__in=Event.objects.values('link'))
+    deleted = raw_delete(orphans)
+    markers = list(
+        EventChange.objects.filter(created_at__lt=before).values_list('event_link').annotate(last=Max('id')).order_by()
+    )
+    for start in range(0, len(markers), batch_size):
+        batch = markers[start:start + batch_size]
+        with transaction.atomic():
+            for link, last in batch:
+                older = EventChange.objects.filter(event_link=link, id__lt=last)
+                deleted += raw_delete(older)
+            EventChange.objects.filter(id__in=[last for _, last in batch]).update(messages=None)
+    return deleted
+
+
+def slots_message(kind, participant_id, weekly=(), dates=(), date_ranges=()):
+    """
+    slots_added / slots_removed delta; weekly is (day, start time) pairs,
+    dates are dates, date_ranges (start, end) runs of consecutive dates
+    """
+    message = {'type': f'slots_{kind}', 'participant': participant_id}
+    if weekly:
+        message['weekly'] = [[day, start_time.isoformat()] for day, start_time in sorted(weekly)]
+    if dates:
+        message['dates'] = [date.isoformat() for date in sorted(dates)]
+    if date_ranges:
+        message['date_ranges'] = [[start.isoformat(), end.isoformat()] for start, end in sorted(date_ranges)]
+    return message
+
+
+def slot_diff_messages(
+    participant_id, weekly_added=(), weekly_removed=(), dates_added=(), dates_removed=(),
+    date_ranges_added=(), date_ranges_removed=(),
+):
+    messages = []
+    if weekly_added or dates_added or date_ranges_added:
+        messages.append(slots_message('added', participant_id, weekly_added, dates_added, date_ranges_added))
+    if weekly_removed or dates_removed or date_ranges_removed:
+        messages.append(slots_message('removed', participant_id, weekly_removed, dates_removed, date_ranges_removed))
+    return messages
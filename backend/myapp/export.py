@@ -0,0 +1,82 @@
+"""
+Streaming availability export (GET /api/events/{link}/export/).
+
+Rows are read with values_list(...).iterator(chunk_size=...) with participant
+names joined in the same query, and encoded a chunk at a time into a
+StreamingHttpResponse, so memory stays flat however many availability rows an
+event has. Weekly events export one row per selected slot, date events one per
+selected date and RSVP events one per participant.
+
+Names are user input (anyone can join as a guest), so CSV text cells that a
+spreadsheet would evaluate as a formula are prefixed with a quote. NDJSON is
+written as is.
+"""
+import csv
+from itertools import islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Participant
+from .storage import get_weekly_store, get_date_store
+
+NAME_COLUMNS = ['participant', 'first_name', 'last_name']
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def export_rows(event):
+    """Column names and an iterator of value tuples for the event's type"""
+    if event.event_type == 'weekly_match':
+        return NAME_COLUMNS + ['day', 'start_time'], get_weekly_store().export_rows(event.pk, chunk_size())
+    if event.event_type == 'date_match':
+        return NAME_COLUMNS + ['date'], get_date_store().export_rows(event.pk, chunk_size())
+    rows = Participant.objects.filter(event_id=event.pk).order_by('id').values_list(
+        'id', 'user__first_name', 'user__last_name', 'rsvp_status__status'
+    )
+    return NAME_COLUMNS + ['status'], (
+        row[:3] + (row[3] or 'no_response',) for row in rows.iterator(chunk_size=chunk_size())
+    )
+
+
+def _chunks(rows):
+    while chunk := list(islice(rows, chunk_size())):
+        yield chunk
+
+
+# Leading characters that make spreadsheets treat a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """File-like object for csv.writer that returns each line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for chunk in _chunks(rows):
+        yield ''.join(writer.writerow([_csv_cell(value) for value in row]) for row in chunk)
+
+
+def ndjson_stream(columns, rows):
+    encoder = DjangoJSONEncoder()
+    for chunk in _chunks(rows):
+        yield ''.join(encoder.encode(dict(zip(columns, row))) + '\n' for row in chunk)
+
+
+FORMATS = {
+    'csv': ('text/csv', csv_stream),
+    'ndjson': ('application/x-ndjson', ndjson_stream),
+}
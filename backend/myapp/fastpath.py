@@ -0,0 +1,214 @@
+"""
+Read-only fast path for the hot event endpoints.
+
+The builders below return the same data as EventSerializer,
+ParticipantSerializer and the availability serializers (same keys, key order
+and value formatting) but build plain dicts straight from values_list()
+tuples: no model instances and no per-field serializer calls. The serializers
+remain the reference implementation and are still used for writes, for
+browsable API requests, and with FAST_READ_PATH = False.
+
+FastJSONRenderer encodes with orjson when it is installed and produces the
+same bytes as rest_framework's JSONRenderer; anything orjson cannot encode
+(or an indented response) goes through the DRF renderer instead.
+"""
+import datetime
+from collections import defaultdict
+from types import SimpleNamespace
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import (
+    Participant, RsvpStatus,
+    WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails, RsvpMultiDayEventDetails,
+)
+from .serializers import coordinator_name
+from .storage import get_weekly_store, get_date_store
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DETAIL_MODELS = {
+    'weekly_match': WeeklyEventDetails,
+    'date_match': DateAvailabilityEventDetails,
+    'rsvp_single': RsvpSingleDayEventDetails,
+    'rsvp_multi': RsvpMultiDayEventDetails,
+}
+
+
+def enabled():
+    return getattr(settings, 'FAST_READ_PATH', True)
+
+
+# --- Encoding ---
+
+def _default(value):
+    return JSONEncoder().default(value)
+
+
+def dumps(data):
+    """Compact UTF-8 JSON, byte-identical to JSONRenderer().render(data)"""
+    if orjson is not None:
+        try:
+            content = orjson.dumps(
+                data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            )
+        except TypeError:
+            pass
+        else:
+            # JSONRenderer escapes these two for JavaScript
+            return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return JSONRenderer().render(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+# --- Builders ---
+
+def _format(value):
+    """DRF's default representation of date and time values (ISO 8601)"""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _weekly(participant_ids):
+    """WeeklyAvailabilitySerializer / WeeklySlotSerializer dicts"""
+    return [
+        {'id': pk, 'participant': participant_id, 'selected_day': day, 'selected_start_time': _format(start_time)}
+        for pk, participant_id, day, start_time in get_weekly_store().slot_rows(participant_ids)
+    ]
+
+
+def _dates(participant_ids):
+    return [
+        {'id': pk, 'participant': participant_id, 'selected_date': _format(date)}
+        for pk, participant_id, date in get_date_store().date_rows(participant_ids)
+    ]
+
+
+def _group(items):
+    grouped = defaultdict(list)
+    for item in items:
+        grouped[item['participant']].append(item)
+    return grouped
+
+
+def participants(event_ids):
+    """ParticipantSerializer dicts grouped by event id"""
+    rows = list(Participant.objects.filter(event_id__in=event_ids).values_list(
+        'id', 'user_id', 'user__first_name', 'user__last_name', 'user__email', 'event_id',
+        'rsvp_status__id', 'rsvp_status__status',
+    ).order_by('id'))
+    participant_ids = Participant.objects.filter(event_id__in=event_ids).values('id')
+    weekly = _group(_weekly(participant_ids)) if rows else {}
+    dates = _group(_dates(participant_ids)) if rows else {}
+
+    grouped = defaultdict(list)
+    for pk, user_id, first_name, last_name, email, event_id, rsvp_id, rsvp_status in rows:
+        grouped[event_id].append({
+            'id': pk,
+            'user': user_id,
+            'user_first_name': first_name,
+            'user_last_name': last_name,
+            'user_email': email,
+            'event': event_id,
+            'weekly_availabilities': weekly.get(pk, []),
+            'date_availabilities': dates.get(pk, []),
+            'rsvp_status': None if rsvp_id is None else {'id': rsvp_id, 'participant': pk, 'status': rsvp_status},
+        })
+    return grouped
+
+
+# Event column -> related name of each details model, joined like EventQuerySet.with_related
+DETAIL_RELATIONS = {
+    'weekly_match': 'weekly_details',
+    'date_match': 'date_match_details',
+    'rsvp_single': 'rsvp_single_details',
+    'rsvp_multi': 'rsvp_multi_details',
+}
+EVENT_COLUMNS = [
+    'id', 'name', 'description', 'location', 'link', 'coordinator_id',
+    'coordinator__first_name', 'coordinator__last_name', 'coordinator__email', 'event_type',
+]
+
+
+def _detail_names(event_type):
+    model = DETAIL_MODELS[event_type]
+    return [field.attname for field in model._meta.concrete_fields if field.name != 'event']
+
+
+def event_rows(queryset):
+    """One values() row per event with its coordinator and details joined; pageable like the queryset"""
+    columns = list(EVENT_COLUMNS)
+    for event_type, relation in DETAIL_RELATIONS.items():
+        columns += [f'{relation}__{name}' for name in _detail_names(event_type)]
+    return queryset.values(*columns)
+
+
+def _details(row):
+    """The nested *EventDetailsSerializer output, or None"""
+    relation = DETAIL_RELATIONS.get(row['event_type'])
+    if relation is None or row[f'{relation}__id'] is None:
+        return None
+    return {name: _format(row[f'{relation}__{name}']) for name in _detail_names(row['event_type'])}
+
+
+def build_events(rows, include_participants=True, fields=None):
+    """EventSerializer dicts for event_rows() rows, in order; fields limits the keys like ?fields= does"""
+    result = []
+    for row in rows:
+        coordinator = None
+        if row['coordinator_id'] is not None:
+            coordinator = SimpleNamespace(
+                first_name=row['coordinator__first_name'], last_name=row['coordinator__last_name'],
+                email=row['coordinator__email'],
+            )
+        result.append({
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'location': row['location'],
+            'link': str(row['link']),
+            'coordinator_name': coordinator_name(coordinator),
+            'coordinator': row['coordinator_id'],
+            'event_type': row['event_type'],
+            'event_details': _details(row),
+        })
+
+    if include_participants:
+        grouped = participants([event['id'] for event in result]) if result else {}
+        for event in result:
+            event['participants'] = grouped.get(event['id'], [])
+    if fields is not None:
+        for event in result:
+            for key in set(event) - fields:
+                del event[key]
+    return result
+
+
+def events(queryset, include_participants=True, fields=None):
+    return build_events(event_rows(queryset), include_participants, fields)
+
+
+def availabilities(event):
+    participant_ids = event.participants.values_list('id', flat=True)
+    return {
+        'weekly_match': _weekly(participant_ids),
+        'date_match': _dates(participant_ids),
+        'rsvp': [
+            {'id': pk, 'participant': participant_id, 'status': status}
+            for pk, participant_id, status in RsvpStatus.objects.filter(
+                participant_id__in=participant_ids
+            ).values_list('id', 'participant_id', 'status')
+        ],
+    }
@@ -0,0 +1,127 @@
+"""
+Date selections as sorted, non-overlapping inclusive date ranges.
+
+A participant's dates are kept as runs [(start, end), ...] sorted by start,
+with overlapping or adjacent runs merged, so a quarter-long selection is one
+pair instead of ninety rows. Union, subtraction and the per-date counts across
+participants (sweep) cost O(runs log runs), not O(days).
+
+Decoded dates get a stable id, participant_id * SLOT_ID_BASE + the date's
+ordinal, so API responses keep an id per selected date.
+"""
+import bisect
+import datetime
+import heapq
+from collections import namedtuple
+
+DateSlot = namedtuple('DateSlot', ['id', 'participant_id', 'selected_date'])
+
+DAY = datetime.timedelta(days=1)
+SLOT_ID_BASE = 10 ** 7  # above date.max.toordinal()
+
+
+def normalize(ranges):
+    """Sorted, merged runs; overlapping and adjacent ranges become one"""
+    merged = []
+    for start, end in sorted(ranges):
+        if start > end:
+            continue
+        if merged and start <= merged[-1][1] + DAY:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def from_dates(dates):
+    return normalize((date, date) for date in dates)
+
+
+def union(ranges, added):
+    return normalize(list(ranges) + list(added))
+
+
+def subtract(ranges, removed):
+    """ranges minus removed; both normalized"""
+    result = []
+    removed = normalize(removed)
+    i = 0
+    for start, end in ranges:
+        while i < len(removed) and removed[i][1] < start:
+            i += 1
+        j = i
+        while j < len(removed) and removed[j][0] <= end:
+            cut_start, cut_end = removed[j]
+            if cut_start > start:
+                result.append((start, cut_start - DAY))
+            start = max(start, cut_end + DAY)
+            j += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+def contains(ranges, date):
+    i = bisect.bisect_right(ranges, (date, datetime.date.max)) - 1
+    return i >= 0 and ranges[i][0] <= date <= ranges[i][1]
+
+
+def iter_dates(ranges):
+    for start, end in ranges:
+        date = start
+        while date <= end:
+            yield date
+            date += DAY
+
+
+def day_count(ranges):
+    return sum((end - start).days + 1 for start, end in ranges)
+
+
+def slot_id(participant_id, date):
+    return participant_id * SLOT_ID_BASE + date.toordinal()
+
+
+def parse_slot_id(value):
+    """Inverse of slot_id: (participant_id, date)"""
+    participant_id, ordinal = divmod(int(value), SLOT_ID_BASE)
+    return participant_id, datetime.date.fromordinal(ordinal)
+
+
+def decode(participant_id, ranges):
+    """DateSlot tuples for every date of the runs"""
+    return [DateSlot(slot_id(participant_id, date), participant_id, date) for date in iter_dates(ranges)]
+
+
+def sweep(ranges_by_key):
+    """
+    (start, end, keys) runs over which the same keys are selected, in date
+    order, skipping dates nobody selected. ranges_by_key maps any key (a
+    participant id) to its normalized runs.
+    """
+    boundaries = []
+    for key, ranges in ranges_by_key.items():
+        for start, end in ranges:
+            boundaries.append((start, 1, key))
+            boundaries.append((end + DAY, -1, key))
+    heapq.heapify(boundaries)
+
+    runs = []
+    active = set()
+    while boundaries:
+        date = boundaries[0][0]
+        while boundaries and boundaries[0][0] == date:
+            _, change, key = heapq.heappop(boundaries)
+            if change > 0:
+                active.add(key)
+            else:
+                active.discard(key)
+        if active and boundaries:
+            runs.append((date, boundaries[0][0] - DAY, frozenset(active)))
+    return runs
+
+
+def counts(ranges_by_key):
+    """(start, end, count) runs of the number of keys selecting each date"""
+    return [(start, end, len(keys)) for start, end, keys in sweep(ranges_by_key)]
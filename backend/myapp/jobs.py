@@ -0,0 +1,226 @@
+"""
+Database-backed background jobs.
+
+Heavy operations (event deletes, exports, guest imports, stats rebuilds) can
+be queued as Job rows instead of running inside the request: the views do so
+when the client sends ``Prefer: respond-async`` and answer 202 with the job,
+which is polled at jobs/{link}/. ``manage.py run_jobs`` claims queued jobs and
+runs them on a thread pool; no broker is involved, several workers can share
+one database.
+
+Claiming is a conditional UPDATE (status queued -> running), so two workers
+never run the same job. A failed job is retried with exponential backoff
+until max_attempts, except for JobError, which retrying cannot fix. Handlers
+report progress through their ``progress(done, total)`` argument. While a
+handler runs, a thread refreshes the job's heartbeat every
+JOB_HEARTBEAT_SECONDS, however long the handler goes without reporting; a
+running job whose heartbeat is older than JOB_STALE_SECONDS (its worker died)
+is queued again.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import stats
+from .export import FORMATS as EXPORT_FORMATS, export_rows
+from .models import Event, Job
+from .purge import delete_events
+
+logger = logging.getLogger('myapp.jobs')
+
+HANDLERS = {}
+
+
+class JobError(Exception):
+    """A failure that retrying will not fix; the job fails at once"""
+
+
+def handler(kind):
+    """Register a function(job, progress, **args) as the handler of a job kind; its return value is the result"""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, user=None, **args):
+    return Job.objects.create(
+        kind=kind, args=args,
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=getattr(settings, 'JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+class Progress:
+    """progress(done, total=None): stored at most every JOB_PROGRESS_INTERVAL seconds, and on completion"""
+
+    def __init__(self, job):
+        self.job = job
+        self.saved_at = 0
+
+    def __call__(self, done, total=None):
+        now = time.monotonic()
+        if done != total and now - self.saved_at < getattr(settings, 'JOB_PROGRESS_INTERVAL', 1.0):
+            return
+        self.saved_at = now
+        Job.objects.filter(pk=self.job.pk).update(progress_done=done, progress_total=total, heartbeat_at=timezone.now())
+
+
+class Heartbeat:
+    """Context manager refreshing a running job's heartbeat_at from a thread of its own"""
+
+    def __init__(self, job):
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+
+    def _beat(self):
+        interval = getattr(settings, 'JOB_HEARTBEAT_SECONDS', 60)
+        try:
+            while not self.stopped.wait(interval):
+                try:
+                    Job.objects.filter(pk=self.job.pk, status='running').update(heartbeat_at=timezone.now())
+                except Exception:
+                    logger.exception('Refreshing the heartbeat of job %s failed', self.job.pk)
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def requeue_stale():
+    """Jobs whose worker stopped sending heartbeats run again, or fail once out of attempts"""
+    cutoff = timezone.now() - datetime.timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 600))
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', error='The worker stopped responding.', finished_at=timezone.now()
+    )
+    stale.filter(attempts__lt=F('max_attempts')).update(status='queued')
+
+
+def claim():
+    """Mark the next runnable job running and return it, or None"""
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+    for pk in candidates.values_list('pk', flat=True)[:10]:
+        claimed = Job.objects.filter(pk=pk, status='queued').update(
+            status='running', attempts=F('attempts') + 1, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """Run a claimed job and record its result, a retry, or the failure"""
+    try:
+        func = HANDLERS.get(job.kind)
+        if func is None:
+            raise JobError(f'Unknown job kind {job.kind!r}.')
+        with Heartbeat(job):
+            result = func(job, Progress(job), **job.args)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.kind, job.attempts)
+        fields = {'error': f'{type(exc).__name__}: {exc}'}
+        if job.attempts < job.max_attempts and not isinstance(exc, JobError):
+            delay = getattr(settings, 'JOB_RETRY_BACKOFF', 5) * 2 ** (job.attempts - 1)
+            fields.update(status='queued', run_after=timezone.now() + datetime.timedelta(seconds=delay))
+        else:
+            fields.update(status='failed', finished_at=timezone.now())
+        Job.objects.filter(pk=job.pk).update(**fields)
+    else:
+        Job.objects.filter(pk=job.pk).update(status='succeeded', result=result, error='', finished_at=timezone.now())
+
+
+def run_in_thread(job):
+    """run() for pool threads, which have to close their own connections"""
+    try:
+        run(job)
+    finally:
+        connections.close_all()
+
+
+def run_pending():
+    """Run queued jobs one by one in this thread until none is runnable; returns how many ran"""
+    count = 0
+    requeue_stale()
+    while (job := claim()) is not None:
+        run(job)
+        count += 1
+    return count
+
+
+# --- Handlers ---
+
+def _event(event_id):
+    event = Event.objects.filter(pk=event_id).first()
+    if event is None:
+        raise JobError(f'Event {event_id} no longer exists.')
+    return event
+
+
+@handler('delete_event')
+def delete_event(job, progress, event_id):
+    deleted = delete_events([event_id])
+    progress(1, 1)
+    return {'deleted': bool(deleted)}
+
+
+@handler('export')
+def export(job, progress, event_id, output):
+    """Writes the export to JOB_RESULTS_DIR; jobs/{link}/download/ serves it"""
+    event = _event(event_id)
+    content_type, stream = EXPORT_FORMATS[output]
+    columns, rows = export_rows(event)
+    directory = settings.JOB_RESULTS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{job.link}.{output}'
+
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            if count % 10000 == 0:
+                progress(count)
+            yield row
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in stream(columns, counted(rows)):
+            f.write(chunk)
+    progress(count, count)
+    return {
+        'file': path.name, 'rows': count, 'content_type': content_type,
+        'filename': f'event-{event.link}.{output}',
+    }
+
+
+@handler('import_guests')
+def import_guests(job, progress, event_id, names):
+    from .serializers import GuestImportSerializer
+
+    participants = GuestImportSerializer(context={'event': _event(event_id)}).create({'names': names})
+    progress(len(participants), len(names))
+    return {'participants': [participant.id for participant in participants]}
+
+
+@handler('rebuild_stats')
+def rebuild_stats(job, progress, event_ids):
+    for done, event_id in enumerate(event_ids, 1):
+        with transaction.atomic():
+            stats.rebuild(event_id)
+        progress(done, len(event_ids))
+    return {'events': len(event_ids)}
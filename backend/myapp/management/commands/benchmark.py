@@ -0,0 +1,103 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from myapp import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API at several event sizes against query, latency and memory budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', type=int, nargs='+', default=benchmarks.DEFAULT_SCALES,
+            help='Participants per event for each seeded scale.',
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint and scale.')
+        parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON results.')
+        parser.add_argument('--budgets', help='JSON file overriding the default per-endpoint budgets.')
+        parser.add_argument(
+            '--compare-async', type=int, metavar='CONCURRENCY',
+            help='Also compare DRF (WSGI) and async event read throughput at this many concurrent requests.',
+        )
+        parser.add_argument(
+            '--compare-serialization', action='store_true',
+            help='Also time one event at the largest scale through the DRF serializers and myapp.fastpath.',
+        )
+        parser.add_argument(
+            '--compare-auth', action='store_true',
+            help='Also measure login and current-user polling with and without the cached session/user lookups.',
+        )
+        parser.add_argument(
+            '--compare-write-buffer', action='store_true',
+            help='Also count the write statements of a weekly grid drag with and without the write buffer.',
+        )
+
+    def handle(self, *args, **options):
+        budgets = benchmarks.load_budgets(options['budgets'])
+
+        # Seed into a throwaway test database, never the real one
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = benchmarks.run(options['scales'], options['iterations'])
+            comparison = None
+            if options['compare_async']:
+                comparison = benchmarks.compare_async(
+                    scale=max(options['scales']), requests=10 * options['compare_async'],
+                    concurrency=options['compare_async'],
+                )
+            serialization = None
+            if options['compare_serialization']:
+                serialization = benchmarks.compare_serialization(scale=max(options['scales']))
+            auth = benchmarks.compare_auth() if options['compare_auth'] else None
+            writes = benchmarks.compare_write_buffer() if options['compare_write_buffer'] else None
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        violations = benchmarks.check_budgets(results, budgets)
+        with open(options['output'], 'w') as f:
+            json.dump(
+                {
+                    'results': results, 'async_comparison': comparison, 'serialization_comparison': serialization,
+                    'auth_comparison': auth, 'write_buffer_comparison': writes,
+                    'budgets': budgets, 'violations': violations,
+                },
+                f, indent=2,
+            )
+
+        for result in results:
+            self.stdout.write(
+                f"{result['endpoint']:<36} {result['scale']:>6} {result['queries']:>4}q "
+                f"p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  {result['peak_memory_kb']:>9.1f}KB"
+            )
+        if comparison:
+            for path in ['wsgi', 'asgi']:
+                row = comparison[path]
+                self.stdout.write(
+                    f"{path} reads x{comparison['concurrency']:<4} {row['requests_per_s']:>8.1f} req/s  "
+                    f"p95 {row['p95_ms']:>9.2f}ms  {row['peak_threads']} threads"
+                )
+        if serialization:
+            self.stdout.write(
+                f"serialization x{serialization['scale']}: serializers {serialization['serializers']['p50_ms']:.2f}ms  "
+                f"fastpath {serialization['fastpath']['p50_ms']:.2f}ms  ({serialization['speedup']}x)"
+            )
+        if auth:
+            for name in ['uncached', 'cached']:
+                row = auth[name]
+                self.stdout.write(
+                    f"auth {name:<9} current-user {row['current_user_per_s']:>8.1f} req/s "
+                    f"{row['current_user_queries']}q  login p50 {row['login_p50_ms']:.2f}ms ({auth['hasher']})"
+                )
+        if writes:
+            for name in ['write_through', 'buffered']:
+                row = writes[name]
+                self.stdout.write(
+                    f"weekly drag {name:<13} {writes['toggles']} toggles  {row['write_statements']:>5} writes  "
+                    f"{row['total_ms']:>8.1f}ms"
+                )
+        self.stdout.write(f"Results written to {options['output']}")
+        if violations:
+            raise CommandError('Budgets exceeded:\n' + '\n'.join(violations))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget.'))
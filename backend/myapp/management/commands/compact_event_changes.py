@@ -0,0 +1,23 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from myapp.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Compact the event change log: fold old entries into expiry markers and drop deleted events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=getattr(settings, 'CHANGE_LOG_RETENTION_HOURS', 72),
+            help='Keep entries newer than this many hours.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Events compacted per transaction.')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - datetime.timedelta(hours=options['hours'])
+        deleted = compact_changes(before, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} change log entries.'))
@@ -0,0 +1,69 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from myapp import intervals
+from myapp.models import DateAvailability, DateAvailabilityRange
+from myapp.storage import raw_delete
+
+
+class Command(BaseCommand):
+    help = 'Move date availability between row storage and date ranges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=['ranges', 'rows'])
+        parser.add_argument('--batch-size', type=int, default=500, help='Participants converted per transaction.')
+
+    def handle(self, *args, **options):
+        if options['target'] == 'ranges':
+            converted = self.rows_to_ranges(options['batch_size'])
+        else:
+            converted = self.ranges_to_rows(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted date availability for {converted} participants. "
+            f"Set DATE_AVAILABILITY_STORAGE = '{options['target']}' to serve it."
+        ))
+
+    def batches(self, queryset, batch_size):
+        ids = list(queryset.values_list('participant_id', flat=True).distinct().order_by('participant_id'))
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+
+    def rows_to_ranges(self, batch_size):
+        converted = 0
+        for participant_ids in self.batches(DateAvailability.objects.all(), batch_size):
+            with transaction.atomic():
+                ranges = defaultdict(list)
+                existing = DateAvailabilityRange.objects.select_for_update().filter(participant_id__in=participant_ids)
+                for participant_id, start_date, end_date in existing.values_list('participant_id', 'start_date', 'end_date'):
+                    ranges[participant_id].append((start_date, end_date))
+                rows = DateAvailability.objects.filter(participant_id__in=participant_ids)
+                for participant_id, date in rows.values_list('participant_id', 'selected_date'):
+                    ranges[participant_id].append((date, date))
+
+                # The selection itself does not change, so neither stats nor subscribers hear about it
+                raw_delete(existing)
+                DateAvailabilityRange.objects.bulk_create([
+                    DateAvailabilityRange(participant_id=participant_id, start_date=start, end_date=end)
+                    for participant_id, runs in ranges.items()
+                    for start, end in intervals.normalize(runs)
+                ], batch_size=1000)
+                raw_delete(rows)
+            converted += len(participant_ids)
+        return converted
+
+    def ranges_to_rows(self, batch_size):
+        converted = 0
+        for participant_ids in self.batches(DateAvailabilityRange.objects.all(), batch_size):
+            with transaction.atomic():
+                runs = DateAvailabilityRange.objects.filter(participant_id__in=participant_ids)
+                rows = [
+                    DateAvailability(participant_id=participant_id, selected_date=date)
+                    for participant_id, start_date, end_date in runs.values_list('participant_id', 'start_date', 'end_date')
+                    for date in intervals.iter_dates([(start_date, end_date)])
+                ]
+                DateAvailability.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+                raw_delete(runs)
+            converted += len(participant_ids)
+        return converted
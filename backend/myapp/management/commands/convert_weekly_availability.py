@@ -0,0 +1,103 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from myapp import bitsets, stats
+from myapp.models import Participant, WeeklyAvailability, WeeklyAvailabilityMask
+from myapp.storage import BitsetWeeklyStore, RowWeeklyStore, raw_delete
+
+
+class Command(BaseCommand):
+    help = 'Move weekly availability between row storage and packed bitset masks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=['bitset', 'rows'])
+        parser.add_argument(
+            '--slot-minutes', type=int, default=getattr(settings, 'WEEKLY_SLOT_MINUTES', 15),
+            help='Slot size for newly created masks.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Participants converted per transaction.')
+
+    def handle(self, *args, **options):
+        if options['target'] == 'bitset':
+            converted = self.rows_to_bitset(options['slot_minutes'], options['batch_size'])
+        else:
+            converted = self.bitset_to_rows(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted weekly availability for {converted} participants. "
+            f"Set WEEKLY_AVAILABILITY_STORAGE = '{options['target']}' to serve it."
+        ))
+
+    def rebuild_stats(self, participant_ids, store):
+        """
+        Old rows or masks are removed with raw deletes, which skip the per-row
+        signal handlers: the selection does not change, so nothing should be
+        subtracted from the stats or published. The aggregates are rebuilt
+        from the converted data instead (store: the target storage, which the
+        settings do not point at yet).
+        """
+        event_ids = Participant.objects.filter(id__in=participant_ids).values_list('event_id', flat=True).distinct()
+        for event_id in list(event_ids):
+            stats.rebuild(event_id, weekly_store=store)
+
+    def batches(self, queryset, batch_size):
+        ids = list(queryset.values_list('participant_id', flat=True).distinct().order_by('participant_id'))
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+
+    def rows_to_bitset(self, slot_minutes, batch_size):
+        converted = 0
+        for participant_ids in self.batches(WeeklyAvailability.objects.all(), batch_size):
+            with transaction.atomic():
+                masks = {
+                    mask.participant_id: mask
+                    for mask in WeeklyAvailabilityMask.objects.select_for_update().filter(participant_id__in=participant_ids)
+                }
+                values = defaultdict(int)
+                rows = WeeklyAvailability.objects.filter(participant_id__in=participant_ids)
+                for participant_id, day, start_time in rows.values_list(
+                    'participant_id', 'selected_day', 'selected_start_time'
+                ):
+                    mask_minutes = masks[participant_id].slot_minutes if participant_id in masks else slot_minutes
+                    try:
+                        values[participant_id] |= 1 << bitsets.slot_index(day, start_time, mask_minutes)
+                    except ValueError as exc:
+                        raise CommandError(f'Participant {participant_id}, {day} {start_time}: {exc}')
+
+                new_masks = []
+                for participant_id, value in values.items():
+                    if participant_id in masks:
+                        mask = masks[participant_id]
+                        mask.bits = bitsets.to_bytes(bitsets.from_bytes(mask.bits) | value)
+                    else:
+                        new_masks.append(WeeklyAvailabilityMask(
+                            participant_id=participant_id, slot_minutes=slot_minutes, bits=bitsets.to_bytes(value)
+                        ))
+                WeeklyAvailabilityMask.objects.bulk_update(masks.values(), ['bits'])
+                WeeklyAvailabilityMask.objects.bulk_create(new_masks)
+                raw_delete(rows)
+                self.rebuild_stats(participant_ids, BitsetWeeklyStore(slot_minutes))
+            converted += len(participant_ids)
+        return converted
+
+    def bitset_to_rows(self, batch_size):
+        converted = 0
+        for participant_ids in self.batches(WeeklyAvailabilityMask.objects.all(), batch_size):
+            with transaction.atomic():
+                masks = WeeklyAvailabilityMask.objects.filter(participant_id__in=participant_ids)
+                rows = [
+                    WeeklyAvailability(
+                        participant_id=slot.participant_id,
+                        selected_day=slot.selected_day,
+                        selected_start_time=slot.selected_start_time,
+                    )
+                    for participant_id, slot_minutes, bits in masks.values_list('participant_id', 'slot_minutes', 'bits')
+                    for slot in bitsets.decode(participant_id, bitsets.from_bytes(bits), slot_minutes)
+                ]
+                WeeklyAvailability.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+                raw_delete(masks)
+                self.rebuild_stats(participant_ids, RowWeeklyStore())
+            converted += len(participant_ids)
+        return converted
@@ -0,0 +1,52 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from myapp import purge
+from myapp.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Delete expired events, guest users left without events and old finished jobs, in throttled batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'EVENT_RETENTION_DAYS', 90),
+            help='Delete dated events whose last date is more than this many days ago.',
+        )
+        parser.add_argument(
+            '--guest-hours', type=int, default=getattr(settings, 'GUEST_GRACE_HOURS', 24),
+            help='Only delete orphaned guests created more than this many hours ago.',
+        )
+        parser.add_argument(
+            '--job-days', type=int, default=getattr(settings, 'JOB_RETENTION_DAYS', 7),
+            help='Delete jobs finished more than this many days ago.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=purge.batch_size(), help='Rows deleted per transaction.',
+        )
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted.')
+
+    def handle(self, *args, **options):
+        expired = Event.objects.expired(timezone.localdate() - datetime.timedelta(days=options['days']))
+        joined_before = timezone.now() - datetime.timedelta(hours=options['guest_hours'])
+        finished_before = timezone.now() - datetime.timedelta(days=options['job_days'])
+
+        if options['dry_run']:
+            self.stdout.write(
+                f'Would delete {expired.count()} expired events, {purge.orphaned_guests(joined_before).count()} orphaned guests '
+                f'and {purge.finished_jobs(finished_before).count()} jobs.'
+            )
+            return
+
+        size, pause = options['batch_size'], options['pause']
+        events = purge.purge_events(expired, size, pause)
+        # After the events, whose guests have just become orphans
+        guests = purge.purge_guests(joined_before, size, pause)
+        jobs = purge.purge_jobs(finished_before, size, pause)
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {events} expired events, {guests} orphaned guests and {jobs} jobs.'
+        ))
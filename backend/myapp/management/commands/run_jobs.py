@@ -0,0 +1,52 @@
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from myapp import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (myapp.jobs) on a thread pool until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=getattr(settings, 'JOB_WORKER_THREADS', 4),
+            help='Jobs run at the same time.',
+        )
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Run the runnable jobs one by one, then exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = jobs.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs.'))
+            return
+
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            # Running jobs finish; nothing new is claimed
+            self.stdout.write('Stopping after the running jobs finish...')
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        threads = max(1, options['threads'])
+        running = set()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job') as pool:
+            while not stopping.is_set():
+                jobs.requeue_stale()
+                job = jobs.claim() if len(running) < threads else None
+                if job is not None:
+                    self.stdout.write(f'Running {job}')
+                    running.add(pool.submit(jobs.run_in_thread, job))
+                    continue
+                if running:
+                    done, running = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                else:
+                    stopping.wait(options['poll'])
+        self.stdout.write(self.style.SUCCESS('Job worker stopped.'))
@@ -0,0 +1,126 @@
+"""
+Opt-in request profiling.
+
+RequestProfilingMiddleware times each sampled request and every SQL statement
+it runs (through connection.execute_wrapper), then reports the totals in a
+Server-Timing header and one JSON log line on the ``myapp.profiling`` logger.
+Statements are grouped by their SQL text with placeholders, so the same query
+run repeatedly with different parameters (the N+1 signature) is reported as a
+duplicate. Requests slower than REQUEST_PROFILING_CPROFILE_MS can also be
+dumped as cProfile stats.
+
+With REQUEST_PROFILING_ENABLED off the middleware removes itself at startup
+(MiddlewareNotUsed), so it costs nothing.
+"""
+import cProfile
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger('myapp.profiling')
+
+
+class QueryRecorder:
+    """execute_wrapper that records the duration of every statement, grouped by SQL text"""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations[sql].append(time.perf_counter() - start)
+
+    @property
+    def count(self):
+        return sum(len(durations) for durations in self.durations.values())
+
+    @property
+    def total(self):
+        return sum(sum(durations) for durations in self.durations.values())
+
+    def duplicates(self):
+        """Statements run more than once, most repeated first"""
+        repeated = [(sql, len(durations)) for sql, durations in self.durations.items() if len(durations) > 1]
+        return sorted(repeated, key=lambda item: -item[1])
+
+    def slowest(self, limit):
+        statements = [(sql, duration) for sql, durations in self.durations.items() for duration in durations]
+        return sorted(statements, key=lambda item: -item[1])[:limit]
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 1.0)
+        self.slowest_count = getattr(settings, 'REQUEST_PROFILING_SLOWEST', 5)
+        self.cprofile_ms = getattr(settings, 'REQUEST_PROFILING_CPROFILE_MS', None)
+        self.cprofile_dir = Path(getattr(settings, 'REQUEST_PROFILING_CPROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile() if self.cprofile_ms is not None else None
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            if profiler:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        self.report(request, response, elapsed, recorder)
+        if profiler and elapsed * 1000 >= self.cprofile_ms:
+            self.dump(request, profiler)
+        return response
+
+    def report(self, request, response, elapsed, recorder):
+        duplicates = recorder.duplicates()
+        sql_ms = recorder.total * 1000
+        # Streaming bodies are produced after this point, so their timings only cover the view
+        if not isinstance(response, StreamingHttpResponse):
+            response['Server-Timing'] = ', '.join([
+                f'app;dur={elapsed * 1000:.1f}',
+                f'db;dur={sql_ms:.1f};desc="{recorder.count} queries"',
+                f'dup;desc="{sum(count - 1 for _, count in duplicates)} duplicate queries"',
+            ])
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'queries': recorder.count,
+            'sql_ms': round(sql_ms, 2),
+            'duplicates': [{'sql': sql, 'count': count} for sql, count in duplicates[:self.slowest_count]],
+            'slowest': [
+                {'sql': sql, 'ms': round(duration * 1000, 2)}
+                for sql, duration in recorder.slowest(self.slowest_count)
+            ],
+        }))
+
+    def dump(self, request, profiler):
+        self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{request.path.strip('/').replace('/', '_') or 'root'}"
+        path = self.cprofile_dir / f'{name}-{time.perf_counter_ns()}.prof'
+        profiler.dump_stats(path)
+        logger.info(json.dumps({'path': request.path, 'cprofile': str(path)}))
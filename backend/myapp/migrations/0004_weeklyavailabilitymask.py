@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_alter_rsvpmultidayeventdetails_end_time_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyAvailabilityMask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=15)),
+                ('bits', models.BinaryField(default=b'')),
+                ('participant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_mask', to='myapp.participant')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('participant_count', models.PositiveIntegerField(default=0)),
+                ('rsvp_available', models.IntegerField(default=0)),
+                ('rsvp_unavailable', models.IntegerField(default=0)),
+                ('rsvp_tentative', models.IntegerField(default=0)),
+                ('rsvp_no_response', models.IntegerField(default=0)),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=15)),
+                ('weekly_counts', models.BinaryField(default=b'')),
+                ('date_origin', models.DateField(blank=True, null=True)),
+                ('date_counts', models.BinaryField(default=b'')),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='myapp.event')),
+            ],
+            options={
+                'verbose_name_plural': 'Event stats',
+            },
+        ),
+    ]
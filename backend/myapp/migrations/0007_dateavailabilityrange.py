@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_eventstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DateAvailabilityRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='date_ranges', to='myapp.participant')),
+            ],
+            options={
+                'ordering': ['participant_id', 'start_date'],
+                'indexes': [models.Index(fields=['participant', 'start_date'], name='date_range_participant_idx')],
+            },
+        ),
+    ]
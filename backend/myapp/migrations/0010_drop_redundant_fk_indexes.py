@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dateavailability',
+            name='participant',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='date_availabilities', to='myapp.participant'),
+        ),
+        migrations.AlterField(
+            model_name='dateavailabilityrange',
+            name='participant',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='date_ranges', to='myapp.participant'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='coordinator',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coordinated_events', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='participant',
+            name='event',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='myapp.event'),
+        ),
+        migrations.AlterField(
+            model_name='participant',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='participations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='weeklyavailability',
+            name='participant',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='weekly_availabilities', to='myapp.participant'),
+        ),
+    ]
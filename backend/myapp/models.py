@@ -2,6 +2,8 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 import uuid
 
 # ---------------------------------------------------
@@ -40,6 +42,61 @@ class CustomUser(AbstractUser):
 # EVENT MODELS
 # ---------------------------------------------------
 
+class EventQuerySet(models.QuerySet):
+    def dashboard(self, user):
+        """
+        Events the user coordinates or joined, one row each, annotated with
+        participant and RSVP counts and the date range of the event details.
+        Participants and RSVP statuses are joined one-to-one, so the counts
+        are a single grouped query whose cost does not grow with nested data.
+        """
+        joined = Participant.objects.filter(event=models.OuterRef('pk'), user=user)
+        rsvp_counts = {
+            f'rsvp_{status}': models.Count(
+                'participants', filter=models.Q(participants__rsvp_status__status=status)
+            )
+            for status, _ in RsvpStatus.RSVP_CHOICES if status != 'no_response'
+        }
+        return (
+            self.filter(models.Q(coordinator=user) | models.Exists(joined))
+            .select_related('coordinator')
+            .only(
+                'id', 'name', 'link', 'event_type',
+                'coordinator__email', 'coordinator__first_name', 'coordinator__last_name',
+            )
+            .annotate(
+                participant_count=models.Count('participants'),
+                **rsvp_counts,
+                start_date=Coalesce(
+                    'date_match_details__start_date', 'rsvp_single_details__date', 'rsvp_multi_details__start_date'
+                ),
+                end_date=Coalesce(
+                    'date_match_details__end_date', 'rsvp_single_details__date', 'rsvp_multi_details__end_date'
+                ),
+            )
+            .order_by('id')
+        )
+
+    def expired(self, before):
+        """Dated events whose last date is before the given date; weekly events recur and never expire"""
+        return self.annotate(
+            last_date=Coalesce(
+                'date_match_details__end_date', 'rsvp_single_details__date', 'rsvp_multi_details__end_date'
+            ),
+        ).filter(last_date__lt=before)
+
+    def with_related(self, participants=True):
+        """Load the coordinator, event details and (optionally) participants in a fixed number of queries"""
+        queryset = self.select_related(
+            'coordinator',
+            'weekly_details', 'date_match_details', 'rsvp_single_details', 'rsvp_multi_details',
+        )
+        if participants:
+            queryset = queryset.prefetch_related(
+                models.Prefetch('participants', queryset=Participant.objects.with_related().order_by('id'))
+            )
+        return queryset
+
 class Event(models.Model):
     """Base Event Model with shared fields"""
     EVENT_TYPE_CHOICES = [
@@ -57,9 +114,18 @@ class Event(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
         null=True, blank=True,
-        related_name='coordinated_events'
+        related_name='coordinated_events',
+        db_index=False,  # event_coordinator_id_idx leads with it
     )
     event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES, null=True)
+
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # "My events": filter by coordinator, ordered/paginated by id
+            models.Index(fields=['coordinator', 'id'], name='event_coordinator_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.get_event_type_display()})"
@@ -124,13 +190,31 @@ class RsvpMultiDayEventDetails(models.Model):
 # PARTICIPANT MODEL
 # ---------------------------------------------------
 
+class ParticipantQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load the user, RSVP status and availabilities needed by ParticipantSerializer"""
+        dates = 'date_ranges' if getattr(settings, 'DATE_AVAILABILITY_STORAGE', 'rows') == 'ranges' else 'date_availabilities'
+        return self.select_related('user', 'rsvp_status', 'weekly_mask').prefetch_related(
+            'weekly_availabilities', dates
+        )
+
 class Participant(models.Model):
     """User participation in events"""
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='participations')
-    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='participants')
+    # Both lead a composite index below, so neither needs one of its own
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='participations', db_index=False
+    )
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='participants', db_index=False)
+
+    objects = ParticipantQuerySet.as_manager()
     
     class Meta:
+        # The unique index leads with user, serving "events I joined"
         unique_together = ['user', 'event']
+        indexes = [
+            # Event rosters joined to users, without touching the table
+            models.Index(fields=['event', 'user'], name='participant_event_user_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.event.name}"
@@ -139,8 +223,7 @@ class Participant(models.Model):
 # AVAILABILITY MODELS
 # ---------------------------------------------------
 class WeeklyAvailability(models.Model):
-    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='weekly_availabilities')
-    selected_day = models.CharField(max_length=10, default='mon', choices=[
+    DAY_CHOICES = [
         ('mon', 'Monday'),
         ('tue', 'Tuesday'),
         ('wed', 'Wednesday'),
@@ -148,7 +231,13 @@ class WeeklyAvailability(models.Model):
         ('fri', 'Friday'),
         ('sat', 'Saturday'),
         ('sun', 'Sunday'),
-    ])
+    ]
+
+    # Leads the unique index, so no index of its own
+    participant = models.ForeignKey(
+        Participant, on_delete=models.CASCADE, related_name='weekly_availabilities', db_index=False
+    )
+    selected_day = models.CharField(max_length=10, default='mon', choices=DAY_CHOICES)
     selected_start_time = models.TimeField()
 
     class Meta:
@@ -158,11 +247,22 @@ class WeeklyAvailability(models.Model):
         return f"{self.participant} - {self.selected_day} at {self.selected_start_time.strftime('%H:%M')}"
 
 
+class WeeklyAvailabilityMask(models.Model):
+    """Packed weekly availability: one bit per (day, slot) for a participant, see myapp.bitsets"""
+    participant = models.OneToOneField(Participant, on_delete=models.CASCADE, related_name='weekly_mask')
+    slot_minutes = models.PositiveSmallIntegerField(default=15)
+    bits = models.BinaryField(default=b'')
+
+    def __str__(self):
+        return f"{self.participant} - weekly mask ({self.slot_minutes} min slots)"
+
+
 class DateAvailability(models.Model):
     participant = models.ForeignKey(
         Participant,
         on_delete=models.CASCADE,
-        related_name='date_availabilities'
+        related_name='date_availabilities',
+        db_index=False,  # leads the unique index
     )
     selected_date = models.DateField()
 
@@ -174,7 +274,39 @@ class DateAvailability(models.Model):
         return f"{self.participant} - {self.selected_date}"
 
 
+class DateAvailabilityRange(models.Model):
+    """
+    A run of consecutive selected dates (inclusive), used instead of
+    DateAvailability rows when DATE_AVAILABILITY_STORAGE = 'ranges'; a
+    participant's runs never overlap or touch (see myapp.intervals).
+    """
+    participant = models.ForeignKey(
+        Participant,
+        on_delete=models.CASCADE,
+        related_name='date_ranges',
+        db_index=False,  # leads date_range_participant_idx
+    )
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    class Meta:
+        ordering = ['participant_id', 'start_date']
+        indexes = [
+            models.Index(fields=['participant', 'start_date'], name='date_range_participant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.participant} - {self.start_date} to {self.end_date}"
+
+
 class RsvpStatus(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remember the stored status so EventStats can move the count from it
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     participant = models.OneToOneField(
         Participant,
         on_delete=models.CASCADE,
@@ -192,4 +324,92 @@ class RsvpStatus(models.Model):
         verbose_name_plural = 'RSVP statuses'
 
     def __str__(self):
-        return f"{self.participant.user} - {self.status}"
\ No newline at end of file
+        return f"{self.participant.user} - {self.status}"
+
+
+# ---------------------------------------------------
+# AGGREGATES
+# ---------------------------------------------------
+
+class EventStats(models.Model):
+    """Denormalised per-event counts, kept up to date incrementally by myapp.stats"""
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='stats')
+    participant_count = models.PositiveIntegerField(default=0)
+    rsvp_available = models.IntegerField(default=0)
+    rsvp_unavailable = models.IntegerField(default=0)
+    rsvp_tentative = models.IntegerField(default=0)
+    rsvp_no_response = models.IntegerField(default=0)
+    # Packed little-endian uint32 counts: one per weekly slot, and one per day from date_origin
+    slot_minutes = models.PositiveSmallIntegerField(default=15)
+    weekly_counts = models.BinaryField(default=b'')
+    date_origin = models.DateField(null=True, blank=True)
+    date_counts = models.BinaryField(default=b'')
+
+    class Meta:
+        verbose_name_plural = 'Event stats'
+
+    def __str__(self):
+        return f"{self.event} - stats"
+
+
+class EventChange(models.Model):
+    """
+    Append-only log of the change messages published for an event (myapp.changes);
+    the id is the cursor clients pass as ?since=. Compaction folds old entries into
+    one marker row whose messages are null.
+    """
+    event_link = models.UUIDField()
+    messages = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event_link', 'id'], name='event_change_cursor_idx'),
+            models.Index(fields=['created_at'], name='event_change_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_link} #{self.id}"
+
+
+# ---------------------------------------------------
+# BACKGROUND JOBS
+# ---------------------------------------------------
+
+class Job(models.Model):
+    """A queued heavy operation, run by `manage.py run_jobs` (see myapp.jobs)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    # Jobs are looked up by link like events, so whoever started one can poll it without an account
+    link = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    kind = models.CharField(max_length=50)
+    args = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs'
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Refreshed while the job runs; a running job whose heartbeat is stale is requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
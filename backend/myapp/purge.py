@@ -0,0 +1,184 @@
+"""
+Set-based deletes for events and stale data.
+
+Model.delete() runs Django's collector, which loads every participant and
+availability row of an event into memory (to send their delete signals)
+before deleting them one table at a time. delete_events() instead issues raw
+DELETEs in dependency order, a batch of participant ids at a time, so memory
+and statement size stay bounded however large the event. The per-row signal
+receivers do not run; their only effects worth keeping for a deleted event
+are the cache invalidation and the event_deleted message, sent here once per
+event. EventStats rows are deleted with their event.
+
+delete_participants() is the same for single participants leaving an event:
+their rows are deleted set-based, and the stats delta and change messages
+the per-row receivers would have produced are applied once per event.
+
+purge_events(), purge_guests() and purge_jobs() back `manage.py purge_stale`:
+they delete in batches of batch_size, one transaction per batch, sleeping
+pause seconds between batches so a purge does not monopolise the database.
+"""
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from . import stats
+from .authentication import forget_user
+from .cache import event_link, get_cache
+from .changes import event_changed
+from .models import (
+    CustomUser, Event, EventStats, Job, Participant,
+    WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails, RsvpMultiDayEventDetails,
+    WeeklyAvailability, WeeklyAvailabilityMask, DateAvailability, DateAvailabilityRange, RsvpStatus,
+)
+from .storage import get_date_store, get_weekly_store, raw_delete
+
+# Rows referencing a participant, deleted before the participants themselves
+PARTICIPANT_DATA = [
+    WeeklyAvailability, WeeklyAvailabilityMask, DateAvailability, DateAvailabilityRange, RsvpStatus,
+]
+# Rows referencing an event, deleted before the events themselves
+EVENT_DATA = [
+    WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails, RsvpMultiDayEventDetails,
+    EventStats,
+]
+
+
+def batch_size():
+    return getattr(settings, 'PURGE_BATCH_SIZE', 500)
+
+
+def _delete_participant_rows(participant_ids, count):
+    """Raw-delete participants and the rows referencing them; count(model, rows) receives the row counts"""
+    for model in PARTICIPANT_DATA:
+        count(model, raw_delete(model.objects.filter(participant_id__in=participant_ids)))
+    count(Participant, raw_delete(Participant.objects.filter(pk__in=participant_ids)))
+    get_cache().delete_many([
+        key for pk in participant_ids for key in (f'participant-event:{pk}', f'participant-event-id:{pk}')
+    ])
+
+
+def _counter(deleted):
+    def count(model, rows):
+        if rows:
+            deleted[model._meta.label] = deleted.get(model._meta.label, 0) + rows
+    return count
+
+
+def delete_participants(participant_ids):
+    """
+    Delete participants with everything referencing them, in one transaction;
+    returns the number of rows deleted per model label.
+    """
+    deleted = {}
+    with transaction.atomic():
+        by_event = defaultdict(list)
+        for pk, event_id in Participant.objects.filter(pk__in=list(participant_ids)).values_list('id', 'event_id'):
+            by_event[event_id].append(pk)
+        for event_id, pks in by_event.items():
+            # What the receivers would have subtracted row by row, read before the rows go
+            weekly = [(day, start_time) for _, day, start_time in get_weekly_store().slot_tuples(pks)]
+            dates = [run for runs in get_date_store().date_ranges(pks).values() for run in runs]
+            rsvp = dict(
+                RsvpStatus.objects.filter(participant_id__in=pks)
+                .values_list('status').annotate(count=Count('id')).order_by()
+            )
+            rsvp['no_response'] = rsvp.get('no_response', 0) + len(pks) - sum(rsvp.values())
+            stats.record(
+                event_id, participants=-len(pks), rsvp={status: -count for status, count in rsvp.items()},
+                weekly_removed=weekly, date_ranges_removed=dates,
+            )
+            link = event_link(event_id)
+            _delete_participant_rows(pks, _counter(deleted))
+            event_changed(link, [{'type': 'participant_left', 'participant': pk} for pk in pks])
+    return deleted
+
+
+def delete_events(event_ids, size=None):
+    """
+    Delete the events and everything that cascades from them; returns the
+    number of rows deleted per model label. Runs in one transaction, so
+    callers deleting many events should pass them in batches.
+    """
+    size = size or batch_size()
+    event_ids = list(event_ids)
+    deleted = {}
+    count = _counter(deleted)
+
+    with transaction.atomic():
+        links = list(Event.objects.filter(pk__in=event_ids).values_list('id', 'link'))
+        participants = Participant.objects.filter(event_id__in=event_ids).order_by('id')
+        while participant_ids := list(participants.values_list('id', flat=True)[:size]):
+            _delete_participant_rows(participant_ids, count)
+        for model in EVENT_DATA:
+            count(model, raw_delete(model.objects.filter(event_id__in=event_ids)))
+        count(Event, raw_delete(Event.objects.filter(pk__in=event_ids)))
+
+        get_cache().delete_many([f'event-link:{pk}' for pk, _ in links])
+        for _, link in links:
+            event_changed(link, [{'type': 'event_deleted'}])
+    return deleted
+
+
+def _batches(queryset, size, pause):
+    """Primary keys of queryset, size at a time, until it is empty; queryset must shrink as batches are handled"""
+    first = True
+    while pks := list(queryset.order_by('pk').values_list('pk', flat=True)[:size]):
+        if not first and pause:
+            time.sleep(pause)
+        first = False
+        yield pks
+
+
+def purge_events(queryset, size=None, pause=0):
+    """delete_events() over a queryset, size events per transaction; returns the number of events deleted"""
+    size = size or batch_size()
+    purged = 0
+    for event_ids in _batches(queryset, size, pause):
+        purged += delete_events(event_ids, size).get(Event._meta.label, 0)
+    return purged
+
+
+def orphaned_guests(joined_before):
+    """
+    Guest users (created by name, without an account) no longer participating
+    in any event; only those created before joined_before, so a guest whose
+    join is still in flight is never taken for an orphan.
+    """
+    return CustomUser.objects.filter(is_registered=False, participations__isnull=True, date_joined__lt=joined_before)
+
+
+def purge_guests(joined_before, size=None, pause=0):
+    """Delete orphaned guests in batches; returns how many were deleted"""
+    size = size or batch_size()
+    purged = 0
+    for user_ids in _batches(orphaned_guests(joined_before), size, pause):
+        with transaction.atomic():
+            # Guests cannot sign in, so these are normally empty; cleared anyway before the raw delete
+            Event.objects.filter(coordinator_id__in=user_ids).update(coordinator=None)
+            Job.objects.filter(created_by_id__in=user_ids).update(created_by=None)
+            for through in (CustomUser.groups.through, CustomUser.user_permissions.through):
+                raw_delete(through.objects.filter(customuser_id__in=user_ids))
+            purged += raw_delete(CustomUser.objects.filter(pk__in=user_ids))
+        for user_id in user_ids:
+            forget_user(user_id)
+    return purged
+
+
+def finished_jobs(before):
+    return Job.objects.filter(status__in=['succeeded', 'failed'], finished_at__lt=before)
+
+
+def purge_jobs(before, size=None, pause=0):
+    """Delete jobs that finished before the given time, with the files of export jobs"""
+    size = size or batch_size()
+    purged = 0
+    for job_ids in _batches(finished_jobs(before), size, pause):
+        for result in Job.objects.filter(pk__in=job_ids, kind='export').values_list('result', flat=True):
+            if result and 'file' in result:
+                (settings.JOB_RESULTS_DIR / result['file']).unlink(missing_ok=True)
+        purged += raw_delete(Job.objects.filter(pk__in=job_ids))
+    return purged
@@ -1,19 +1,58 @@
+import csv
+import io
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
 from rest_framework import serializers
+from . import stats
+from .changes import event_changed
 from .models import (
     Event,
     WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails, RsvpMultiDayEventDetails,
     Participant, CustomUser,
-    WeeklyAvailability, DateAvailability, RsvpStatus
+    WeeklyAvailability, DateAvailability, RsvpStatus, Job
 )
+from .storage import get_weekly_store, get_date_store
+from .writebuffer import get_weekly_writer
 import uuid
 
+# --- Sparse Fieldsets ---
+
+class SparseFieldsMixin:
+    """
+    Drops fields not listed in ?fields=a,b of the request in the serializer context,
+    and expandable fields not listed in context['expand'] when the view sets it.
+    """
+    expandable_fields = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields = request.query_params.get('fields') if request is not None else None
+        if fields:
+            allowed = {name.strip() for name in fields.split(',')}
+            for name in set(self.fields) - allowed:
+                self.fields.pop(name)
+        if 'expand' in self.context:
+            for name in set(self.expandable_fields) - set(self.context['expand']):
+                self.fields.pop(name, None)
+
 # --- Event Serializers ---
 
-class EventSerializer(serializers.ModelSerializer):
+def coordinator_name(coordinator):
+    if coordinator:
+        full_name = f"{coordinator.first_name} {coordinator.last_name}".strip()
+        return full_name if full_name else coordinator.email
+    return "Unknown"
+
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     event_details = serializers.SerializerMethodField()
     participants = serializers.SerializerMethodField()
     coordinator_name = serializers.SerializerMethodField()
 
+    expandable_fields = ['participants']
+
     class Meta:
         model = Event
         fields = [
@@ -26,10 +65,7 @@ class EventSerializer(serializers.ModelSerializer):
         }
 
     def get_coordinator_name(self, obj):
-        if obj.coordinator:
-            full_name = f"{obj.coordinator.first_name} {obj.coordinator.last_name}".strip()
-            return full_name if full_name else obj.coordinator.email
-        return "Unknown"
+        return coordinator_name(obj.coordinator)
 
     def get_event_details(self, obj):
         if obj.event_type == 'weekly_match':
@@ -150,6 +186,33 @@ class EventSerializer(serializers.ModelSerializer):
 
         return instance
 
+class DashboardEventSerializer(serializers.ModelSerializer):
+    """One summary row per event of Event.objects.dashboard(); reads only annotations"""
+    coordinator_name = serializers.SerializerMethodField()
+    participant_count = serializers.IntegerField(read_only=True)
+    rsvp = serializers.SerializerMethodField()
+    start_date = serializers.DateField(read_only=True)
+    end_date = serializers.DateField(read_only=True)
+
+    class Meta:
+        model = Event
+        fields = [
+            'id', 'name', 'link', 'event_type', 'coordinator_name',
+            'start_date', 'end_date', 'participant_count', 'rsvp',
+        ]
+
+    def get_coordinator_name(self, obj):
+        return coordinator_name(obj.coordinator)
+
+    def get_rsvp(self, obj):
+        counts = {
+            status: getattr(obj, f'rsvp_{status}')
+            for status, _ in RsvpStatus.RSVP_CHOICES if status != 'no_response'
+        }
+        # Participants without an RSVP row have not responded either
+        counts['no_response'] = obj.participant_count - sum(counts.values())
+        return counts
+
 # --- Event Details Serializers (for nested use) ---
 
 class WeeklyEventDetailsSerializer(serializers.ModelSerializer):
@@ -213,25 +276,123 @@ class WeeklyAvailabilitySerializer(serializers.ModelSerializer):
             'id', 'participant', 'selected_day', 'selected_start_time'
         ]
 
+class WeeklySlotSerializer(serializers.Serializer):
+    """WeeklyAvailabilitySerializer-compatible shape for slots held in a packed weekly mask"""
+    id = serializers.IntegerField(read_only=True)
+    participant = serializers.PrimaryKeyRelatedField(queryset=Participant.objects.all())
+    selected_day = serializers.ChoiceField(choices=WeeklyAvailability.DAY_CHOICES)
+    selected_start_time = serializers.TimeField()
+
+    def to_representation(self, instance):
+        return {
+            'id': instance.id,
+            'participant': instance.participant_id,
+            'selected_day': instance.selected_day,
+            'selected_start_time': self.fields['selected_start_time'].to_representation(instance.selected_start_time),
+        }
+
+    def create(self, validated_data):
+        try:
+            slot, created = get_weekly_writer().add(
+                validated_data['participant'], validated_data['selected_day'], validated_data['selected_start_time']
+            )
+        except ValueError as exc:
+            raise serializers.ValidationError({'selected_start_time': [str(exc)]})
+        if not created:
+            raise serializers.ValidationError({'non_field_errors': [
+                'The fields participant, selected_day, selected_start_time must make a unique set.'
+            ]})
+        return slot
+
+def weekly_availability_serializer_class():
+    """Serializer matching the configured weekly store"""
+    return WeeklySlotSerializer if get_weekly_store().packed else WeeklyAvailabilitySerializer
+
 class DateAvailabilitySerializer(serializers.ModelSerializer):
     class Meta:
         model = DateAvailability
         fields = ['id', 'participant', 'selected_date']
 
+class DateSlotSerializer(serializers.Serializer):
+    """DateAvailabilitySerializer-compatible shape for dates held in DateAvailabilityRange runs"""
+    id = serializers.IntegerField(read_only=True)
+    participant = serializers.PrimaryKeyRelatedField(queryset=Participant.objects.all())
+    selected_date = serializers.DateField()
+
+    def to_representation(self, instance):
+        return {
+            'id': instance.id,
+            'participant': instance.participant_id,
+            'selected_date': self.fields['selected_date'].to_representation(instance.selected_date),
+        }
+
+    def create(self, validated_data):
+        slot, created = get_date_store().add(validated_data['participant'], validated_data['selected_date'])
+        if not created:
+            raise serializers.ValidationError({'non_field_errors': [
+                'The fields participant, selected_date must make a unique set.'
+            ]})
+        return slot
+
+def date_availability_serializer_class():
+    """Serializer matching the configured date store"""
+    return DateSlotSerializer if get_date_store().packed else DateAvailabilitySerializer
+
 class RsvpStatusSerializer(serializers.ModelSerializer):
     class Meta:
         model = RsvpStatus
         fields = ['id', 'participant', 'status']
 
+# --- Bulk Availability Serializers ---
+
+class WeeklySlotInputSerializer(serializers.Serializer):
+    selected_day = serializers.ChoiceField(choices=WeeklyAvailability.DAY_CHOICES)
+    selected_start_time = serializers.TimeField()
+
+class DateRangeInputSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, data):
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("Start date must be on or before end date.")
+        return data
+
+class AvailabilitySetSerializer(serializers.Serializer):
+    """
+    A participant's weekly slots and/or selected dates; omitted keys are left
+    untouched. date_ranges selects every date from start_date to end_date.
+    """
+    weekly = WeeklySlotInputSerializer(many=True, required=False)
+    dates = serializers.ListField(child=serializers.DateField(), required=False)
+    date_ranges = DateRangeInputSerializer(many=True, required=False)
+
+class AvailabilityDiffSerializer(serializers.Serializer):
+    """Slots and dates to add and remove; additions win when both list the same slot"""
+    add = AvailabilitySetSerializer(required=False)
+    remove = AvailabilitySetSerializer(required=False)
+
+class BestSlotsQuerySerializer(serializers.Serializer):
+    """Query parameters of events/{link}/best-slots/; duration is minutes for weekly events, days for date events"""
+    duration = serializers.IntegerField(min_value=1, required=False)
+    top = serializers.IntegerField(min_value=1, max_value=50, default=5)
+    required = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_required(self, value):
+        try:
+            return [int(participant_id) for participant_id in value.split(',') if participant_id.strip()]
+        except ValueError:
+            raise serializers.ValidationError('Expected a comma-separated list of participant ids.')
+
 # --- Participant Serializer ---
 
-class ParticipantSerializer(serializers.ModelSerializer):
+class ParticipantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_first_name = serializers.CharField(source='user.first_name', read_only=True)
     user_last_name = serializers.CharField(source='user.last_name', read_only=True)
     user_email = serializers.EmailField(source='user.email', read_only=True)
     
-    weekly_availabilities = WeeklyAvailabilitySerializer(many=True, read_only=True)
-    date_availabilities = DateAvailabilitySerializer(many=True, read_only=True)
+    weekly_availabilities = serializers.SerializerMethodField()
+    date_availabilities = serializers.SerializerMethodField()
     rsvp_status = RsvpStatusSerializer(read_only=True)
 
     class Meta:
@@ -245,11 +406,33 @@ class ParticipantSerializer(serializers.ModelSerializer):
             'weekly_availabilities', 'date_availabilities', 'rsvp_status'
         ]
 
+    def get_weekly_availabilities(self, obj):
+        slots = get_weekly_store().participant_slots(obj)
+        return weekly_availability_serializer_class()(slots, many=True).data
+
+    def get_date_availabilities(self, obj):
+        dates = get_date_store().participant_dates(obj)
+        return date_availability_serializer_class()(dates, many=True).data
+
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
 
+def guest_email():
+    return f'guest_{uuid.uuid4().hex}@guest.com'
+
+
+def guest_user(name, password=None):
+    """
+    Unregistered user with an unusable password; make_password(None) skips the
+    hasher, and bulk imports share one value since it can never match anyway.
+    """
+    return CustomUser(
+        email=guest_email(), first_name=name, is_registered=False, password=password or make_password(None),
+    )
+
+
 class ParticipantGuestSerializer(serializers.ModelSerializer):
     guest_name = serializers.CharField(write_only=True)
 
@@ -259,13 +442,72 @@ class ParticipantGuestSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
     def create(self, validated_data):
-        guest_name = validated_data.pop('guest_name')
-        user, _ = CustomUser.objects.get_or_create(
-            email=f'guest_{uuid.uuid4().hex[:8]}@guest.com',
-            defaults = {
-                'first_name': guest_name,
-                'is_registered': False,
-                'password': CustomUser.objects.make_random_password(),
-            }
-        )
-        return Participant.objects.create(user=user, **validated_data)
\ No newline at end of file
+        # One transaction, so purge_guests never sees the guest without its participant row
+        with transaction.atomic():
+            user = guest_user(validated_data.pop('guest_name'))
+            user.save()
+            return Participant.objects.create(user=user, **validated_data)
+
+
+class GuestImportSerializer(serializers.Serializer):
+    """
+    Guest names as a list, or a CSV upload with one guest per row (first
+    column, optional "name" header). create() adds them to context['event']
+    with two bulk inserts in one transaction.
+    """
+    names = serializers.ListField(child=serializers.CharField(max_length=150, allow_blank=True), required=False)
+    file = serializers.FileField(required=False)
+
+    def read_csv(self, upload):
+        try:
+            rows = csv.reader(io.StringIO(upload.read().decode('utf-8-sig')))
+            names = [row[0] for row in rows if row]
+        except (UnicodeDecodeError, csv.Error):
+            raise serializers.ValidationError({'file': 'Expected a UTF-8 CSV file.'})
+        if names and names[0].strip().lower() in ('name', 'guest_name', 'first_name'):
+            names = names[1:]
+        return names
+
+    def validate(self, attrs):
+        if 'file' in attrs:
+            names = self.read_csv(attrs['file'])
+        elif 'names' in attrs:
+            names = attrs['names']
+        else:
+            raise serializers.ValidationError('Provide a list of names or a CSV file.')
+
+        names = [name.strip() for name in names if name.strip()]
+        if not names:
+            raise serializers.ValidationError('No guest names given.')
+        limit = getattr(settings, 'GUEST_IMPORT_MAX_ROWS', 5000)
+        if len(names) > limit:
+            raise serializers.ValidationError(f'At most {limit} guests can be imported at once.')
+        if any(len(name) > 150 for name in names):
+            raise serializers.ValidationError('Names must be at most 150 characters.')
+        return {'names': names}
+
+    def create(self, validated_data):
+        event = self.context['event']
+        with transaction.atomic():
+            password = make_password(None)
+            users = CustomUser.objects.bulk_create([guest_user(name, password) for name in validated_data['names']])
+            participants = Participant.objects.bulk_create([Participant(user=user, event=event) for user in users])
+            # bulk_create skips the post_save handlers in myapp.signals
+            stats.record(event.id, participants=len(participants), rsvp={'no_response': len(participants)})
+            event_changed(event.link, [
+                {'type': 'participant_joined', 'participant': participant.id, 'name': participant.user.first_name}
+                for participant in participants
+            ])
+        return participants
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Job status for polling; args stay internal"""
+
+    class Meta:
+        model = Job
+        fields = [
+            'link', 'kind', 'status', 'attempts', 'max_attempts', 'progress_done', 'progress_total',
+            'result', 'error', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
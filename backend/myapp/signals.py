@@ -0,0 +1,196 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import bitsets, stats
+from .authentication import forget_user
+from .cache import event_link, participant_event_id, participant_event_link
+from .changes import event_changed, slot_diff_messages
+from .models import (
+    CustomUser, Event, EventStats, Participant,
+    WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails, RsvpMultiDayEventDetails,
+    WeeklyAvailability, WeeklyAvailabilityMask, DateAvailability, DateAvailabilityRange, RsvpStatus
+)
+
+EVENT_DETAIL_MODELS = [
+    WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails, RsvpMultiDayEventDetails,
+]
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, **kwargs):
+    if created:
+        EventStats.objects.create(event=instance, slot_minutes=getattr(settings, 'WEEKLY_SLOT_MINUTES', 15))
+    event_changed(instance.link, [{'type': 'event_updated'}])
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    event_changed(instance.link, [{'type': 'event_deleted'}])
+
+
+def event_detail_changed(sender, instance, **kwargs):
+    event_changed(event_link(instance.event_id), [{'type': 'event_updated'}])
+
+
+for model in EVENT_DETAIL_MODELS:
+    post_save.connect(event_detail_changed, sender=model)
+    post_delete.connect(event_detail_changed, sender=model)
+
+
+@receiver(post_save, sender=Participant)
+def participant_saved(sender, instance, created, **kwargs):
+    messages = []
+    if created:
+        # Until an RsvpStatus row exists the participant counts as no_response
+        stats.record(instance.event_id, participants=1, rsvp={'no_response': 1})
+        messages.append({'type': 'participant_joined', 'participant': instance.id, 'name': instance.user.first_name})
+    event_changed(event_link(instance.event_id), messages)
+
+
+@receiver(post_delete, sender=Participant)
+def participant_deleted(sender, instance, **kwargs):
+    stats.record(instance.event_id, participants=-1, rsvp={'no_response': -1})
+    event_changed(event_link(instance.event_id), [{'type': 'participant_left', 'participant': instance.id}])
+
+
+def _participant_updated(instance):
+    return {'type': 'participant_updated', 'participant': instance.participant_id}
+
+
+@receiver(post_save, sender=WeeklyAvailability)
+def weekly_availability_saved(sender, instance, created, **kwargs):
+    slot = (instance.selected_day, instance.selected_start_time)
+    if created:
+        stats.record(participant_event_id(instance.participant_id), weekly_added=[slot])
+        messages = slot_diff_messages(instance.participant_id, weekly_added=[slot])
+    else:
+        stats.recompute(participant_event_id(instance.participant_id))
+        messages = [_participant_updated(instance)]
+    event_changed(participant_event_link(instance.participant_id), messages)
+
+
+@receiver(post_delete, sender=WeeklyAvailability)
+def weekly_availability_deleted(sender, instance, **kwargs):
+    slot = (instance.selected_day, instance.selected_start_time)
+    stats.record(participant_event_id(instance.participant_id), weekly_removed=[slot])
+    event_changed(
+        participant_event_link(instance.participant_id),
+        slot_diff_messages(instance.participant_id, weekly_removed=[slot]),
+    )
+
+
+def _mask_slots(participant_id, value, slot_minutes):
+    return [(slot.selected_day, slot.selected_start_time) for slot in bitsets.decode(participant_id, value, slot_minutes)]
+
+
+@receiver(post_save, sender=WeeklyAvailabilityMask)
+def weekly_mask_saved(sender, instance, created, **kwargs):
+    """Stores set _previous_bits before saving so the delta can be published"""
+    previous = b'' if created else getattr(instance, '_previous_bits', None)
+    event_id = participant_event_id(instance.participant_id)
+    if previous is None:
+        stats.recompute(event_id)
+        messages = [_participant_updated(instance)]
+    else:
+        old, new = bitsets.from_bytes(previous), bitsets.from_bytes(instance.bits)
+        added = _mask_slots(instance.participant_id, new & ~old, instance.slot_minutes)
+        removed = _mask_slots(instance.participant_id, old & ~new, instance.slot_minutes)
+        stats.record(event_id, weekly_added=added, weekly_removed=removed)
+        messages = slot_diff_messages(instance.participant_id, weekly_added=added, weekly_removed=removed)
+    event_changed(participant_event_link(instance.participant_id), messages)
+
+
+@receiver(post_delete, sender=WeeklyAvailabilityMask)
+def weekly_mask_deleted(sender, instance, **kwargs):
+    removed = _mask_slots(instance.participant_id, bitsets.from_bytes(instance.bits), instance.slot_minutes)
+    stats.record(participant_event_id(instance.participant_id), weekly_removed=removed)
+    event_changed(
+        participant_event_link(instance.participant_id),
+        slot_diff_messages(instance.participant_id, weekly_removed=removed),
+    )
+
+
+@receiver(post_save, sender=DateAvailability)
+def date_availability_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.record(participant_event_id(instance.participant_id), dates_added=[instance.selected_date])
+        messages = slot_diff_messages(instance.participant_id, dates_added=[instance.selected_date])
+    else:
+        stats.recompute(participant_event_id(instance.participant_id))
+        messages = [_participant_updated(instance)]
+    event_changed(participant_event_link(instance.participant_id), messages)
+
+
+@receiver(post_delete, sender=DateAvailability)
+def date_availability_deleted(sender, instance, **kwargs):
+    stats.record(participant_event_id(instance.participant_id), dates_removed=[instance.selected_date])
+    event_changed(
+        participant_event_link(instance.participant_id),
+        slot_diff_messages(instance.participant_id, dates_removed=[instance.selected_date]),
+    )
+
+
+@receiver(post_save, sender=DateAvailabilityRange)
+def date_range_saved(sender, instance, created, **kwargs):
+    """The store writes runs with bulk_create; this covers saves from elsewhere (admin, shell)"""
+    stats.recompute(participant_event_id(instance.participant_id))
+    event_changed(participant_event_link(instance.participant_id), [_participant_updated(instance)])
+
+
+@receiver(post_delete, sender=DateAvailabilityRange)
+def date_range_deleted(sender, instance, **kwargs):
+    removed = [(instance.start_date, instance.end_date)]
+    stats.record(participant_event_id(instance.participant_id), date_ranges_removed=removed)
+    event_changed(
+        participant_event_link(instance.participant_id),
+        slot_diff_messages(instance.participant_id, date_ranges_removed=removed),
+    )
+
+
+@receiver(post_save, sender=RsvpStatus)
+def rsvp_status_saved(sender, instance, created, **kwargs):
+    event_id = participant_event_id(instance.participant_id)
+    previous = 'no_response' if created else getattr(instance, '_loaded_status', None)
+    if previous is None:
+        stats.recompute(event_id)
+    elif previous != instance.status:
+        stats.record(event_id, rsvp={previous: -1, instance.status: 1})
+    instance._loaded_status = instance.status
+    event_changed(participant_event_link(instance.participant_id), [
+        {'type': 'rsvp_changed', 'participant': instance.participant_id, 'status': instance.status}
+    ])
+
+
+@receiver(post_delete, sender=RsvpStatus)
+def rsvp_status_deleted(sender, instance, **kwargs):
+    stats.record(participant_event_id(instance.participant_id), rsvp={instance.status: -1, 'no_response': 1})
+    event_changed(participant_event_link(instance.participant_id), [
+        {'type': 'rsvp_changed', 'participant': instance.participant_id, 'status': None}
+    ])
+
+
+@receiver(post_save, sender=CustomUser)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    """Drops the cached login; names appear in coordinator_name and participant payloads"""
+    forget_user(instance.pk)
+    if created or (update_fields and set(update_fields) <= {'last_login', 'password'}):
+        return
+    links = Event.objects.filter(
+        Q(coordinator=instance) | Q(participants__user=instance)
+    ).values_list('link', flat=True).distinct()
+    for link in links:
+        event_changed(link)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
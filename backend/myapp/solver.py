@@ -0,0 +1,110 @@
+"""
+Best meeting time search.
+
+Each slot of the event window (a weekly time slot or a date) gets an integer
+with one bit per participant. The participants free for a whole range of
+`width` slots are the AND of those integers, computed for every range at once
+with bitsets.sliding_and, so the cost is linear in the number of slots and each
+AND covers 64 participants per machine word. Date slots are filled a run at a
+time from the participants' date ranges (intervals.sweep).
+"""
+import datetime
+import heapq
+
+from django.conf import settings
+
+from . import bitsets, intervals
+from .bitsets import DAY_ORDER
+from .storage import get_weekly_store, get_date_store
+
+
+class SolverError(ValueError):
+    pass
+
+
+def _participant_bits(event, required_ids):
+    participant_ids = list(event.participants.order_by('id').values_list('id', flat=True))
+    index = {participant_id: i for i, participant_id in enumerate(participant_ids)}
+    unknown = [participant_id for participant_id in required_ids if participant_id not in index]
+    if unknown:
+        raise SolverError(f'Participants {unknown} are not part of this event.')
+    required = 0
+    for participant_id in required_ids:
+        required |= 1 << index[participant_id]
+    return participant_ids, index, required
+
+
+def _rank(candidates, participant_ids, required, top):
+    """Top candidates by attendee count, earliest first on ties"""
+    scored = (
+        (-bitsets.popcount(value), order, label, value)
+        for order, (label, value) in enumerate(candidates)
+        if value & required == required
+    )
+    return [
+        dict(label, count=-negative_count, participant_ids=[participant_ids[i] for i in bitsets.iter_bits(value)])
+        for negative_count, _, label, value in heapq.nsmallest(top, scored)
+    ]
+
+
+def _weekly_times(details, slot_minutes):
+    """Slot start times of the event window; the grid includes a slot starting at end_time"""
+    start = details.start_time.hour * 60 + details.start_time.minute
+    end = details.end_time.hour * 60 + details.end_time.minute
+    first = -(-start // slot_minutes) * slot_minutes
+    return [datetime.time(minutes // 60, minutes % 60) for minutes in range(first, end + 1, slot_minutes)]
+
+
+def best_weekly_slots(event, duration=None, top=5, required_ids=()):
+    """Top weekly ranges of `duration` minutes (default one slot) within the selected days and hours"""
+    details = event.weekly_details
+    slot_minutes = getattr(settings, 'WEEKLY_SLOT_MINUTES', 15)
+    width = max(1, -(-(duration or slot_minutes) // slot_minutes))
+    participant_ids, index, required = _participant_bits(event, required_ids)
+
+    times = _weekly_times(details, slot_minutes)
+    days = [day for day in DAY_ORDER if getattr(details, f'{day}_selected')]
+    slots = {(day, start_time): 0 for day in days for start_time in times}
+    for participant_id, day, start_time in get_weekly_store().slot_tuples(participant_ids):
+        if (day, start_time) in slots:
+            slots[(day, start_time)] |= 1 << index[participant_id]
+
+    candidates = []
+    for day in days:
+        windows = bitsets.sliding_and([slots[(day, start_time)] for start_time in times], width)
+        for i, value in enumerate(windows):
+            end_minutes = times[i].hour * 60 + times[i].minute + width * slot_minutes
+            label = {
+                'selected_day': day,
+                'start_time': times[i].isoformat(),
+                'end_time': datetime.time(end_minutes // 60 % 24, end_minutes % 60).isoformat(),
+            }
+            candidates.append((label, value))
+    return _rank(candidates, participant_ids, required, top)
+
+
+def best_date_ranges(event, duration=None, top=5, required_ids=()):
+    """Top runs of `duration` consecutive days (default one) within the event's date range"""
+    details = event.date_match_details
+    width = max(1, duration or 1)
+    participant_ids, index, required = _participant_bits(event, required_ids)
+
+    day_count = (details.end_date - details.start_date).days + 1
+    slots = [0] * max(day_count, 0)
+    ranges = get_date_store().date_ranges(participant_ids, within=(details.start_date, details.end_date))
+    for start, end, keys in intervals.sweep(ranges):
+        value = 0
+        for participant_id in keys:
+            value |= 1 << index[participant_id]
+        offset = (start - details.start_date).days
+        slots[offset:offset + (end - start).days + 1] = [value] * ((end - start).days + 1)
+
+    candidates = []
+    for i, value in enumerate(bitsets.sliding_and(slots, width)):
+        start_date = details.start_date + datetime.timedelta(days=i)
+        label = {
+            'start_date': start_date.isoformat(),
+            'end_date': (start_date + datetime.timedelta(days=width - 1)).isoformat(),
+        }
+        candidates.append((label, value))
+    return _rank(candidates, participant_ids, required, top)
@@ -0,0 +1,219 @@
+"""
+Per-event aggregates (EventStats).
+
+Every write that changes participants, RSVPs or availability applies its
+delta to the event's EventStats row inside the same transaction (from
+myapp.signals and the bulk paths in myapp.storage), so summary reads cost one
+row lookup however large the event is. Writes whose previous value is unknown
+recompute the affected counts instead.
+
+Weekly counts are kept per slot of ``slot_minutes`` (times between slot starts
+count toward the slot they fall in); date counts per day from ``date_origin``.
+Both are packed arrays of uint32. A missing row is built on first read;
+``manage.py rebuild_event_stats`` rebuilds or checks every event.
+"""
+import datetime
+import sys
+from array import array
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from . import bitsets, intervals, storage
+from .bitsets import DAY_ORDER
+from .models import EventStats, Participant, RsvpStatus
+
+RSVP_STATUSES = [status for status, _ in RsvpStatus.RSVP_CHOICES]
+
+
+def unpack(data):
+    counts = array('I')
+    counts.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        counts.byteswap()
+    return counts
+
+
+def pack(counts):
+    counts = array('I', counts)
+    if sys.byteorder == 'big':
+        counts.byteswap()
+    return counts.tobytes()
+
+
+def weekly_index(day, start_time, slot_minutes):
+    return DAY_ORDER.index(day) * bitsets.slots_per_day(slot_minutes) + (
+        start_time.hour * 60 + start_time.minute
+    ) // slot_minutes
+
+
+def _apply(counts, index, delta):
+    if index >= len(counts):
+        counts.extend([0] * (index + 1 - len(counts)))
+    counts[index] = max(counts[index] + delta, 0)
+
+
+def _apply_dates(origin, counts, deltas):
+    """Returns the (possibly earlier) origin and the counts with each (start, end, delta) run applied"""
+    for start, end, delta in deltas:
+        if origin is None:
+            origin = start
+        if start < origin:
+            counts = array('I', [0] * (origin - start).days) + counts
+            origin = start
+        first, last = (start - origin).days, (end - origin).days
+        if last >= len(counts):
+            counts.extend([0] * (last + 1 - len(counts)))
+        counts[first:last + 1] = array('I', (max(count + delta, 0) for count in counts[first:last + 1]))
+    return origin, counts
+
+
+def compute(event_id, slot_minutes=None, weekly_store=None):
+    """EventStats field values for an event, counted from scratch (from weekly_store, default the configured one)"""
+    slot_minutes = slot_minutes or getattr(settings, 'WEEKLY_SLOT_MINUTES', 15)
+    participant_ids = list(Participant.objects.filter(event_id=event_id).values_list('id', flat=True))
+    rsvp = dict(
+        RsvpStatus.objects.filter(participant_id__in=participant_ids)
+        .values_list('status').annotate(count=Count('id')).order_by()
+    )
+    rsvp['no_response'] = rsvp.get('no_response', 0) + len(participant_ids) - sum(rsvp.values())
+
+    weekly = array('I')
+    for _, day, start_time in (weekly_store or storage.get_weekly_store()).slot_tuples(participant_ids):
+        _apply(weekly, weekly_index(day, start_time, slot_minutes), 1)
+
+    date_origin, date_counts = None, array('I')
+    runs = intervals.counts(storage.get_date_store().date_ranges(participant_ids))
+    if runs:
+        date_origin = runs[0][0]
+        for start, end, count in runs:
+            offset = (start - date_origin).days
+            date_counts.extend([0] * (offset - len(date_counts)) + [count] * ((end - start).days + 1))
+
+    values = {
+        'participant_count': len(participant_ids),
+        'slot_minutes': slot_minutes,
+        'weekly_counts': pack(weekly),
+        'date_origin': date_origin,
+        'date_counts': pack(date_counts),
+    }
+    values.update({f'rsvp_{status}': rsvp.get(status, 0) for status in RSVP_STATUSES})
+    return values
+
+
+def rebuild(event_id, weekly_store=None):
+    stats, _ = EventStats.objects.update_or_create(event_id=event_id, defaults=compute(event_id, weekly_store=weekly_store))
+    return stats
+
+
+class _RowLock:
+    """
+    on_commit() marker for an event whose stats row the transaction has
+    locked. Django drops it with a rolled back savepoint or transaction,
+    exactly when the lock goes, so locked_events() never outlives the lock.
+    """
+
+    def __init__(self, event_id):
+        self.event_id = event_id
+
+    def __call__(self):
+        pass
+
+
+def _locked(event_id):
+    if connection.in_atomic_block:
+        transaction.on_commit(_RowLock(event_id))
+
+
+def locked_events():
+    """Ids of events whose stats row the current transaction holds locked (written or selected for update)"""
+    return {func.event_id for _, func, _ in connection.run_on_commit if isinstance(func, _RowLock)}
+
+
+def get_stats(event):
+    try:
+        return event.stats
+    except EventStats.DoesNotExist:
+        return rebuild(event.pk)
+
+
+def record(
+    event_id, participants=0, rsvp=None, weekly_added=(), weekly_removed=(), dates_added=(), dates_removed=(),
+    date_ranges_added=(), date_ranges_removed=(),
+):
+    """
+    Apply a delta to an event's stats; rsvp maps status to a count change,
+    statuses outside RsvpStatus.RSVP_CHOICES are not counted. Dates can be
+    given one by one or as (start, end) runs. Does nothing if the event has no
+    stats row yet (or is being deleted).
+    """
+    if event_id is None:
+        return
+    counters = {
+        f'rsvp_{status}': delta for status, delta in (rsvp or {}).items() if delta and status in RSVP_STATUSES
+    }
+    if participants:
+        counters['participant_count'] = participants
+    date_deltas = (
+        [(date, date, 1) for date in dates_added] + [(date, date, -1) for date in dates_removed]
+        + [(start, end, 1) for start, end in date_ranges_added] + [(start, end, -1) for start, end in date_ranges_removed]
+    )
+    if not (weekly_added or weekly_removed or date_deltas):
+        # Counters alone are a single UPDATE, no row lock round trip needed
+        if counters and EventStats.objects.filter(event_id=event_id).update(
+            **{field: F(field) + delta for field, delta in counters.items()}
+        ):
+            _locked(event_id)
+        return
+    with transaction.atomic(savepoint=False):
+        stats = EventStats.objects.select_for_update().filter(event_id=event_id).first()
+        if stats is None:
+            return
+        _locked(event_id)
+        for field, delta in counters.items():
+            setattr(stats, field, getattr(stats, field) + delta)
+        if weekly_added or weekly_removed:
+            counts = unpack(stats.weekly_counts)
+            for slots, delta in [(weekly_added, 1), (weekly_removed, -1)]:
+                for day, start_time in slots:
+                    _apply(counts, weekly_index(day, start_time, stats.slot_minutes), delta)
+            stats.weekly_counts = pack(counts)
+        if date_deltas:
+            stats.date_origin, counts = _apply_dates(stats.date_origin, unpack(stats.date_counts), date_deltas)
+            stats.date_counts = pack(counts)
+        stats.save()
+
+
+def recompute(event_id):
+    """Used when a write's previous value is unknown"""
+    if event_id is None:
+        return
+    with transaction.atomic(savepoint=False):
+        stats = EventStats.objects.select_for_update().filter(event_id=event_id).first()
+        if stats is None:
+            return
+        _locked(event_id)
+        for field, value in compute(event_id, stats.slot_minutes).items():
+            setattr(stats, field, value)
+        stats.save()
+
+
+def summary(stats):
+    """API representation: totals plus the non-zero weekly slots and dates"""
+    weekly = []
+    for index, count in enumerate(unpack(stats.weekly_counts)):
+        if count:
+            day, start_time = bitsets.slot_at(index, stats.slot_minutes)
+            weekly.append({'selected_day': day, 'selected_start_time': start_time.isoformat(), 'count': count})
+    dates = [
+        {'selected_date': (stats.date_origin + datetime.timedelta(days=offset)).isoformat(), 'count': count}
+        for offset, count in enumerate(unpack(stats.date_counts)) if count
+    ]
+    return {
+        'participant_count': stats.participant_count,
+        'rsvp': {status: getattr(stats, f'rsvp_{status}') for status in RSVP_STATUSES},
+        'slot_minutes': stats.slot_minutes,
+        'weekly_match': weekly,
+        'date_match': dates,
+    }
@@ -0,0 +1,411 @@
+"""
+Weekly and date availability storage backends.
+
+``rows`` keeps one WeeklyAvailability row per participant/day/start time.
+``bitset`` keeps one WeeklyAvailabilityMask per participant (see myapp.bitsets).
+The backend is chosen with the WEEKLY_AVAILABILITY_STORAGE setting; existing
+data is moved between them with ``manage.py convert_weekly_availability``.
+
+Dates likewise: ``rows`` keeps one DateAvailability row per selected date,
+``ranges`` one DateAvailabilityRange per run of consecutive dates (see
+myapp.intervals), chosen with DATE_AVAILABILITY_STORAGE and converted with
+``manage.py convert_date_availability``.
+
+Bulk paths (the stores' update methods) delete with raw set-based DELETEs and
+bulk_create, neither of which sends model signals, so they report their own
+changes through myapp.changes and myapp.stats. Masks are saved normally; the store records
+the previous bits on the instance so the post_save handler can publish the delta.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import bitsets, intervals, stats
+from .cache import participant_event_id, participant_event_link
+from .changes import event_changed, slot_diff_messages
+from .models import WeeklyAvailability, WeeklyAvailabilityMask, DateAvailability, DateAvailabilityRange
+
+
+def raw_delete(queryset):
+    """
+    Single DELETE statement, without loading rows or sending signals; returns
+    the number of rows deleted. The one place that relies on Django's private
+    QuerySet._raw_delete; callers report the change themselves.
+    """
+    return queryset._raw_delete(queryset.db)
+
+
+class RowWeeklyStore:
+    packed = False
+
+    def participant_slots(self, participant):
+        return participant.weekly_availabilities.all()
+
+    def event_slots(self, participant_ids):
+        return WeeklyAvailability.objects.filter(participant_id__in=participant_ids)
+
+    async def aevent_slots(self, participant_ids):
+        return [slot async for slot in self.event_slots(participant_ids)]
+
+    def slot_tuples(self, participant_ids):
+        """(participant_id, day, start time) for every selected slot"""
+        return self.event_slots(participant_ids).values_list('participant_id', 'selected_day', 'selected_start_time')
+
+    def slot_rows(self, participant_ids):
+        """(id, participant_id, day, start time) in event_slots order, without model instances"""
+        return self.event_slots(participant_ids).values_list('id', 'participant_id', 'selected_day', 'selected_start_time')
+
+    def export_rows(self, event_id, chunk_size):
+        """(participant_id, first name, last name, day, start time), streamed from the database"""
+        return WeeklyAvailability.objects.filter(participant__event_id=event_id).order_by('participant_id', 'id').values_list(
+            'participant_id', 'participant__user__first_name', 'participant__user__last_name',
+            'selected_day', 'selected_start_time',
+        ).iterator(chunk_size=chunk_size)
+
+    def add(self, participant, day, start_time):
+        availability, created = WeeklyAvailability.objects.get_or_create(
+            participant=participant, selected_day=day, selected_start_time=start_time
+        )
+        return availability, created
+
+    def remove(self, participant_id, day, start_time):
+        deleted, _ = WeeklyAvailability.objects.filter(
+            participant_id=participant_id, selected_day=day, selected_start_time=start_time
+        ).delete()
+        return bool(deleted)
+
+    def update(self, participant_id, add=(), remove=(), replace=False):
+        """Add and remove (day, start time) pairs; with replace=True every slot not in add is removed"""
+        rows = WeeklyAvailability.objects.filter(participant_id=participant_id)
+        existing = {
+            (day, start_time): pk
+            for pk, day, start_time in rows.values_list('id', 'selected_day', 'selected_start_time')
+        }
+        add = set(add)
+        remove = set(existing) - add if replace else set(remove) - add
+        removed = [slot for slot in remove if slot in existing]
+        added = add - set(existing)
+        if removed:
+            raw_delete(WeeklyAvailability.objects.filter(id__in=[existing[slot] for slot in removed]))
+        WeeklyAvailability.objects.bulk_create(
+            [
+                WeeklyAvailability(participant_id=participant_id, selected_day=day, selected_start_time=start_time)
+                for day, start_time in added
+            ],
+            ignore_conflicts=True,
+        )
+        stats.record(participant_event_id(participant_id), weekly_added=added, weekly_removed=removed)
+        event_changed(
+            participant_event_link(participant_id),
+            slot_diff_messages(participant_id, weekly_added=added, weekly_removed=removed),
+        )
+
+
+class BitsetWeeklyStore:
+    packed = True
+
+    def __init__(self, slot_minutes):
+        self.slot_minutes = slot_minutes
+
+    def participant_slots(self, participant):
+        try:
+            mask = participant.weekly_mask
+        except WeeklyAvailabilityMask.DoesNotExist:
+            return []
+        return bitsets.decode(participant.pk, bitsets.from_bytes(mask.bits), mask.slot_minutes)
+
+    def masks(self, participant_ids):
+        return WeeklyAvailabilityMask.objects.filter(participant_id__in=participant_ids)
+
+    def _mask_values(self, participant_ids):
+        return self.masks(participant_ids).order_by('participant_id').values_list('participant_id', 'slot_minutes', 'bits')
+
+    def event_slots(self, participant_ids):
+        slots = []
+        for participant_id, slot_minutes, bits in self._mask_values(participant_ids):
+            slots.extend(bitsets.decode(participant_id, bitsets.from_bytes(bits), slot_minutes))
+        return slots
+
+    async def aevent_slots(self, participant_ids):
+        slots = []
+        async for participant_id, slot_minutes, bits in self._mask_values(participant_ids):
+            slots.extend(bitsets.decode(participant_id, bitsets.from_bytes(bits), slot_minutes))
+        return slots
+
+    def slot_tuples(self, participant_ids):
+        """(participant_id, day, start time) for every selected slot"""
+        return [slot[1:] for slot in self.event_slots(participant_ids)]
+
+    def slot_rows(self, participant_ids):
+        """(id, participant_id, day, start time) in event_slots order"""
+        return self.event_slots(participant_ids)
+
+    def export_rows(self, event_id, chunk_size):
+        """(participant_id, first name, last name, day, start time), one mask decoded at a time"""
+        masks = WeeklyAvailabilityMask.objects.filter(participant__event_id=event_id).order_by('participant_id').values_list(
+            'participant_id', 'participant__user__first_name', 'participant__user__last_name', 'slot_minutes', 'bits',
+        )
+        for participant_id, first_name, last_name, slot_minutes, bits in masks.iterator(chunk_size=chunk_size):
+            for slot in bitsets.decode(participant_id, bitsets.from_bytes(bits), slot_minutes):
+                yield participant_id, first_name, last_name, slot.selected_day, slot.selected_start_time
+
+    def get(self, slot_id):
+        participant_id, day, start_time = bitsets.parse_slot_id(slot_id)
+        mask = WeeklyAvailabilityMask.objects.filter(participant_id=participant_id).first()
+        if mask is None:
+            return None
+        try:
+            index = bitsets.slot_index(day, start_time, mask.slot_minutes)
+        except ValueError:
+            return None
+        if not bitsets.from_bytes(mask.bits) >> index & 1:
+            return None
+        return bitsets.WeeklySlot(int(slot_id), participant_id, day, start_time)
+
+    def add(self, participant, day, start_time):
+        """Set one slot; raises ValueError when the time is not aligned to the slot size"""
+        participant_id = getattr(participant, 'pk', participant)
+        with transaction.atomic():
+            mask, _ = WeeklyAvailabilityMask.objects.select_for_update().get_or_create(
+                participant_id=participant_id, defaults={'slot_minutes': self.slot_minutes}
+            )
+            bit = 1 << bitsets.slot_index(day, start_time, mask.slot_minutes)
+            value = bitsets.from_bytes(mask.bits)
+            created = not value & bit
+            if created:
+                mask._previous_bits = mask.bits
+                mask.bits = bitsets.to_bytes(value | bit)
+                mask.save(update_fields=['bits'])
+        slot = bitsets.WeeklySlot(
+            bitsets.slot_id(participant_id, day, start_time), participant_id, day, start_time
+        )
+        return slot, created
+
+    def remove(self, participant_id, day, start_time):
+        with transaction.atomic():
+            mask = WeeklyAvailabilityMask.objects.select_for_update().filter(participant_id=participant_id).first()
+            if mask is None:
+                return False
+            try:
+                bit = 1 << bitsets.slot_index(day, start_time, mask.slot_minutes)
+            except ValueError:
+                return False
+            value = bitsets.from_bytes(mask.bits)
+            if not value & bit:
+                return False
+            mask._previous_bits = mask.bits
+            mask.bits = bitsets.to_bytes(value & ~bit)
+            mask.save(update_fields=['bits'])
+        return True
+
+    def update(self, participant_id, add=(), remove=(), replace=False):
+        """Add and remove (day, start time) pairs; with replace=True every slot not in add is removed"""
+        mask, _ = WeeklyAvailabilityMask.objects.select_for_update().get_or_create(
+            participant_id=participant_id, defaults={'slot_minutes': self.slot_minutes}
+        )
+        added = removed = 0
+        for day, start_time in add:
+            added |= 1 << bitsets.slot_index(day, start_time, mask.slot_minutes)
+        for day, start_time in remove:
+            removed |= 1 << bitsets.slot_index(day, start_time, mask.slot_minutes)
+        value = added if replace else bitsets.from_bytes(mask.bits) & ~removed | added
+        mask._previous_bits = mask.bits
+        mask.bits = bitsets.to_bytes(value)
+        mask.save(update_fields=['bits'])
+
+
+def get_weekly_store():
+    if getattr(settings, 'WEEKLY_AVAILABILITY_STORAGE', 'rows') == 'bitset':
+        return BitsetWeeklyStore(getattr(settings, 'WEEKLY_SLOT_MINUTES', 15))
+    return RowWeeklyStore()
+
+
+class RowDateStore:
+    packed = False
+
+    def participant_dates(self, participant):
+        return participant.date_availabilities.all()
+
+    def event_dates(self, participant_ids):
+        return DateAvailability.objects.filter(participant_id__in=participant_ids)
+
+    async def aevent_dates(self, participant_ids):
+        return [availability async for availability in self.event_dates(participant_ids)]
+
+    def date_rows(self, participant_ids):
+        """(id, participant_id, date) in event_dates order, without model instances"""
+        return self.event_dates(participant_ids).values_list('id', 'participant_id', 'selected_date')
+
+    def date_ranges(self, participant_ids, within=None):
+        """{participant_id: normalized runs}, optionally clipped to a (start, end) window"""
+        rows = self.event_dates(participant_ids)
+        if within:
+            rows = rows.filter(selected_date__range=within)
+        dates = defaultdict(list)
+        for participant_id, date in rows.values_list('participant_id', 'selected_date'):
+            dates[participant_id].append(date)
+        return {participant_id: intervals.from_dates(selected) for participant_id, selected in dates.items()}
+
+    def export_rows(self, event_id, chunk_size):
+        """(participant_id, first name, last name, date), streamed from the database"""
+        return DateAvailability.objects.filter(participant__event_id=event_id).order_by(
+            'participant_id', 'selected_date'
+        ).values_list(
+            'participant_id', 'participant__user__first_name', 'participant__user__last_name', 'selected_date',
+        ).iterator(chunk_size=chunk_size)
+
+    def add(self, participant, date):
+        return DateAvailability.objects.get_or_create(participant=participant, selected_date=date)
+
+    def remove(self, participant_id, date):
+        deleted, _ = DateAvailability.objects.filter(participant_id=participant_id, selected_date=date).delete()
+        return bool(deleted)
+
+    def clear(self, participant_id):
+        # One set-based delete, one stats delta and one change message, like a replace with nothing
+        self.update(participant_id, replace=True)
+
+    def update(self, participant_id, add=(), remove=(), replace=False, add_ranges=(), remove_ranges=()):
+        """Add and remove selected dates; with replace=True every date not in add is removed"""
+        rows = DateAvailability.objects.filter(participant_id=participant_id)
+        existing = set(rows.values_list('selected_date', flat=True))
+        add = set(add) | set(intervals.iter_dates(intervals.normalize(add_ranges)))
+        remove = set(remove) | set(intervals.iter_dates(intervals.normalize(remove_ranges)))
+        removed = existing - add if replace else existing & (remove - add)
+        added = add - existing
+        if removed:
+            raw_delete(rows.filter(selected_date__in=removed))
+        DateAvailability.objects.bulk_create(
+            [DateAvailability(participant_id=participant_id, selected_date=date) for date in added],
+            ignore_conflicts=True,
+        )
+        _dates_changed(participant_id, added, removed)
+
+
+class RangeDateStore:
+    """Selected dates as DateAvailabilityRange runs; writes rewrite only the participant's runs"""
+    packed = True
+
+    def participant_dates(self, participant):
+        ranges = [(run.start_date, run.end_date) for run in participant.date_ranges.all()]
+        return intervals.decode(participant.pk, ranges)
+
+    def runs(self, participant_ids):
+        return DateAvailabilityRange.objects.filter(participant_id__in=participant_ids)
+
+    def _run_values(self, participant_ids):
+        return self.runs(participant_ids).order_by('participant_id', 'start_date').values_list(
+            'participant_id', 'start_date', 'end_date'
+        )
+
+    def event_dates(self, participant_ids):
+        dates = []
+        for participant_id, start_date, end_date in self._run_values(participant_ids):
+            dates.extend(intervals.decode(participant_id, [(start_date, end_date)]))
+        return dates
+
+    async def aevent_dates(self, participant_ids):
+        dates = []
+        async for participant_id, start_date, end_date in self._run_values(participant_ids):
+            dates.extend(intervals.decode(participant_id, [(start_date, end_date)]))
+        return dates
+
+    def date_rows(self, participant_ids):
+        """(id, participant_id, date) in event_dates order"""
+        return self.event_dates(participant_ids)
+
+    def date_ranges(self, participant_ids, within=None):
+        """{participant_id: normalized runs}, optionally clipped to a (start, end) window"""
+        runs = self.runs(participant_ids)
+        if within:
+            runs = runs.filter(start_date__lte=within[1], end_date__gte=within[0])
+        ranges = defaultdict(list)
+        for participant_id, start_date, end_date in runs.values_list('participant_id', 'start_date', 'end_date'):
+            if within:
+                start_date, end_date = max(start_date, within[0]), min(end_date, within[1])
+            ranges[participant_id].append((start_date, end_date))
+        return {participant_id: intervals.normalize(runs) for participant_id, runs in ranges.items()}
+
+    def export_rows(self, event_id, chunk_size):
+        """(participant_id, first name, last name, date), one run expanded at a time"""
+        runs = DateAvailabilityRange.objects.filter(participant__event_id=event_id).order_by(
+            'participant_id', 'start_date'
+        ).values_list('participant_id', 'participant__user__first_name', 'participant__user__last_name', 'start_date', 'end_date')
+        for participant_id, first_name, last_name, start_date, end_date in runs.iterator(chunk_size=chunk_size):
+            for date in intervals.iter_dates([(start_date, end_date)]):
+                yield participant_id, first_name, last_name, date
+
+    def get(self, slot_id):
+        participant_id, date = intervals.parse_slot_id(slot_id)
+        if not DateAvailabilityRange.objects.filter(
+            participant_id=participant_id, start_date__lte=date, end_date__gte=date
+        ).exists():
+            return None
+        return intervals.DateSlot(int(slot_id), participant_id, date)
+
+    def add(self, participant, date):
+        participant_id = getattr(participant, 'pk', participant)
+        added = self._rewrite(participant_id, add=[(date, date)])
+        return intervals.DateSlot(intervals.slot_id(participant_id, date), participant_id, date), bool(added)
+
+    def remove(self, participant_id, date):
+        return bool(self._rewrite(participant_id, remove=[(date, date)]))
+
+    def clear(self, participant_id):
+        self._rewrite(participant_id, replace=True)
+
+    def update(self, participant_id, add=(), remove=(), replace=False, add_ranges=(), remove_ranges=()):
+        """Add and remove dates and (start, end) ranges; with replace=True everything not added is removed"""
+        self._rewrite(
+            participant_id,
+            add=[(date, date) for date in add] + list(add_ranges),
+            remove=[(date, date) for date in remove] + list(remove_ranges),
+            replace=replace,
+        )
+
+    def _rewrite(self, participant_id, add=(), remove=(), replace=False):
+        """Apply the change to the participant's runs; returns the number of dates added plus removed"""
+        with transaction.atomic():
+            rows = DateAvailabilityRange.objects.select_for_update().filter(participant_id=participant_id)
+            current = [(run.start_date, run.end_date) for run in rows]
+            add = intervals.normalize(add)
+            ranges = add if replace else intervals.union(intervals.subtract(current, intervals.subtract(
+                intervals.normalize(remove), add
+            )), add)
+            if ranges == current:
+                return 0
+            added = intervals.subtract(ranges, current)
+            removed = intervals.subtract(current, ranges)
+            raw_delete(DateAvailabilityRange.objects.filter(participant_id=participant_id))
+            DateAvailabilityRange.objects.bulk_create([
+                DateAvailabilityRange(participant_id=participant_id, start_date=start, end_date=end)
+                for start, end in ranges
+            ])
+        _date_ranges_changed(participant_id, added, removed)
+        return intervals.day_count(added) + intervals.day_count(removed)
+
+
+def _dates_changed(participant_id, added, removed):
+    added, removed = list(added), list(removed)
+    stats.record(participant_event_id(participant_id), dates_added=added, dates_removed=removed)
+    event_changed(
+        participant_event_link(participant_id),
+        slot_diff_messages(participant_id, dates_added=added, dates_removed=removed),
+    )
+
+
+def _date_ranges_changed(participant_id, added, removed):
+    """_dates_changed for (start, end) runs, which stay runs in the stats delta and the messages"""
+    stats.record(participant_event_id(participant_id), date_ranges_added=added, date_ranges_removed=removed)
+    event_changed(
+        participant_event_link(participant_id),
+        slot_diff_messages(participant_id, date_ranges_added=added, date_ranges_removed=removed),
+    )
+
+
+def get_date_store():
+    if getattr(settings, 'DATE_AVAILABILITY_STORAGE', 'rows') == 'ranges':
+        return RangeDateStore()
+    return RowDateStore()
+
@@ -1,3 +1,1670 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import bitsets, intervals, jobs, purge, stats, writebuffer
+from .pubsub import InProcessBroker, get_broker
+from .export import csv_stream
+from .storage import get_weekly_store
+
+from .models import (
+    CustomUser, Event, Participant,
+    WeeklyEventDetails, DateAvailabilityEventDetails, RsvpSingleDayEventDetails,
+    WeeklyAvailability, WeeklyAvailabilityMask, DateAvailability, DateAvailabilityRange, RsvpStatus, EventStats,
+    EventChange, Job,
+)
+
+
+def make_event(coordinator, event_type='weekly_match', participants=0, name='Event'):
+    event = Event.objects.create(name=name, coordinator=coordinator, event_type=event_type)
+    if event_type == 'weekly_match':
+        WeeklyEventDetails.objects.create(
+            event=event, mon_selected=True, tue_selected=True,
+            start_time=datetime.time(9, 0), end_time=datetime.time(17, 0),
+        )
+    elif event_type == 'date_match':
+        DateAvailabilityEventDetails.objects.create(
+            event=event, start_date=datetime.date(2025, 1, 1), end_date=datetime.date(2025, 1, 31),
+        )
+    for i in range(participants):
+        user = CustomUser.objects.create(email=f'{event.link.hex[:8]}-{i}@example.com', first_name=f'P{i}')
+        participant = Participant.objects.create(user=user, event=event)
+        WeeklyAvailability.objects.create(
+            participant=participant, selected_day='mon', selected_start_time=datetime.time(9, 0)
+        )
+        WeeklyAvailability.objects.create(
+            participant=participant, selected_day='tue', selected_start_time=datetime.time(9, 15)
+        )
+        DateAvailability.objects.create(participant=participant, selected_date=datetime.date(2025, 1, 2))
+        RsvpStatus.objects.create(participant=participant, status='available')
+    return event
+
+
+class EventQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+
+    def count_queries(self, url):
+        from django.db import connection, transaction
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_event_list_query_count_is_constant(self):
+        url = '/api/events/?expand=participants'
+        make_event(self.coordinator, participants=1)
+        small = self.count_queries(url)
+
+        for i in range(5):
+            make_event(self.coordinator, event_type='date_match', participants=4, name=f'E{i}')
+        self.assertEqual(self.count_queries(url), small)
+
+        # events, participants (with user and RSVP), weekly and date availabilities
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+    def test_event_retrieve_query_count_is_constant(self):
+        small = make_event(self.coordinator, participants=1)
+        large = make_event(self.coordinator, participants=10)
+        self.assertEqual(
+            self.count_queries(f'/api/events/{small.link}/'),
+            self.count_queries(f'/api/events/{large.link}/'),
+        )
+
+    def test_my_events_query_count_is_constant(self):
+        self.client.force_authenticate(self.coordinator)
+        event = make_event(self.coordinator, participants=1)
+        Participant.objects.create(user=self.coordinator, event=event)
+        small = self.count_queries('/api/my-events/')
+        for i in range(3):
+            event = make_event(self.coordinator, participants=3, name=f'E{i}')
+            Participant.objects.create(user=self.coordinator, event=event)
+        self.assertEqual(self.count_queries('/api/my-events/'), small)
+
+    def test_participants_action(self):
+        event = make_event(self.coordinator, participants=3)
+        response = self.client.get(f'/api/events/{event.link}/participants/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(len(response.json()[0]['weekly_availabilities']), 2)
+
+
+class PaginationAndFieldsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.events = [make_event(self.coordinator, participants=2, name=f'E{i}') for i in range(3)]
+
+    def test_event_list_is_cursor_paginated_without_participants(self):
+        with self.assertNumQueries(1):
+            page = self.client.get('/api/events/', {'page_size': 2}).json()
+        self.assertEqual([event['name'] for event in page['results']], ['E0', 'E1'])
+        self.assertNotIn('participants', page['results'][0])
+        self.assertIn('cursor=', page['next'])
+
+        page = self.client.get(page['next']).json()
+        self.assertEqual([event['name'] for event in page['results']], ['E2'])
+        self.assertIsNone(page['next'])
+
+    def test_fields_and_expand(self):
+        page = self.client.get('/api/events/', {'fields': 'id,name,participants', 'expand': 'participants'}).json()
+        self.assertEqual(set(page['results'][0]), {'id', 'name', 'participants'})
+        self.assertEqual(len(page['results'][0]['participants']), 2)
+
+        event = self.events[0]
+        self.assertIn('participants', self.client.get(f'/api/events/{event.link}/').json())
+        with self.assertNumQueries(1):
+            data = self.client.get(f'/api/events/{event.link}/', {'fields': 'name,link'}).json()
+        self.assertEqual(data, {'name': 'E0', 'link': str(event.link)})
+
+    def test_availability_viewsets_are_paginated(self):
+        page = self.client.get('/api/weekly-availabilities/', {'page_size': 4}).json()
+        self.assertEqual(len(page['results']), 4)
+        self.assertIsNotNone(page['next'])
+        self.assertEqual(len(self.client.get('/api/rsvp-statuses/').json()['results']), 6)
+
+
+class HeatmapTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+
+    def test_weekly_heatmap(self):
+        event = make_event(self.coordinator, participants=3)
+        first = event.participants.order_by('id').first()
+        WeeklyAvailability.objects.create(
+            participant=first, selected_day='mon', selected_start_time=datetime.time(9, 15)
+        )
+        response = self.client.get(f'/api/events/{event.link}/heatmap/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['participant_count'], 3)
+        self.assertEqual(
+            [(s['selected_day'], s['selected_start_time'], s['count']) for s in data['weekly_match']],
+            [('mon', '09:00:00', 3), ('mon', '09:15:00', 1), ('tue', '09:15:00', 3)],
+        )
+        self.assertEqual(data['weekly_match'][1]['participant_ids'], [first.id])
+
+    def test_date_heatmap_and_rsvp_tally(self):
+        event = make_event(self.coordinator, event_type='date_match', participants=2)
+        data = self.client.get(f'/api/events/{event.link}/heatmap/').json()
+        self.assertEqual(data['date_match'][0]['selected_date'], '2025-01-02')
+        self.assertEqual(data['date_match'][0]['count'], 2)
+
+        rsvp_event = make_event(self.coordinator, event_type='rsvp_single', participants=2)
+        guest = CustomUser.objects.create(email='guest@example.com')
+        silent = Participant.objects.create(user=guest, event=rsvp_event)
+        data = self.client.get(f'/api/events/{rsvp_event.link}/heatmap/').json()
+        self.assertEqual(data['rsvp']['available']['count'], 2)
+        self.assertEqual(data['rsvp']['no_response'], {'count': 1, 'participant_ids': [silent.id]})
+
+
+class WeeklyAvailabilityRemoveTests(TestCase):
+    def test_remove_by_slot(self):
+        client = APIClient()
+        coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        participant = make_event(coordinator, participants=1).participants.get()
+        payload = {'participant': participant.id, 'selected_day': 'mon', 'selected_start_time': '09:00'}
+
+        response = client.delete('/api/weekly-availabilities/remove/', payload, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(participant.weekly_availabilities.count(), 1)
+        response = client.delete('/api/weekly-availabilities/remove/', payload, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class BitsetTests(TestCase):
+    def test_slot_index_round_trip(self):
+        index = bitsets.slot_index('thur', datetime.time(13, 45), 15)
+        self.assertEqual(index, 3 * 96 + 55)
+        self.assertEqual(bitsets.slot_at(index, 15), ('thur', datetime.time(13, 45)))
+        with self.assertRaises(ValueError):
+            bitsets.slot_index('mon', datetime.time(9, 5), 15)
+
+    def test_sliding_and_matches_naive_windows(self):
+        values = [0b1111, 0b0111, 0b0110, 0b1110, 0b1010, 0b0011, 0b1111]
+        for width in range(1, len(values) + 1):
+            expected = [bitsets.overlap(values[i:i + width]) for i in range(len(values) - width + 1)]
+            self.assertEqual(bitsets.sliding_and(values, width), expected)
+        self.assertEqual(bitsets.sliding_and(values, len(values) + 1), [])
+
+    def test_overlap_and_popcount(self):
+        self.assertEqual(bitsets.popcount(bitsets.overlap([0b1110, 0b0111, 0b0110])), 2)
+        self.assertEqual(list(bitsets.iter_bits(0b100101)), [0, 2, 5])
+
+
+@override_settings(WEEKLY_AVAILABILITY_STORAGE='bitset')
+class BitsetWeeklyStorageTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(self.coordinator)
+        user = CustomUser.objects.create(email='p@example.com')
+        self.participant = Participant.objects.create(user=user, event=self.event)
+
+    def add(self, day, start_time):
+        return self.client.post('/api/weekly-availabilities/', {
+            'participant': self.participant.id, 'selected_day': day, 'selected_start_time': start_time,
+        }, format='json')
+
+    def test_create_and_remove_write_one_mask(self):
+        response = self.add('mon', '09:00')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['selected_start_time'], '09:00:00')
+        self.assertEqual(self.add('mon', '09:15').status_code, 201)
+        self.assertEqual(self.add('mon', '09:15').status_code, 400)
+        self.assertEqual(self.add('mon', '09:10').status_code, 400)
+
+        self.assertFalse(WeeklyAvailability.objects.exists())
+        self.assertEqual(WeeklyAvailabilityMask.objects.count(), 1)
+
+        response = self.client.delete('/api/weekly-availabilities/remove/', {
+            'participant': self.participant.id, 'selected_day': 'mon', 'selected_start_time': '09:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 204)
+
+        data = self.client.get(f'/api/events/{self.event.link}/').json()
+        slots = data['participants'][0]['weekly_availabilities']
+        self.assertEqual([(s['selected_day'], s['selected_start_time']) for s in slots], [('mon', '09:15:00')])
+        self.assertEqual(self.client.get(f"/api/weekly-availabilities/{slots[0]['id']}/").json(), slots[0])
+        self.assertEqual(self.client.get('/api/weekly-availabilities/').json()['results'], slots)
+
+        heatmap = self.client.get(f'/api/events/{self.event.link}/heatmap/').json()
+        self.assertEqual(heatmap['weekly_match'][0]['participant_ids'], [self.participant.id])
+
+    def test_convert_command_round_trip(self):
+        with override_settings(WEEKLY_AVAILABILITY_STORAGE='rows'):
+            for start_time in (datetime.time(9, 0), datetime.time(9, 15)):
+                WeeklyAvailability.objects.create(
+                    participant=self.participant, selected_day='fri', selected_start_time=start_time
+                )
+            before = self.client.get(f'/api/events/{self.event.link}/heatmap/').json()
+
+        call_command('convert_weekly_availability', 'bitset', stdout=io.StringIO())
+        self.assertFalse(WeeklyAvailability.objects.exists())
+        self.assertEqual(self.client.get(f'/api/events/{self.event.link}/heatmap/').json(), before)
+
+        call_command('convert_weekly_availability', 'rows', stdout=io.StringIO())
+        self.assertEqual(WeeklyAvailability.objects.count(), 2)
+        self.assertFalse(WeeklyAvailabilityMask.objects.exists())
+
+    def test_convert_command_keeps_stats(self):
+        with override_settings(WEEKLY_AVAILABILITY_STORAGE='rows'):
+            for start_time in (datetime.time(9, 0), datetime.time(9, 15)):
+                WeeklyAvailability.objects.create(
+                    participant=self.participant, selected_day='fri', selected_start_time=start_time
+                )
+            expected = stats.summary(EventStats(**stats.compute(self.event.id)))
+            cursor = EventChange.objects.latest('id').id
+
+        for target in ('bitset', 'rows'):
+            call_command('convert_weekly_availability', target, stdout=io.StringIO())
+            with override_settings(WEEKLY_AVAILABILITY_STORAGE=target):
+                self.assertEqual(stats.summary(EventStats.objects.get(event=self.event)), expected)
+                self.assertEqual(stats.summary(EventStats(**stats.compute(self.event.id))), expected)
+        # Converting moves data without changing it, so nothing is logged
+        self.assertFalse(EventChange.objects.filter(id__gt=cursor).exists())
+
+
+
+def day(n):
+    return datetime.date(2025, 1, n)
+
+
+class IntervalTests(TestCase):
+    def test_normalize_merges_overlapping_and_adjacent_runs(self):
+        runs = intervals.normalize([(day(5), day(6)), (day(1), day(2)), (day(3), day(3)), (day(10), day(9))])
+        self.assertEqual(runs, [(day(1), day(3)), (day(5), day(6))])
+        self.assertEqual(intervals.from_dates([day(4), day(2), day(3), day(8)]), [(day(2), day(4)), (day(8), day(8))])
+
+    def test_union_and_subtract(self):
+        runs = [(day(1), day(10)), (day(20), day(25))]
+        self.assertEqual(intervals.union(runs, [(day(11), day(19))]), [(day(1), day(25))])
+        self.assertEqual(
+            intervals.subtract(runs, [(day(3), day(4)), (day(10), day(21))]),
+            [(day(1), day(2)), (day(5), day(9)), (day(22), day(25))],
+        )
+        self.assertEqual(intervals.subtract(runs, [(day(1), day(31))]), [])
+        self.assertTrue(intervals.contains(runs, day(22)))
+        self.assertFalse(intervals.contains(runs, day(15)))
+
+    def test_counts_match_per_date_tally(self):
+        ranges = {1: [(day(1), day(5))], 2: [(day(3), day(8))], 3: [(day(5), day(5)), (day(9), day(9))]}
+        expected = {}
+        for runs in ranges.values():
+            for date in intervals.iter_dates(runs):
+                expected[date] = expected.get(date, 0) + 1
+        swept = {date: count for start, end, count in intervals.counts(ranges) for date in intervals.iter_dates([(start, end)])}
+        self.assertEqual(swept, expected)
+        self.assertEqual(intervals.sweep(ranges)[1], (day(3), day(4), frozenset({1, 2})))
+
+    def test_slot_id_round_trip(self):
+        self.assertEqual(intervals.parse_slot_id(intervals.slot_id(42, day(7))), (42, day(7)))
+
+
+@override_settings(DATE_AVAILABILITY_STORAGE='ranges')
+class DateRangeStorageTests(TestCase):
+    def setUp(self):
+        from .cache import get_cache
+
+        get_cache().clear()
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(self.coordinator, 'date_match')
+        user = CustomUser.objects.create(email='p@example.com')
+        self.participant = Participant.objects.create(user=user, event=self.event)
+
+    def url(self):
+        return f'/api/participants/{self.participant.id}/availability/'
+
+    def dates(self):
+        data = self.client.get(f'/api/events/{self.event.link}/').json()
+        return [slot['selected_date'] for slot in data['participants'][0]['date_availabilities']]
+
+    def test_ranges_are_stored_as_runs(self):
+        response = self.client.put(self.url(), {
+            'dates': ['2025-01-20'], 'date_ranges': [{'start_date': '2025-01-01', 'end_date': '2025-01-10'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['date_availabilities']), 11)
+        self.assertEqual(DateAvailabilityRange.objects.count(), 2)
+        self.assertFalse(DateAvailability.objects.exists())
+
+        self.client.patch(self.url(), {
+            'add': {'dates': ['2025-01-11']}, 'remove': {'date_ranges': [{'start_date': '2025-01-04', 'end_date': '2025-01-05'}]},
+        }, format='json')
+        self.assertEqual(
+            list(DateAvailabilityRange.objects.values_list('start_date', 'end_date')),
+            [(day(1), day(3)), (day(6), day(11)), (day(20), day(20))],
+        )
+        self.assertEqual(len(self.dates()), 10)
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+        response = self.client.put(self.url(), {
+            'date_ranges': [{'start_date': '2025-01-05', 'end_date': '2025-01-04'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_changes_stay_range_shaped(self):
+        cursor = EventChange.objects.latest('id').id
+        self.client.put(self.url(), {
+            'date_ranges': [{'start_date': '2025-01-01', 'end_date': '2025-03-31'}],
+        }, format='json')
+        self.client.patch(self.url(), {
+            'remove': {'date_ranges': [{'start_date': '2025-02-01', 'end_date': '2025-02-28'}]},
+        }, format='json')
+        messages = [m for logged in EventChange.objects.filter(id__gt=cursor).values_list('messages', flat=True) for m in logged]
+        self.assertEqual(messages, [
+            {'type': 'slots_added', 'participant': self.participant.id, 'date_ranges': [['2025-01-01', '2025-03-31']]},
+            {'type': 'slots_removed', 'participant': self.participant.id, 'date_ranges': [['2025-02-01', '2025-02-28']]},
+        ])
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+        DateAvailabilityRange.objects.filter(participant=self.participant, start_date=day(1)).delete()
+        self.assertEqual(EventChange.objects.latest('id').messages, [
+            {'type': 'slots_removed', 'participant': self.participant.id, 'date_ranges': [['2025-01-01', '2025-01-31']]},
+        ])
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+    def test_date_endpoints(self):
+        response = self.client.post('/api/date-availabilities/', {
+            'participant': self.participant.id, 'selected_date': '2025-01-02',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        slot = response.json()
+        self.assertEqual(self.client.post('/api/date-availabilities/', {
+            'participant': self.participant.id, 'selected_date': '2025-01-02',
+        }, format='json').status_code, 400)
+        self.client.post('/api/date-availabilities/', {
+            'participant': self.participant.id, 'selected_date': '2025-01-03',
+        }, format='json')
+
+        self.assertEqual(DateAvailabilityRange.objects.count(), 1)
+        self.assertEqual(self.client.get(f"/api/date-availabilities/{slot['id']}/").json(), slot)
+        self.assertEqual(len(self.client.get('/api/date-availabilities/').json()['results']), 2)
+        heatmap = self.client.get(f'/api/events/{self.event.link}/heatmap/').json()
+        self.assertEqual(
+            [(date['selected_date'], date['participant_ids']) for date in heatmap['date_match']],
+            [('2025-01-02', [self.participant.id]), ('2025-01-03', [self.participant.id])],
+        )
+
+        self.assertEqual(self.client.delete(f"/api/date-availabilities/{slot['id']}/").status_code, 204)
+        self.assertEqual(self.client.get(f"/api/date-availabilities/{slot['id']}/").status_code, 404)
+        self.assertEqual(self.dates(), ['2025-01-03'])
+        self.client.post('/api/date-availabilities/remove/', {'participant': self.participant.id}, format='json')
+        self.assertEqual(self.dates(), [])
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+    @override_settings(DATE_AVAILABILITY_STORAGE='rows')
+    def test_row_clear_is_one_delete(self):
+        dates = [day(1) + datetime.timedelta(days=i) for i in range(61)]
+        self.client.put(self.url(), {'dates': [date.isoformat() for date in dates]}, format='json')
+        self.assertEqual(DateAvailability.objects.count(), 61)
+        cursor = EventChange.objects.latest('id').id
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/date-availabilities/remove/', {'participant': self.participant.id}, format='json')
+        self.assertLess(len(queries), 15)
+        self.assertFalse(DateAvailability.objects.exists())
+        self.assertEqual(EventChange.objects.filter(id__gt=cursor).count(), 1)
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+    def test_convert_command_round_trip(self):
+        other = Participant.objects.create(user=CustomUser.objects.create(email='o@example.com'), event=self.event)
+        with override_settings(DATE_AVAILABILITY_STORAGE='rows'):
+            for participant, dates in [(self.participant, (1, 2, 3, 7)), (other, (2, 3, 4))]:
+                for n in dates:
+                    DateAvailability.objects.create(participant=participant, selected_date=day(n))
+            before = self.client.get(f'/api/events/{self.event.link}/heatmap/').json()
+            best = self.client.get(f'/api/events/{self.event.link}/best-slots/?duration=2').json()
+
+        call_command('convert_date_availability', 'ranges', stdout=io.StringIO())
+        self.assertFalse(DateAvailability.objects.exists())
+        self.assertEqual(DateAvailabilityRange.objects.count(), 3)
+        self.assertEqual(self.client.get(f'/api/events/{self.event.link}/heatmap/').json(), before)
+        self.assertEqual(self.client.get(f'/api/events/{self.event.link}/best-slots/?duration=2').json(), best)
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+        call_command('convert_date_availability', 'rows', stdout=io.StringIO())
+        self.assertEqual(DateAvailability.objects.count(), 7)
+        self.assertFalse(DateAvailabilityRange.objects.exists())
+
+
+@override_settings(WEEKLY_AVAILABILITY_STORAGE='bitset', WEEKLY_WRITE_BUFFER_MS=60000)
+class WriteBufferTests(TestCase):
+    def setUp(self):
+        from .cache import get_cache
+
+        get_cache().clear()
+        self.client = APIClient()
+        coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(coordinator)
+        user = CustomUser.objects.create(email='p@example.com')
+        self.participant = Participant.objects.create(user=user, event=self.event)
+
+    def tearDown(self):
+        writebuffer.flush()
+
+    def add(self, start_time):
+        # Toggles reach the buffer when the request commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/weekly-availabilities/', {
+                'participant': self.participant.id, 'selected_day': 'mon', 'selected_start_time': start_time,
+            }, format='json')
+
+    def remove(self, start_time):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.delete('/api/weekly-availabilities/remove/', {
+                'participant': self.participant.id, 'selected_day': 'mon', 'selected_start_time': start_time,
+            }, format='json')
+
+    def test_toggles_are_written_once_on_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.add('09:00').status_code, 202)
+            self.assertEqual(self.add('09:15').status_code, 202)
+            self.assertEqual(self.add('09:15').status_code, 400)
+            self.assertEqual(self.add('09:10').status_code, 400)
+            self.assertEqual(self.remove('09:00').status_code, 202)
+            self.assertEqual(self.remove('09:30').status_code, 404)
+        self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+        self.assertFalse(WeeklyAvailabilityMask.objects.exists())
+
+        data = self.client.get(f'/api/events/{self.event.link}/').json()
+        slots = data['participants'][0]['weekly_availabilities']
+        self.assertEqual([(s['selected_day'], s['selected_start_time']) for s in slots], [('mon', '09:15:00')])
+        self.assertEqual(WeeklyAvailabilityMask.objects.count(), 1)
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+    def test_cancelled_toggles_write_nothing(self):
+        changes = EventChange.objects.count()
+        self.add('09:00')
+        self.remove('09:00')
+        writebuffer.flush()
+        self.assertFalse(WeeklyAvailabilityMask.objects.exists())
+        self.assertEqual(EventChange.objects.count(), changes)
+
+    def test_rolled_back_toggles_are_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            writebuffer.get_write_buffer().add(self.participant, 'mon', datetime.time(9, 0))
+            transaction.set_rollback(True)
+        self.assertEqual(self.add('09:15').status_code, 202)
+        writebuffer.flush()
+        mask = WeeklyAvailabilityMask.objects.get(participant=self.participant)
+        self.assertEqual(bitsets.popcount(bitsets.from_bytes(mask.bits)), 1)
+
+    def test_toggles_during_a_flush_build_on_it(self):
+        buffer = writebuffer.get_write_buffer()
+        write = buffer._write
+        self.add('09:00')
+
+        def write_after_more_toggles(participant_id, entry):
+            if entry.after is None:
+                # The buffer's lock is free during the write ...
+                acquired = []
+
+                def acquire():
+                    if buffer._lock.acquire(timeout=5):
+                        acquired.append(True)
+                        buffer._lock.release()
+
+                other = threading.Thread(target=acquire)
+                other.start()
+                other.join()
+                self.assertEqual(acquired, [True])
+                # ... and toggles start from the mask being written, not the stored (still empty) one
+                self.assertEqual(self.add('09:15').status_code, 202)
+                self.assertEqual(self.remove('09:00').status_code, 202)
+            write(participant_id, entry)
+
+        with mock.patch.object(buffer, '_write', write_after_more_toggles):
+            writebuffer.flush()
+            writebuffer.flush()
+        slots = get_weekly_store().slot_tuples([self.participant.id])
+        self.assertEqual([slot[1:] for slot in slots], [('mon', datetime.time(9, 15))])
+
+    @override_settings(WEEKLY_WRITE_BUFFER_MAX_OPS=2)
+    def test_size_threshold_flushes(self):
+        self.add('09:00')
+        self.assertFalse(WeeklyAvailabilityMask.objects.exists())
+        self.add('09:15')
+        mask = WeeklyAvailabilityMask.objects.get(participant=self.participant)
+        self.assertEqual(bitsets.popcount(bitsets.from_bytes(mask.bits)), 2)
+
+class BulkAvailabilityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.participant = make_event(coordinator, participants=1).participants.get()
+        self.url = f'/api/participants/{self.participant.id}/availability/'
+        self.week = [
+            {'selected_day': day, 'selected_start_time': f'{hour:02d}:{minute:02d}'}
+            for day in ('mon', 'tue', 'wed', 'thur', 'fri')
+            for hour in range(9, 17)
+            for minute in (0, 15, 30, 45)
+        ]
+
+    def weekly(self):
+        return set(self.participant.weekly_availabilities.values_list('selected_day', 'selected_start_time'))
+
+    def test_put_replaces_a_full_week_in_a_few_queries(self):
+        with self.assertNumQueries(17):
+            response = self.client.put(
+                self.url, {'weekly': self.week, 'dates': ['2025-01-03', '2025-01-04']}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['weekly_availabilities']), len(self.week))
+        self.assertEqual(len(self.weekly()), len(self.week))
+        self.assertEqual(
+            sorted(self.participant.date_availabilities.values_list('selected_date', flat=True)),
+            [datetime.date(2025, 1, 3), datetime.date(2025, 1, 4)],
+        )
+
+        response = self.client.put(self.url, {'weekly': self.week[:1]}, format='json')
+        self.assertEqual(self.weekly(), {('mon', datetime.time(9, 0))})
+        self.assertEqual(self.participant.date_availabilities.count(), 2)
+
+    def test_patch_applies_a_diff(self):
+        response = self.client.patch(self.url, {
+            'add': {'weekly': [{'selected_day': 'sun', 'selected_start_time': '10:00'}], 'dates': ['2025-01-05']},
+            'remove': {'weekly': [{'selected_day': 'tue', 'selected_start_time': '09:15'}], 'dates': ['2025-01-02']},
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.weekly(), {('mon', datetime.time(9, 0)), ('sun', datetime.time(10, 0))})
+        self.assertEqual(
+            list(self.participant.date_availabilities.values_list('selected_date', flat=True)),
+            [datetime.date(2025, 1, 5)],
+        )
+
+    @override_settings(WEEKLY_AVAILABILITY_STORAGE='bitset')
+    def test_bitset_storage(self):
+        WeeklyAvailability.objects.all().delete()
+        response = self.client.put(self.url, {'weekly': self.week}, format='json')
+        self.assertEqual(len(response.json()['weekly_availabilities']), len(self.week))
+        response = self.client.patch(self.url, {
+            'remove': {'weekly': [{'selected_day': 'mon', 'selected_start_time': '09:00'}]},
+        }, format='json')
+        self.assertEqual(len(response.json()['weekly_availabilities']), len(self.week) - 1)
+
+        unaligned = {'weekly': [{'selected_day': 'mon', 'selected_start_time': '09:05'}]}
+        self.assertEqual(self.client.put(self.url, unaligned, format='json').status_code, 400)
+        event = self.client.get(f'/api/events/{self.participant.event.link}/').json()
+        self.assertEqual(len(event['participants'][0]['weekly_availabilities']), len(self.week) - 1)
+
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        from .cache import get_cache
+
+        get_cache().clear()
+        self.client = APIClient()
+        coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(coordinator, participants=2)
+        self.participant = self.event.participants.order_by('id').first()
+        self.url = f'/api/events/{self.event.link}/availabilities/'
+
+    def since(self, cursor):
+        return self.client.get(self.url, {'since': cursor}).json()
+
+    def test_since_replays_only_later_changes(self):
+        snapshot = self.client.get(self.url).json()
+        self.assertEqual(len(snapshot['weekly_match']), 4)
+        cursor = snapshot['cursor']
+        self.assertEqual(self.since(cursor), {'cursor': cursor, 'changes': []})
+
+        self.client.patch(f'/api/participants/{self.participant.id}/availability/', {
+            'add': {'weekly': [{'selected_day': 'wed', 'selected_start_time': '10:00'}]},
+            'remove': {'dates': ['2025-01-02']},
+        }, format='json')
+        self.client.post('/api/rsvp-statuses/', {'participant': self.participant.id, 'status': 'tentative'}, format='json')
+
+        delta = self.since(cursor)
+        self.assertGreater(delta['cursor'], cursor)
+        self.assertEqual(delta['changes'], [
+            {'type': 'slots_added', 'participant': self.participant.id, 'weekly': [['wed', '10:00:00']]},
+            {'type': 'slots_removed', 'participant': self.participant.id, 'dates': ['2025-01-02']},
+            {'type': 'rsvp_changed', 'participant': self.participant.id, 'status': 'tentative'},
+        ])
+        self.assertEqual(self.client.get(self.url).json()['cursor'], delta['cursor'])
+        self.assertEqual(self.since(delta['cursor'])['changes'], [])
+        self.assertEqual(self.client.get(self.url, {'since': 'abc'}).status_code, 400)
+
+    def test_expired_cursor_gets_a_snapshot(self):
+        from django.utils import timezone
+        from .changes import compact_changes
+
+        cursor = self.client.get(self.url).json()['cursor']
+        WeeklyAvailability.objects.create(participant=self.participant, selected_day='fri', selected_start_time=datetime.time(9, 0))
+        latest = self.client.get(self.url).json()['cursor']
+        compact_changes(timezone.now() + datetime.timedelta(seconds=1))
+
+        self.assertIn('weekly_match', self.since(cursor))
+        self.assertEqual(self.since(latest), {'cursor': latest, 'changes': []})
+        with self.settings(CHANGE_LOG_MAX_REPLAY=1):
+            DateAvailability.objects.create(participant=self.participant, selected_date=datetime.date(2025, 1, 9))
+            DateAvailability.objects.create(participant=self.participant, selected_date=datetime.date(2025, 1, 10))
+            self.assertIn('weekly_match', self.since(latest))
+
+        self.event.delete()
+        compact_changes(timezone.now())
+        self.assertFalse(EventChange.objects.filter(event_link=self.event.link).exists())
+
+    def test_stats_row_lock_is_known_until_rolled_back(self):
+        from . import stats
+
+        # setUp's writes locked the event's row in the test's transaction
+        self.assertIn(self.event.id, stats.locked_events())
+        try:
+            with transaction.atomic():
+                other = make_event(self.event.coordinator, participants=1)
+                self.assertIn(other.id, stats.locked_events())
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertNotIn(other.id, stats.locked_events())
+        self.assertIn(self.event.id, stats.locked_events())
+
+class BestSlotsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+
+    def add_participant(self, event, name):
+        user = CustomUser.objects.create(email=f'{name}@example.com', first_name=name)
+        return Participant.objects.create(user=user, event=event)
+
+    def test_weekly_best_slots(self):
+        event = make_event(self.coordinator)
+        alice, bob, carol = (self.add_participant(event, name) for name in ('alice', 'bob', 'carol'))
+        for participant, times in (
+            (alice, ['09:00', '09:15', '09:30', '09:45']),
+            (bob, ['09:15', '09:30', '09:45']),
+            (carol, ['09:00', '09:15']),
+        ):
+            self.client.put(f'/api/participants/{participant.id}/availability/', {
+                'weekly': [{'selected_day': 'tue', 'selected_start_time': time} for time in times],
+            }, format='json')
+
+        url = f'/api/events/{event.link}/best-slots/'
+        results = self.client.get(url, {'duration': 30, 'top': 2}).json()['results']
+        self.assertEqual(results[0], {
+            'selected_day': 'tue', 'start_time': '09:00:00', 'end_time': '09:30:00',
+            'count': 2, 'participant_ids': [alice.id, carol.id],
+        })
+        self.assertEqual((results[1]['start_time'], results[1]['count']), ('09:15:00', 2))
+
+        results = self.client.get(url, {'duration': 45, 'required': str(bob.id)}).json()['results']
+        self.assertEqual((results[0]['start_time'], results[0]['participant_ids']), ('09:15:00', [alice.id, bob.id]))
+
+        response = self.client.get(url, {'required': '999999'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_date_best_ranges(self):
+        event = make_event(self.coordinator, event_type='date_match')
+        alice, bob = self.add_participant(event, 'alice'), self.add_participant(event, 'bob')
+        for participant, days in ((alice, [5, 6, 7, 8]), (bob, [6, 7, 20])):
+            DateAvailability.objects.bulk_create([
+                DateAvailability(participant=participant, selected_date=datetime.date(2025, 1, day)) for day in days
+            ])
+        results = self.client.get(f'/api/events/{event.link}/best-slots/', {'duration': 2}).json()['results']
+        self.assertEqual(results[0], {
+            'start_date': '2025-01-06', 'end_date': '2025-01-07', 'count': 2, 'participant_ids': [alice.id, bob.id],
+        })
+
+
+class EventCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        from .cache import get_cache
+
+        get_cache().clear()
+        caches['default'].clear()
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(self.coordinator, participants=2)
+        self.participant = self.event.participants.order_by('id').first()
+
+    def test_hit_serves_identical_bytes_without_queries(self):
+        url = f'/api/events/{self.event.link}/'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['Content-Type'], 'application/json')
+
+        from .cache import HITS_KEY, cache_stats, get_cache
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+        self.assertIsNone(get_cache().get(HITS_KEY))
+
+    def test_writes_invalidate(self):
+        urls = [
+            f'/api/events/{self.event.link}/',
+            f'/api/events/{self.event.link}/participants/',
+            f'/api/events/{self.event.link}/availabilities/',
+        ]
+        for url in urls:
+            self.client.get(url)
+
+        RsvpStatus.objects.filter(participant=self.participant).update(status='tentative')
+        self.assertEqual(self.client.get(urls[0]).json()['participants'][0]['rsvp_status']['status'], 'available')
+
+        self.client.post('/api/rsvp-statuses/', {'participant': self.participant.id, 'status': 'tentative'})
+        self.assertEqual(self.client.get(urls[0]).json()['participants'][0]['rsvp_status']['status'], 'tentative')
+
+        self.client.put(f'/api/participants/{self.participant.id}/availability/', {'weekly': []}, format='json')
+        self.assertEqual(self.client.get(urls[1]).json()[0]['weekly_availabilities'], [])
+        self.assertEqual(len(self.client.get(urls[2]).json()['weekly_match']), 2)
+
+        self.coordinator.first_name = 'Renamed'
+        self.coordinator.save()
+        self.assertEqual(self.client.get(urls[0]).json()['coordinator_name'], 'Renamed')
+
+    def test_etag_revalidation(self):
+        url = f'/api/events/{self.event.link}/availabilities/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertNotEqual(self.client.get(f'/api/events/{self.event.link}/')['ETag'], etag)
+
+        self.client.post('/api/rsvp-statuses/', {'participant': self.participant.id, 'status': 'tentative'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unknown_link_gets_no_version(self):
+        from .cache import get_cache
+
+        link = uuid.uuid4()
+        for url in [f'/api/events/{link}/', f'/api/events/{link}/availabilities/', f'/api/async/events/{link}/']:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='"1-0123456789abcdef", *')
+            self.assertEqual(response.status_code, 404)
+        self.assertIsNone(get_cache().get(f'event:{link}:version'))
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get('/api/cache-stats/').status_code, 403)
+        self.client.force_authenticate(CustomUser.objects.create_user(email='admin@example.com', is_staff=True))
+        self.assertEqual(set(self.client.get('/api/cache-stats/').json()), {'hits', 'misses', 'hit_ratio'})
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        from .cache import get_cache
+
+        get_cache().clear()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(self.coordinator, participants=1)
+        self.participant = self.event.participants.get()
+
+    def test_broker_fan_out_and_resync(self):
+        async def scenario():
+            broker = InProcessBroker(max_pending=2)
+            subscription = broker.subscribe('a')
+            broker.publish('a', [{'type': 'event_updated'}])
+            broker.publish('b', [{'type': 'event_deleted'}])
+            self.assertEqual(await subscription.get(timeout=1), [{'type': 'event_updated'}])
+            self.assertIsNone(await subscription.get(timeout=0.01))
+
+            for _ in range(3):
+                broker.publish('a', [{'type': 'event_updated'}])
+            await asyncio.sleep(0)
+            self.assertEqual(await subscription.get(timeout=1), [{'type': 'resync'}])
+            subscription.close()
+            self.assertEqual(broker.subscriber_count(), 0)
+
+        asyncio.run(scenario())
+
+    def test_writes_publish_deltas_on_commit(self):
+        published = []
+        broker = get_broker()
+        original = broker.publish
+        broker.publish = lambda channel, messages: published.append((channel, messages))
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                APIClient().put(
+                    f'/api/participants/{self.participant.id}/availability/',
+                    {'weekly': [{'selected_day': 'wed', 'selected_start_time': '10:00'}]},
+                    format='json',
+                )
+        finally:
+            broker.publish = original
+
+        self.assertEqual(published, [(str(self.event.link), [
+            {'type': 'slots_added', 'participant': self.participant.id, 'weekly': [['wed', '10:00:00']]},
+            {'type': 'slots_removed', 'participant': self.participant.id,
+             'weekly': [['mon', '09:00:00'], ['tue', '09:15:00']]},
+        ])])
+
+    async def test_stream_sends_published_messages(self):
+        response = await self.async_client.get(f'/api/events/{self.event.link}/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+
+        message = {'type': 'rsvp_changed', 'participant': self.participant.id, 'status': 'tentative'}
+        get_broker().publish(str(self.event.link), [message])
+        chunk = (await anext(chunks)).decode()
+        self.assertTrue(chunk.startswith('event: rsvp_changed\ndata: '))
+        self.assertEqual(json.loads(chunk.split('data: ', 1)[1]), message)
+
+        get_broker().publish(str(self.event.link), [{'type': 'event_deleted'}])
+        self.assertEqual(await anext(chunks), b'event: event_deleted\ndata: {"type":"event_deleted"}\n\n')
+        with self.assertRaises(StopAsyncIteration):
+            await anext(chunks)
+        self.assertEqual(get_broker().subscriber_count(str(self.event.link)), 0)
+
+    def test_stream_requires_asgi_and_existing_event(self):
+        self.assertEqual(self.client.get(f'/api/events/{self.event.link}/stream/').status_code, 501)
+
+    async def test_stream_unknown_event(self):
+        response = await self.async_client.get('/api/events/00000000-0000-0000-0000-000000000000/stream/')
+        self.assertEqual(response.status_code, 404)
+
+
+class IndexUsageTests(TestCase):
+    """The hot lookups are answered from an index, on SQLite and PostgreSQL alike"""
+
+    def setUp(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('EXPLAIN output is only checked on SQLite and PostgreSQL')
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are cheaper to scan; make the planner show its index choice
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        self.user = CustomUser.objects.create(email='user@example.com')
+        self.event = make_event(self.user, participants=2)
+        if connection.vendor == 'postgresql':
+            # On one-page tables indexes sharing a column cost the same; give the planner real statistics
+            users = CustomUser.objects.bulk_create(
+                CustomUser(email=f'roster-{i}@example.com') for i in range(500)
+            )
+            events = [Event.objects.create(name=f'Roster {i}') for i in range(5)]
+            Participant.objects.bulk_create(
+                Participant(user=user, event=event) for user in users for event in events
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE myapp_participant')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_coordinator_events(self):
+        queryset = Event.objects.filter(coordinator=self.user).order_by('id')
+        self.assertUsesIndex(queryset, 'event_coordinator_id_idx')
+
+    def test_joined_events(self):
+        queryset = Event.objects.filter(participants__user=self.user).exclude(coordinator=self.user).distinct()
+        # unique_together (user, event); generated names are truncated differently per backend
+        self.assertUsesIndex(queryset, '_uniq')
+
+    def test_event_roster(self):
+        queryset = Participant.objects.filter(event=self.event).values_list('id', 'user_id')
+        self.assertUsesIndex(queryset, 'participant_event_user_idx')
+
+    def test_availability_lookups(self):
+        participant_ids = list(self.event.participants.values_list('id', flat=True))
+        self.assertUsesIndex(
+            DateAvailability.objects.filter(participant_id__in=participant_ids).values_list('selected_date'),
+            '_uniq',
+        )
+        self.assertUsesIndex(
+            WeeklyAvailability.objects.filter(
+                participant_id=participant_ids[0], selected_day='mon', selected_start_time=datetime.time(9, 0)
+            ),
+            '_uniq',
+        )
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_small_run_stays_within_query_budgets(self):
+        from . import benchmarks
+
+        results = benchmarks.run(scales=[3], iterations=2)
+        endpoints = {result['endpoint'] for result in results}
+        self.assertIn('event_availabilities:rsvp_multi', endpoints)
+        self.assertIn('my_events_view', endpoints)
+        self.assertTrue(all(result['peak_memory_kb'] > 0 for result in results))
+        # The run rolls its data back
+        self.assertFalse(Event.objects.exists())
+
+        query_budgets = {
+            name: {'max_queries': budget['max_queries']} for name, budget in benchmarks.DEFAULT_BUDGETS.items()
+        }
+        self.assertEqual(benchmarks.check_budgets(results, query_budgets), [])
+        violations = benchmarks.check_budgets(results, {'event_retrieve': {'max_queries': 1, 'p95_ms': {'4': 0}}})
+        self.assertEqual(len(violations), 4)
+        self.assertTrue(violations[0].startswith('event_retrieve:weekly_match @ 3: queries'))
+
+    def test_serialization_comparison(self):
+        from . import benchmarks
+
+        result = benchmarks.compare_serialization(scale=3, iterations=1)
+        self.assertGreater(result['serializers']['p50_ms'], 0)
+        self.assertGreater(result['fastpath']['p50_ms'], 0)
+        self.assertFalse(Event.objects.exists())
+
+    def test_auth_comparison(self):
+        from . import benchmarks
+
+        result = benchmarks.compare_auth(requests=3, logins=1)
+        self.assertEqual(result['uncached']['current_user_queries'], 2)
+        self.assertEqual(result['cached']['current_user_queries'], 0)
+        self.assertFalse(CustomUser.objects.exists())
+
+    def test_write_buffer_comparison(self):
+        from . import benchmarks
+
+        result = benchmarks.compare_write_buffer(slots=4, passes=2)
+        self.assertEqual(result['toggles'], 12)
+        self.assertLess(result['buffered']['write_statements'], result['write_through']['write_statements'])
+        self.assertFalse(WeeklyAvailabilityMask.objects.exists())
+
+
+@override_settings(REQUEST_PROFILING_ENABLED=True, REQUEST_PROFILING_SAMPLE_RATE=1.0)
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.event = make_event(CustomUser.objects.create(email='coord@example.com'), participants=2)
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('myapp.profiling', 'INFO') as logs:
+            response = self.client.get(f'/api/events/{self.event.link}/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['path'], f'/api/events/{self.event.link}/')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertLessEqual(len(record['slowest']), 5)
+
+    def test_duplicate_queries_are_grouped(self):
+        from .middleware import QueryRecorder
+
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for participant in Participant.objects.all():
+                participant.user.email
+        self.assertEqual(recorder.count, 3)
+        (sql, count), = recorder.duplicates()
+        self.assertEqual(count, 2)
+        self.assertIn('myapp_customuser', sql)
+
+    def test_cprofile_dump_over_threshold(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(REQUEST_PROFILING_CPROFILE_MS=0, REQUEST_PROFILING_CPROFILE_DIR=directory):
+                with self.assertLogs('myapp.profiling', 'INFO'):
+                    APIClient().get(f'/api/events/{self.event.link}/')
+                self.assertEqual(len([name for name in os.listdir(directory) if name.endswith('.prof')]), 1)
+
+    @override_settings(REQUEST_PROFILING_ENABLED=False)
+    def test_disabled_middleware_is_not_loaded(self):
+        response = APIClient().get(f'/api/events/{self.event.link}/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class DatabaseSettingsTests(TestCase):
+    def test_sqlite_connection_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite tuning only')
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+            self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -20000)
+            self.assertEqual(cursor.execute('PRAGMA temp_store').fetchone()[0], 2)  # MEMORY
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_no_persistent_connections_under_asgi(self):
+        script = (
+            'import AvEase.asgi; from django.conf import settings; '
+            "print(settings.DATABASES['default'].get('CONN_MAX_AGE', 0))"
+        )
+        env = {key: value for key, value in os.environ.items() if key not in ('DJANGO_ASGI', 'DJANGO_SETTINGS_MODULE')}
+        output = subprocess.run(
+            [sys.executable, '-c', script], cwd=Path(__file__).resolve().parent.parent, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        self.assertEqual(output.strip(), '0')
+
+
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        from .cache import get_cache
+
+        get_cache().clear()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(self.coordinator, participants=3)
+        self.date_event = make_event(self.coordinator, 'date_match', participants=2)
+
+    async def test_responses_match_sync_endpoints(self):
+        from .cache import get_cache
+
+        for event in [self.event, self.date_event]:
+            for suffix in ['', 'participants/', 'availabilities/']:
+                expected = (await sync_to_async(APIClient().get)(f'/api/events/{event.link}/{suffix}')).json()
+                await get_cache().aclear()
+                response = await self.async_client.get(f'/api/async/events/{event.link}/{suffix}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected)
+
+    async def test_shares_cache_and_etag_with_sync_endpoint(self):
+        sync_response = await sync_to_async(APIClient().get)(f'/api/events/{self.event.link}/availabilities/')
+        response = await self.async_client.get(
+            f'/api/async/events/{self.event.link}/availabilities/', headers={'If-None-Match': sync_response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_unknown_event(self):
+        response = await self.async_client.get('/api/async/events/00000000-0000-0000-0000-000000000000/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_my_events(self):
+        self.assertEqual((await self.async_client.get('/api/async/my-events/')).status_code, 403)
+        await self.async_client.aforce_login(self.coordinator)
+        data = (await self.async_client.get('/api/async/my-events/')).json()
+        self.assertEqual({event['id'] for event in data['created']}, {self.event.id, self.date_event.id})
+        self.assertEqual(data['joined'], [])
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(email='me@example.com', password='pw', first_name='Me')
+        other = CustomUser.objects.create_user(email='other@example.com', password='pw')
+        self.created = make_event(self.user, 'date_match', participants=3)
+        RsvpStatus.objects.filter(participant__event=self.created).order_by('id').first().delete()
+        self.joined = make_event(other, 'rsvp_single', participants=2, name='Joined')
+        RsvpSingleDayEventDetails.objects.create(event=self.joined, date=datetime.date(2025, 3, 1), is_all_day=True)
+        Participant.objects.create(user=self.user, event=self.joined)
+        make_event(other, participants=2, name='Unrelated')
+        self.client.force_authenticate(self.user)
+
+    def test_summary_rows(self):
+        data = self.client.get('/api/my-events/dashboard/').json()
+        created, = data['created']
+        self.assertEqual(created['id'], self.created.id)
+        self.assertEqual(created['participant_count'], 3)
+        self.assertEqual(created['rsvp'], {'available': 2, 'unavailable': 0, 'tentative': 0, 'no_response': 1})
+        self.assertEqual((created['start_date'], created['end_date']), ('2025-01-01', '2025-01-31'))
+        joined, = data['joined']
+        self.assertEqual(joined['name'], 'Joined')
+        self.assertEqual(joined['coordinator_name'], 'other@example.com')
+        self.assertEqual(joined['participant_count'], 3)
+        self.assertEqual(joined['rsvp']['no_response'], 1)
+        self.assertEqual((joined['start_date'], joined['end_date']), ('2025-03-01', '2025-03-01'))
+
+    def test_single_query_independent_of_event_size(self):
+        with self.assertNumQueries(1):
+            list(Event.objects.dashboard(self.user))
+        for i in range(20):
+            user = CustomUser.objects.create(email=f'extra-{i}@example.com')
+            Participant.objects.create(user=user, event=self.created)
+        with self.assertNumQueries(1):
+            rows = list(Event.objects.dashboard(self.user))
+        self.assertEqual(rows[0].participant_count, 23)
+
+
+class EventStatsTests(TestCase):
+    def setUp(self):
+        from .cache import get_cache
+
+        get_cache().clear()
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(self.coordinator, participants=3)
+        self.date_event = make_event(self.coordinator, 'date_match', participants=2)
+        self.participant = self.event.participants.order_by('id').first()
+
+    def assertStatsFresh(self):
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+    def test_failed_write_rolls_back(self):
+        from rest_framework.exceptions import ValidationError
+        from .views import RsvpStatusViewSet
+
+        participant = Participant.objects.create(user=CustomUser.objects.create(email='late@example.com'), event=self.event)
+        cursor = EventChange.objects.latest('id').id
+
+        def perform_create(viewset, serializer):
+            serializer.save()
+            raise ValidationError({'status': ['Rejected after the write.']})
+
+        with mock.patch.object(RsvpStatusViewSet, 'perform_create', perform_create):
+            response = self.client.post(
+                '/api/rsvp-statuses/', {'participant': participant.id, 'status': 'available'}, format='json'
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RsvpStatus.objects.filter(participant=participant).exists())
+        self.assertFalse(EventChange.objects.filter(id__gt=cursor).exists())
+        self.assertStatsFresh()
+
+    def test_unknown_rsvp_status_is_rejected(self):
+        url = '/api/rsvp-statuses/'
+        self.client.post(url, {'participant': self.participant.id, 'status': 'available'}, format='json')
+        response = self.client.post(url, {'participant': self.participant.id, 'status': 'maybe'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(RsvpStatus.objects.get(participant=self.participant).status, 'available')
+
+        # Rows written around the API (admin, shell) still leave the counters alone
+        stats.record(self.event.id, rsvp={'available': -1, 'maybe': 1})
+        self.assertEqual(EventStats.objects.get(event=self.event).rsvp_available, 2)
+
+    def test_incremental_updates_match_a_rebuild(self):
+        self.client.post('/api/rsvp-statuses/', {'participant': self.participant.id, 'status': 'tentative'})
+        self.client.post('/api/weekly-availabilities/', {
+            'participant': self.participant.id, 'selected_day': 'wed', 'selected_start_time': '10:00',
+        })
+        self.client.delete('/api/weekly-availabilities/remove/', {
+            'participant': self.participant.id, 'selected_day': 'mon', 'selected_start_time': '09:00',
+        }, format='json')
+        date_participant = self.date_event.participants.first()
+        self.client.post('/api/date-availabilities/', {'participant': date_participant.id, 'selected_date': '2024-12-30'})
+        self.client.put(
+            f'/api/participants/{date_participant.id}/availability/', {'dates': ['2025-01-02', '2025-01-09']},
+            format='json',
+        )
+        self.participant.user.delete()
+        self.assertStatsFresh()
+
+        data = self.client.get(f'/api/events/{self.event.link}/stats/').json()
+        self.assertEqual(data['participant_count'], 2)
+        self.assertEqual(data['rsvp'], {'available': 2, 'unavailable': 0, 'tentative': 0, 'no_response': 0})
+        self.assertEqual(data['weekly_match'], [
+            {'selected_day': 'mon', 'selected_start_time': '09:00:00', 'count': 2},
+            {'selected_day': 'tue', 'selected_start_time': '09:15:00', 'count': 2},
+        ])
+        dates = self.client.get(f'/api/events/{self.date_event.link}/stats/').json()['date_match']
+        self.assertEqual(dates, [
+            {'selected_date': '2025-01-02', 'count': 2},
+            {'selected_date': '2025-01-09', 'count': 1},
+        ])
+
+    def test_read_is_constant_and_missing_rows_are_rebuilt(self):
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/events/{self.event.link}/stats/')
+        EventStats.objects.all().delete()
+        self.assertEqual(self.client.get(f'/api/events/{self.event.link}/stats/').json()['participant_count'], 3)
+
+    def test_check_reports_drift(self):
+        # Queryset updates bypass signals
+        RsvpStatus.objects.filter(participant=self.participant).update(status='unavailable')
+        with self.assertRaises(CommandError):
+            self.assertStatsFresh()
+        call_command('rebuild_event_stats', stdout=io.StringIO())
+        self.assertStatsFresh()
+
+
+class GuestImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.event = make_event(self.coordinator, participants=1)
+        self.url = f'/api/events/{self.event.link}/guests/bulk/'
+        self.client.force_authenticate(self.coordinator)
+
+    def test_import_names_in_batched_inserts(self):
+        names = [f'Guest {i}' for i in range(2000)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'names': names + ['  ']}, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Inserts are batched by the backend's parameter limit, not issued per guest
+        self.assertLess(len(queries), 40)
+        ids = response.json()['participants']
+        self.assertEqual(len(ids), 2000)
+
+        guests = CustomUser.objects.filter(participations__id__in=ids)
+        self.assertEqual(guests.filter(is_registered=False).count(), 2000)
+        self.assertFalse(guests.first().has_usable_password())
+        self.assertEqual(self.client.get(f'/api/events/{self.event.link}/stats/').json()['rsvp']['no_response'], 2000)
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+    def test_csv_upload(self):
+        upload = io.BytesIO('name\nAda\n\nGrace,extra\n'.encode('utf-8-sig'))
+        upload.name = 'guests.csv'
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        names = Participant.objects.filter(id__in=response.json()['participants']).values_list('user__first_name', flat=True)
+        self.assertEqual(sorted(names), ['Ada', 'Grace'])
+
+    def test_only_the_coordinator_can_import(self):
+        self.client.force_authenticate(CustomUser.objects.create_user(email='other@example.com', password='pw'))
+        self.assertEqual(self.client.post(self.url, {'names': ['Ada']}, format='json').status_code, 403)
+        self.client.force_authenticate(self.coordinator)
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 400)
+
+    def test_single_guest_join(self):
+        response = self.client.post('/api/participants/guest/', {'guest_name': 'Ada', 'event': self.event.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Participant.objects.get(id=response.json()['id']).user.has_usable_password())
+
+        from .serializers import ParticipantGuestSerializer
+
+        with mock.patch.object(Participant.objects, 'create', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            ParticipantGuestSerializer().create({'guest_name': 'Grace', 'event': self.event})
+        self.assertFalse(CustomUser.objects.filter(first_name='Grace').exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+
+    def export(self, event, output='csv'):
+        response = self.client.get(f'/api/events/{event.link}/export/', {'output': output})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_weekly_csv(self):
+        event = make_event(self.coordinator, participants=2)
+        lines = self.export(event).splitlines()
+        self.assertEqual(lines[0], 'participant,first_name,last_name,day,start_time')
+        self.assertEqual(len(lines), 5)
+        participant = event.participants.order_by('id').first()
+        self.assertIn(f'{participant.id},P0,,mon,09:00:00', lines)
+
+    @override_settings(WEEKLY_AVAILABILITY_STORAGE='bitset', EXPORT_CHUNK_SIZE=1)
+    def test_weekly_bitset_ndjson(self):
+        event = make_event(self.coordinator)
+        participant = Participant.objects.create(
+            user=CustomUser.objects.create(email='ada@example.com', first_name='Ada'), event=event
+        )
+        self.client.put(f'/api/participants/{participant.id}/availability/', {'weekly': [
+            {'selected_day': 'wed', 'selected_start_time': '10:00'}, {'selected_day': 'mon', 'selected_start_time': '09:00'},
+        ]}, format='json')
+        rows = [json.loads(line) for line in self.export(event, 'ndjson').splitlines()]
+        self.assertEqual(rows, [
+            {'participant': participant.id, 'first_name': 'Ada', 'last_name': '', 'day': day, 'start_time': start_time}
+            for day, start_time in [('mon', '09:00:00'), ('wed', '10:00:00')]
+        ])
+
+    def test_date_and_rsvp_events(self):
+        date_event = make_event(self.coordinator, 'date_match', participants=1)
+        self.assertTrue(self.export(date_event).splitlines()[1].endswith(',P0,,2025-01-02'))
+
+        rsvp_event = make_event(self.coordinator, 'rsvp_single', participants=1)
+        Participant.objects.create(user=CustomUser.objects.create(email='silent@example.com'), event=rsvp_event)
+        statuses = [row['status'] for row in map(json.loads, self.export(rsvp_event, 'ndjson').splitlines())]
+        self.assertEqual(statuses, ['available', 'no_response'])
+
+    def test_csv_neutralises_formulas(self):
+        event = make_event(self.coordinator, 'rsvp_single')
+        for name in ['=HYPERLINK("http://example.com")', '+1', '-2', '@SUM(A1)', 'Ada-Lovelace']:
+            self.client.post('/api/participants/guest/', {'guest_name': name, 'event': event.id})
+        names = [row[1] for row in csv.reader(io.StringIO(self.export(event)))][1:]
+        self.assertEqual(names, [
+            '\'=HYPERLINK("http://example.com")', "'+1", "'-2", "'@SUM(A1)", 'Ada-Lovelace',
+        ])
+        # Guest names are stripped on input, but leading tabs and CRs can come from elsewhere
+        content = ''.join(csv_stream(['name'], iter([('\tTab',), ('\rCR',), (-1,)])))
+        self.assertEqual(content, 'name\r\n\'\tTab\r\n"\'\rCR"\r\n-1\r\n')
+        rows = [json.loads(line) for line in self.export(event, 'ndjson').splitlines()]
+        self.assertEqual(rows[0]['first_name'], '=HYPERLINK("http://example.com")')
+
+    def test_unknown_output(self):
+        event = make_event(self.coordinator)
+        self.assertEqual(self.client.get(f'/api/events/{event.link}/export/?output=xml').status_code, 400)
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        results = tempfile.TemporaryDirectory()
+        self.addCleanup(results.cleanup)
+        job_settings = override_settings(JOB_RESULTS_DIR=Path(results.name), JOB_RETRY_BACKOFF=0)
+        job_settings.enable()
+        self.addCleanup(job_settings.disable)
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.client.force_authenticate(self.coordinator)
+        self.event = make_event(self.coordinator, participants=2)
+
+    def accepted(self, response):
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], 'queued')
+        self.assertTrue(response['Location'].endswith(f"/api/jobs/{job['link']}/"))
+        return job['link']
+
+    def poll(self, link):
+        return self.client.get(f'/api/jobs/{link}/').json()
+
+    def test_async_export(self):
+        link = self.accepted(self.client.get(
+            f'/api/events/{self.event.link}/export/', {'output': 'csv'}, HTTP_PREFER='respond-async'
+        ))
+        self.assertEqual(self.client.get(f'/api/jobs/{link}/download/').status_code, 404)
+        self.assertEqual(jobs.run_pending(), 1)
+
+        job = self.poll(link)
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual((job['result']['rows'], job['progress_done'], job['progress_total']), (4, 4, 4))
+        response = self.client.get(f'/api/jobs/{link}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'event-{self.event.link}.csv', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'participant,first_name,last_name,day,start_time')
+        self.assertEqual(len(lines), 5)
+
+    def test_async_delete_and_import(self):
+        link = self.accepted(self.client.post(
+            f'/api/events/{self.event.link}/guests/bulk/', {'names': ['Ada', 'Grace']}, format='json',
+            HTTP_PREFER='respond-async',
+        ))
+        self.assertEqual(self.event.participants.count(), 2)
+        jobs.run_pending()
+        self.assertEqual(len(self.poll(link)['result']['participants']), 2)
+        self.assertEqual(self.event.participants.count(), 4)
+
+        link = self.accepted(self.client.delete(f'/api/events/{self.event.link}/', HTTP_PREFER='respond-async'))
+        self.assertTrue(Event.objects.filter(pk=self.event.pk).exists())
+        jobs.run_pending()
+        self.assertEqual(self.poll(link)['result'], {'deleted': True})
+        self.assertFalse(Event.objects.filter(pk=self.event.pk).exists())
+
+    def test_without_prefer_runs_inline(self):
+        self.assertEqual(self.client.delete(f'/api/events/{self.event.link}/').status_code, 204)
+        self.assertFalse(Job.objects.exists())
+
+    def test_failures_are_retried_then_fail(self):
+        calls = []
+
+        def flaky(job, progress):
+            calls.append(job.attempts)
+            raise RuntimeError('boom')
+
+        with mock.patch.dict(jobs.HANDLERS, {'flaky': flaky}), self.assertLogs('myapp.jobs', 'ERROR'):
+            job = jobs.enqueue('flaky')
+            self.assertEqual(jobs.run_pending(), 3)
+        job.refresh_from_db()
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'RuntimeError: boom')
+
+    def test_job_error_is_not_retried(self):
+        job = jobs.enqueue('export', event_id=0, output='csv')
+        with self.assertLogs('myapp.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue('rebuild_stats', event_ids=[self.event.id])
+        self.assertEqual(jobs.claim().pk, job.pk)
+        self.assertIsNone(jobs.claim())
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('succeeded', 2))
+
+
+@override_settings(JOB_HEARTBEAT_SECONDS=0.05)
+class JobHeartbeatTests(TransactionTestCase):
+    """A thread of the worker's own keeps the heartbeat fresh; needs committed rows, hence no TestCase"""
+
+    def test_heartbeat_is_refreshed_while_the_handler_runs(self):
+        beats = []
+
+        def slow(job, progress):
+            started = Job.objects.get(pk=job.pk).heartbeat_at
+            time.sleep(0.3)
+            beats.append(Job.objects.get(pk=job.pk).heartbeat_at > started)
+
+        with mock.patch.dict(jobs.HANDLERS, {'slow': slow}):
+            job = jobs.enqueue('slow')
+            self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(beats, [True])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(email='coord@example.com', password='pw')
+        self.client.force_authenticate(self.coordinator)
+
+    def test_cascade_covers_every_relation(self):
+        """A model added with a foreign key to events or participants has to be deleted by myapp.purge too"""
+        def related(model):
+            return {relation.related_model for relation in model._meta.related_objects}
+
+        self.assertEqual(related(Event), set(purge.EVENT_DATA) | {Participant})
+        self.assertEqual(related(Participant), set(purge.PARTICIPANT_DATA))
+
+    def delete(self, event):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.delete(f'/api/events/{event.link}/').status_code, 204)
+        return len(queries)
+
+    @override_settings(WEEKLY_AVAILABILITY_STORAGE='bitset', DATE_AVAILABILITY_STORAGE='ranges')
+    def test_delete_removes_everything_in_constant_queries(self):
+        small = make_event(self.coordinator, participants=2)
+        large = make_event(self.coordinator, participants=20)
+        participant = large.participants.first()
+        WeeklyAvailabilityMask.objects.create(participant=participant, slot_minutes=15, bits=b'\x01')
+        DateAvailabilityRange.objects.create(
+            participant=participant, start_date=datetime.date(2025, 1, 1), end_date=datetime.date(2025, 1, 5)
+        )
+        cursor = EventChange.objects.filter(event_link=large.link).latest('id').id
+
+        self.assertEqual(self.delete(small), self.delete(large))
+        self.assertFalse(Event.objects.exists())
+        for model in [Participant, EventStats, WeeklyEventDetails] + purge.PARTICIPANT_DATA:
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertEqual(
+            list(EventChange.objects.filter(event_link=large.link, id__gt=cursor).values_list('messages', flat=True)),
+            [[{'type': 'event_deleted'}]],
+        )
+
+    def test_participant_delete_is_set_based(self):
+        from .cache import get_cache
+
+        for weekly_storage, date_storage in [('rows', 'rows'), ('bitset', 'ranges')]:
+            get_cache().clear()
+            with self.subTest(weekly_storage), override_settings(
+                WEEKLY_AVAILABILITY_STORAGE=weekly_storage, DATE_AVAILABILITY_STORAGE=date_storage,
+            ):
+                event = make_event(self.coordinator)
+                participant, _ = [
+                    Participant.objects.create(
+                        user=CustomUser.objects.create(email=f'{weekly_storage}-{i}@example.com'), event=event
+                    )
+                    for i in range(2)
+                ]
+                RsvpStatus.objects.create(participant=participant, status='available')
+                self.client.put(f'/api/participants/{participant.id}/availability/', {
+                    'weekly': [
+                        {'selected_day': day, 'selected_start_time': f'{hour:02}:{minute:02}'}
+                        for day in ('mon', 'tue', 'wed', 'thur') for hour in range(8, 18) for minute in (0, 15, 30, 45)
+                    ],
+                    'dates': ['2025-01-02', '2025-01-03'],
+                }, format='json')
+                self.assertEqual(len(get_weekly_store().slot_tuples([participant.id])), 160)
+                cursor = EventChange.objects.latest('id').id
+
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.delete(f'/api/participants/{participant.id}/').status_code, 204)
+                self.assertLess(len(queries), 25)
+                self.assertFalse(Participant.objects.filter(pk=participant.pk).exists())
+                for model in purge.PARTICIPANT_DATA:
+                    self.assertFalse(model.objects.filter(participant_id=participant.pk).exists(), model.__name__)
+                self.assertEqual(
+                    list(EventChange.objects.filter(id__gt=cursor).values_list('messages', flat=True)),
+                    [[{'type': 'participant_left', 'participant': participant.id}]],
+                )
+                event_stats = self.client.get(f'/api/events/{event.link}/stats/').json()
+                self.assertEqual((event_stats['participant_count'], event_stats['weekly_match']), (1, []))
+                call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+    def test_purge_stale(self):
+        today = timezone.localdate()
+        past = make_event(self.coordinator, 'date_match', participants=1)
+        DateAvailabilityEventDetails.objects.filter(event=past).update(
+            start_date=today - datetime.timedelta(days=40), end_date=today - datetime.timedelta(days=31)
+        )
+        current = make_event(self.coordinator, 'date_match')
+        DateAvailabilityEventDetails.objects.filter(event=current).update(end_date=today)
+        weekly = make_event(self.coordinator)
+        self.client.post(f'/api/events/{past.link}/guests/bulk/', {'names': ['Ada', 'Grace']}, format='json')
+        self.client.post(f'/api/events/{current.link}/guests/bulk/', {'names': ['Joan']}, format='json')
+        CustomUser.objects.create(email='gone@example.com', is_registered=False)
+        CustomUser.objects.filter(is_registered=False).update(date_joined=timezone.now() - datetime.timedelta(days=2))
+        # Just created, possibly mid-join: kept until it is older than GUEST_GRACE_HOURS
+        joining = CustomUser.objects.create(email='joining@example.com', first_name='Hedy', is_registered=False)
+        registered = CustomUser.objects.create_user(email='idle@example.com', password='pw')
+        old_job = jobs.enqueue('rebuild_stats', event_ids=[])
+        Job.objects.filter(pk=old_job.pk).update(status='succeeded', finished_at=timezone.now() - datetime.timedelta(days=8))
+        jobs.enqueue('rebuild_stats', event_ids=[])
+
+        out = io.StringIO()
+        call_command('purge_stale', '--days=30', '--dry-run', stdout=out)
+        self.assertIn('Would delete 1 expired events, 1 orphaned guests and 1 jobs.', out.getvalue())
+        self.assertEqual(Event.objects.count(), 3)
+
+        out = io.StringIO()
+        call_command('purge_stale', '--days=30', '--batch-size=1', '--pause=0', stdout=out)
+        self.assertIn('Deleted 1 expired events, 3 orphaned guests and 1 jobs.', out.getvalue())
+        self.assertEqual(set(Event.objects.all()), {current, weekly})
+        guests = CustomUser.objects.filter(is_registered=False).values_list('first_name', flat=True)
+        self.assertEqual(sorted(guests), ['Hedy', 'Joan'])
+        self.assertTrue(CustomUser.objects.filter(pk=joining.pk).exists())
+        self.assertTrue(CustomUser.objects.filter(pk=registered.pk).exists())
+        self.assertEqual(Job.objects.count(), 1)
+        call_command('rebuild_event_stats', '--check', stdout=io.StringIO())
+
+
+@override_settings(EVENT_CACHE_TIMEOUT=0)
+class FastReadPathTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.coordinator = CustomUser.objects.create_user(
+            email='coord@example.com', password='pw', first_name='Zoë', last_name='\u2028'
+        )
+        self.events = [
+            make_event(self.coordinator, event_type, participants=3, name=f'{event_type} ünïcode')
+            for event_type in ('weekly_match', 'date_match', 'rsvp_single')
+        ]
+        self.events.append(Event.objects.create(name='No details', coordinator=None, event_type='rsvp_multi'))
+        self.client.force_authenticate(self.coordinator)
+        participant = self.events[0].participants.first()
+        Participant.objects.create(user=self.coordinator, event=self.events[1])
+        RsvpStatus.objects.filter(participant=participant).delete()
+
+    def urls(self):
+        urls = ['/api/events/?expand=participants', '/api/events/?page_size=2', '/api/my-events/']
+        for event in self.events:
+            urls += [
+                f'/api/events/{event.link}/',
+                f'/api/events/{event.link}/?fields=id,event_details,participants',
+                f'/api/events/{event.link}/?expand=',
+                f'/api/events/{event.link}/participants/',
+                f'/api/events/{event.link}/availabilities/',
+            ]
+        return urls
+
+    def assertSameAsSerializers(self):
+        for url in self.urls():
+            fast = self.client.get(url)
+            with self.settings(FAST_READ_PATH=False):
+                reference = self.client.get(url)
+            self.assertEqual(fast.status_code, 200, url)
+            self.assertEqual(fast.content, reference.content, url)
+
+    def test_byte_compatible_with_serializers(self):
+        self.assertSameAsSerializers()
+
+    @override_settings(WEEKLY_AVAILABILITY_STORAGE='bitset')
+    def test_byte_compatible_with_bitset_storage(self):
+        call_command('convert_weekly_availability', 'bitset', stdout=io.StringIO())
+        self.assertSameAsSerializers()
+
+    @override_settings(DATE_AVAILABILITY_STORAGE='ranges')
+    def test_byte_compatible_with_range_storage(self):
+        call_command('convert_date_availability', 'ranges', stdout=io.StringIO())
+        self.assertSameAsSerializers()
+
+    def test_unknown_event(self):
+        self.assertEqual(self.client.get('/api/events/not-a-uuid/').status_code, 404)
+        self.assertEqual(self.client.get('/api/events/00000000-0000-0000-0000-000000000000/').status_code, 404)
+
+    def test_renderer_matches_drf(self):
+        from rest_framework.renderers import JSONRenderer
+        from .fastpath import dumps
+
+        data = {'text': 'line\u2028sep\u2029é', 'when': datetime.datetime(2025, 1, 2, 3, 4, 5, 678901), 1: None}
+        self.assertEqual(dumps(data), JSONRenderer().render(data))
+
+
+class AuthCachingTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        # Users are only cached in a cache every process shares
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+            'events': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }))
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(email='ada@example.com', password='correct horse', first_name='Ada')
+
+    def login(self):
+        response = self.client.post('/api/login/', {'email': 'ada@example.com', 'password': 'correct horse'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_current_user_is_served_from_the_cache(self):
+        self.login()
+        self.client.get('/api/current-user/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/current-user/').json()['first_name'], 'Ada')
+
+        self.user.first_name = 'Grace'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/current-user/').json()['first_name'], 'Grace')
+
+        self.client.post('/api/logout/')
+        self.assertEqual(self.client.get('/api/current-user/').json(), {'user': None})
+
+    def test_per_process_cache_is_not_used(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.login()
+            self.client.get('/api/current-user/')
+            with self.assertNumQueries(1):
+                self.client.get('/api/current-user/')
+
+    def test_login_rehashes_with_the_preferred_hasher(self):
+        from django.contrib.auth.hashers import get_hasher, make_password
+
+        self.user.password = make_password('correct horse', hasher='pbkdf2_sha1')
+        self.user.save()
+        self.login()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password.split('$')[0], get_hasher().algorithm)
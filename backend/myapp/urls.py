@@ -1,12 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     # ViewSets
     EventViewSet, ParticipantViewSet,
-    WeeklyAvailabilityViewSet, DateAvailabilityViewSet, RsvpStatusViewSet,
+    WeeklyAvailabilityViewSet, DateAvailabilityViewSet, RsvpStatusViewSet, JobViewSet,
 
     # Auth & CSRF Views
-    csrf_token_view, login_view, signup_view, logout_view, current_user_view, my_events,
+    csrf_token_view, login_view, signup_view, logout_view, current_user_view, my_events, my_events_dashboard,
+
+    # Monitoring
+    event_cache_stats_view,
+
+    # Live updates
+    event_stream,
 
     # Guest participant creation
     ParticipantGuestCreateView,
@@ -19,14 +26,24 @@ router.register(r'participants', ParticipantViewSet)
 router.register(r'weekly-availabilities', WeeklyAvailabilityViewSet)
 router.register(r'date-availabilities', DateAvailabilityViewSet)
 router.register(r'rsvp-statuses', RsvpStatusViewSet)
+router.register(r'jobs', JobViewSet)
 
 # Final URL patterns
 urlpatterns = [
-    path('', include(router.urls)),
+    # Server-Sent Events (ASGI only)
+    path('events/<uuid:link>/stream/', event_stream, name='event-stream'),
+
+    # Async (ASGI-native) read path; same responses as the DRF endpoints without query parameters
+    path('async/events/<uuid:link>/', async_views.event_detail, name='async-event-detail'),
+    path('async/events/<uuid:link>/participants/', async_views.event_participants, name='async-event-participants'),
+    path('async/events/<uuid:link>/availabilities/', async_views.event_availabilities, name='async-event-availabilities'),
+    path('async/my-events/', async_views.my_events, name='async-my-events'),
 
-    # Guest join (no auth required)
+    # Guest join (no auth required); before the router, whose participants/<pk>/ would match it
     path('participants/guest/', ParticipantGuestCreateView.as_view(), name='guest-participant-create'),
 
+    path('', include(router.urls)),
+
     # CSRF setup
     path('csrf/', csrf_token_view, name='csrf-token'),
 
@@ -35,5 +52,9 @@ urlpatterns = [
     path('login/', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
     path('current-user/', current_user_view, name='current-user'),
-    path('my-events/', my_events, name='my-events')
+    path('my-events/', my_events, name='my-events'),
+    path('my-events/dashboard/', my_events_dashboard, name='my-events-dashboard'),
+
+    # Monitoring (staff only)
+    path('cache-stats/', event_cache_stats_view, name='cache-stats'),
 ]
\ No newline at end of file
@@ -1,21 +1,43 @@
-from rest_framework import viewsets, permissions, status, generics
+from rest_framework import viewsets, mixins, permissions, status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import MethodNotAllowed, NotFound
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.utils.decorators import method_decorator
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate, login, logout
+from django.db import transaction
+from django.urls import reverse
+from django.utils.dateparse import parse_time
+import json
 
 from .models import (
     Event, Participant, CustomUser,
-    WeeklyAvailability, DateAvailability, RsvpStatus
+    WeeklyAvailability, WeeklyAvailabilityMask, DateAvailability, RsvpStatus, Job
 )
 
+from . import fastpath, jobs, writebuffer
+from .aggregation import event_heatmap
+from .cache import cache_stats, cached_event_response
+from .changes import changes_since, latest_cursor
+from .export import FORMATS as EXPORT_FORMATS, export_rows
+from .pagination import IdCursorPagination
+from .pubsub import get_broker
+from .purge import delete_events, delete_participants
+from .stats import get_stats, summary as stats_summary
+from .solver import SolverError, best_weekly_slots, best_date_ranges
+from .storage import get_weekly_store, get_date_store
 from .serializers import (
-    EventSerializer, ParticipantSerializer, ParticipantGuestSerializer,
-    WeeklyAvailabilitySerializer, DateAvailabilitySerializer, RsvpStatusSerializer
+    EventSerializer, DashboardEventSerializer, ParticipantSerializer, ParticipantGuestSerializer, GuestImportSerializer,
+    WeeklyAvailabilitySerializer, DateAvailabilitySerializer, RsvpStatusSerializer,
+    AvailabilitySetSerializer, AvailabilityDiffSerializer, BestSlotsQuerySerializer, JobSerializer,
+    weekly_availability_serializer_class, date_availability_serializer_class,
 )
 
 
@@ -84,8 +106,14 @@ def current_user_view(request):
 @permission_classes([IsAuthenticated])
 def my_events(request):
     user = request.user
-    created_events = Event.objects.filter(coordinator=user)
-    joined_events = Event.objects.filter(participants__user=user).distinct()
+    writebuffer.flush()
+    if fastpath.enabled() and request.accepted_renderer.format == 'json':
+        return Response({
+            'created': fastpath.events(Event.objects.filter(coordinator=user)),
+            'joined': fastpath.events(Event.objects.filter(participants__user=user).distinct()),
+        })
+    created_events = Event.objects.with_related().filter(coordinator=user)
+    joined_events = Event.objects.with_related().filter(participants__user=user).distinct()
 
     data = {
         'created': EventSerializer(created_events, many=True).data,
@@ -93,6 +121,56 @@ def my_events(request):
     }
     return Response(data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_events_dashboard(request):
+    """Summary rows for the event list page; one query regardless of event sizes"""
+    user = request.user
+    writebuffer.flush()
+    created, joined = [], []
+    for event in Event.objects.dashboard(user):
+        (created if event.coordinator_id == user.id else joined).append(event)
+    return Response({
+        'created': DashboardEventSerializer(created, many=True).data,
+        'joined': DashboardEventSerializer(joined, many=True).data,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def event_cache_stats_view(request):
+    return Response(cache_stats())
+
+# Live updates (Server-Sent Events)
+async def event_stream(request, link):
+    """Push change deltas for one event; needs the ASGI application (AvEase/asgi.py)"""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Event streams are only served by the ASGI application.'}, status=501)
+    if not await Event.objects.filter(link=link).aexists():
+        raise Http404
+
+    heartbeat = getattr(settings, 'EVENT_STREAM_HEARTBEAT', 15)
+
+    async def stream():
+        subscription = get_broker().subscribe(str(link))
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                messages = await subscription.get(timeout=heartbeat)
+                if messages is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                for message in messages:
+                    yield f"event: {message['type']}\ndata: {json.dumps(message, separators=(',', ':'))}\n\n"
+                if any(message['type'] == 'event_deleted' for message in messages):
+                    return
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # Guest Join
 @method_decorator(csrf_exempt, name='dispatch')
 class ParticipantGuestCreateView(generics.CreateAPIView):
@@ -102,71 +180,393 @@ class ParticipantGuestCreateView(generics.CreateAPIView):
 
 
 # Event ViewSet
+def prefers_async(request):
+    """RFC 7240 Prefer: respond-async; heavy actions then queue a job instead of running inline"""
+    return any(
+        preference.split('=')[0].strip().lower() == 'respond-async'
+        for preference in request.headers.get('Prefer', '').split(',')
+    )
+
+
+def job_accepted(request, job):
+    """202 with the queued job; Location is where to poll it"""
+    response = Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    response['Location'] = request.build_absolute_uri(reverse('job-detail', kwargs={'link': job.link}))
+    return response
+
+
 class EventViewSet(viewsets.ModelViewSet):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'link'
+    pagination_class = IdCursorPagination
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Buffered weekly toggles this request could read are written first (myapp.writebuffer)
+        writebuffer.flush(event_link=kwargs.get(self.lookup_field))
+
+    def get_expand(self):
+        """Expanded nested fields: ?expand=participants, or none by default on list"""
+        expand = self.request.query_params.get('expand')
+        if expand is not None:
+            return {name.strip() for name in expand.split(',')}
+        return set() if self.action == 'list' else None
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        expand = self.get_expand()
+        if expand is not None:
+            context['expand'] = expand
+        return context
+
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        return {name.strip() for name in fields.split(',')} if fields else None
+
+    def include_participants(self):
+        fields, expand = self.requested_fields(), self.get_expand()
+        return (fields is None or 'participants' in fields) and (expand is None or 'participants' in expand)
+
+    def use_fast_path(self):
+        """Plain JSON reads are built by myapp.fastpath; the browsable API keeps the serializers"""
+        return fastpath.enabled() and self.request.method == 'GET' and self.request.accepted_renderer.format == 'json'
+
+    def fast_events(self, rows):
+        return fastpath.build_events(rows, self.include_participants(), self.requested_fields())
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve', 'participants') and self.use_fast_path():
+            # Only the lookup and pagination read these; fastpath loads the rest
+            return queryset
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.with_related(participants=self.include_participants())
+        elif self.action == 'participants':
+            queryset = queryset.with_related()
+        elif self.action == 'stats':
+            queryset = queryset.select_related('stats')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_path():
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(fastpath.event_rows(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(self.fast_events(page))
+
+    @cached_event_response('retrieve')
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_fast_path():
+            return super().retrieve(request, *args, **kwargs)
+        # get_object() without loading the instance; the permissions here have no object-level checks
+        lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        try:
+            events = self.fast_events(fastpath.event_rows(self.filter_queryset(self.get_queryset()).filter(**lookup)))
+        except (TypeError, ValueError, ValidationError):
+            events = []
+        if not events:
+            raise Http404('No Event matches the given query.')
+        return Response(events[0])
 
     @action(detail=True, methods=['get'])
-    def participants(self, request, pk=None):
+    @cached_event_response('participants')
+    def participants(self, request, **kwargs):
         event = self.get_object()
+        if self.use_fast_path():
+            return Response(fastpath.participants([event.pk]).get(event.pk, []))
         participants = event.participants.all()
         serializer = ParticipantSerializer(participants, many=True)
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
+    @cached_event_response('availabilities')
     def availabilities(self, request, **kwargs):
+        """All availability rows, or with ?since=<cursor> only the changes logged after it"""
         event = self.get_object()
+        since = request.query_params.get('since')
+        if since is not None:
+            if not since.isdigit():
+                return Response({'since': ['Expected a cursor from a previous response.']}, status=status.HTTP_400_BAD_REQUEST)
+            delta = changes_since(event.link, int(since))
+            if delta is not None:
+                return Response({'cursor': delta[0], 'changes': delta[1]})
+        # Taken before the rows are read, so a change racing the snapshot is replayed rather than lost
+        cursor = latest_cursor(event.link)
+        if self.use_fast_path():
+            return Response({**fastpath.availabilities(event), 'cursor': cursor})
         participant_ids = event.participants.values_list('id', flat=True)
 
         return Response({
-            'weekly_match': WeeklyAvailabilitySerializer(
-                WeeklyAvailability.objects.filter(participant_id__in=participant_ids), many=True
+            'weekly_match': weekly_availability_serializer_class()(
+                get_weekly_store().event_slots(participant_ids), many=True
             ).data,
-            'date_match': DateAvailabilitySerializer(
-                DateAvailability.objects.filter(participant_id__in=participant_ids), many=True
+            'date_match': date_availability_serializer_class()(
+                get_date_store().event_dates(participant_ids), many=True
             ).data,
             'rsvp': RsvpStatusSerializer(
                 RsvpStatus.objects.filter(participant_id__in=participant_ids), many=True
             ).data,
+            'cursor': cursor,
         })
+
+    @action(detail=True, methods=['get'])
+    @cached_event_response('heatmap')
+    def heatmap(self, request, **kwargs):
+        event = self.get_object()
+        return Response(event_heatmap(event))
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, **kwargs):
+        """Stream all availability rows as CSV, or NDJSON with ?output=ndjson (?format is taken by DRF)"""
+        event = self.get_object()
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'output': f"Expected one of: {', '.join(EXPORT_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if prefers_async(request):
+            return job_accepted(request, jobs.enqueue('export', request.user, event_id=event.id, output=output))
+        content_type, stream = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(stream(*export_rows(event)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="event-{event.link}.{output}"'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, **kwargs):
+        """Participant, RSVP and per-slot counts from EventStats; cost does not grow with the event"""
+        event = self.get_object()
+        return Response(stats_summary(get_stats(event)))
+
+    @action(
+        detail=True, methods=['post'], url_path='guests/bulk', permission_classes=[IsAuthenticated],
+        parser_classes=[JSONParser, MultiPartParser, FormParser],
+    )
+    def bulk_guests(self, request, **kwargs):
+        """Add guests from a list of names or a CSV upload in one transaction (coordinator only)"""
+        event = self.get_object()
+        if request.user.id != event.coordinator_id:
+            return Response({'detail': 'Only the coordinator can import guests.'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = GuestImportSerializer(data=request.data, context={'event': event})
+        serializer.is_valid(raise_exception=True)
+        if prefers_async(request):
+            job = jobs.enqueue('import_guests', request.user, event_id=event.id, names=serializer.validated_data['names'])
+            return job_accepted(request, job)
+        participants = serializer.save()
+        return Response({'participants': [participant.id for participant in participants]}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], url_path='best-slots')
+    def best_slots(self, request, **kwargs):
+        event = self.get_object()
+        query = BestSlotsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        options = {
+            'duration': query.validated_data.get('duration'),
+            'top': query.validated_data['top'],
+            'required_ids': query.validated_data.get('required', []),
+        }
+
+        try:
+            if event.event_type == 'weekly_match' and hasattr(event, 'weekly_details'):
+                results = best_weekly_slots(event, **options)
+            elif event.event_type == 'date_match' and hasattr(event, 'date_match_details'):
+                results = best_date_ranges(event, **options)
+            else:
+                return Response(
+                    {'detail': 'Best slots are only available for weekly and date match events.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        except SolverError as exc:
+            return Response({'required': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results})
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if request.user != instance.coordinator:
             return Response({'detail': 'You are not allowed to delete this event.'}, status=status.HTTP_403_FORBIDDEN)
+        if prefers_async(request):
+            return job_accepted(request, jobs.enqueue('delete_event', request.user, event_id=instance.id))
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def perform_destroy(self, instance):
+        # Set-based cascade; instance.delete() would load every participant and availability row first
+        delete_events([instance.id])
+
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Status of queued jobs (myapp.jobs), looked up by their link; anyone holding the link can poll it"""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.AllowAny]
+    lookup_field = 'link'
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, **kwargs):
+        """The file an export job wrote"""
+        job = self.get_object()
+        if job.kind != 'export' or job.status != 'succeeded':
+            raise NotFound('This job has no file to download.')
+        path = settings.JOB_RESULTS_DIR / job.result['file']
+        if not path.exists():
+            raise NotFound('The export file has been removed.')
+        return FileResponse(
+            open(path, 'rb'), as_attachment=True, filename=job.result['filename'],
+            content_type=job.result['content_type'],
+        )
+
 class MyEventsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        created_events = Event.objects.filter(coordinator=user)
-        joined_events = Event.objects.filter(participants__user=user).exclude(coordinator=user).distinct()
+        writebuffer.flush()
+        if fastpath.enabled() and request.accepted_renderer.format == 'json':
+            return Response({
+                'created': fastpath.events(Event.objects.filter(coordinator=user)),
+                'joined': fastpath.events(
+                    Event.objects.filter(participants__user=user).exclude(coordinator=user).distinct()
+                ),
+            })
+        created_events = Event.objects.with_related().filter(coordinator=user)
+        joined_events = Event.objects.with_related().filter(participants__user=user).exclude(coordinator=user).distinct()
         return Response({
             'created': EventSerializer(created_events, many=True).data,
             'joined': EventSerializer(joined_events, many=True).data
         })
 
 
+class AtomicWritesMixin:
+    """
+    Run unsafe methods in one transaction, so EventStats deltas commit or roll
+    back with the write. Errors are rolled back too: DRF turns exceptions
+    into 4xx responses inside the block, which would otherwise commit
+    whatever was written before the error.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in permissions.SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic():
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code >= 400:
+                transaction.set_rollback(True)
+            return response
+
+
 # Participant ViewSet
 class ParticipantViewSet(viewsets.ModelViewSet):
-    queryset = Participant.objects.all()
+    queryset = Participant.objects.with_related()
     serializer_class = ParticipantSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = IdCursorPagination
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        pk = kwargs.get('pk')
+        writebuffer.flush(int(pk) if pk and pk.isdigit() else None)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        # Set-based: instance.delete() would run the stats and change-log receivers once per slot
+        delete_participants([instance.id])
+
+    @action(detail=True, methods=['put', 'patch'], permission_classes=[AllowAny])
+    def availability(self, request, **kwargs):
+        """Replace (PUT) or add/remove (PATCH) a participant's weekly slots and dates in one transaction"""
+        participant = generics.get_object_or_404(Participant, pk=kwargs['pk'])
+        replace = request.method == 'PUT'
+        if replace:
+            serializer = AvailabilitySetSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            add, remove = serializer.validated_data, {}
+        else:
+            serializer = AvailabilityDiffSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            add = serializer.validated_data.get('add', {})
+            remove = serializer.validated_data.get('remove', {})
+
+        def weekly_pairs(slots):
+            return [(slot['selected_day'], slot['selected_start_time']) for slot in slots.get('weekly', [])]
+
+        def date_pairs(dates):
+            return [(run['start_date'], run['end_date']) for run in dates.get('date_ranges', [])]
+
+        try:
+            with transaction.atomic():
+                if 'weekly' in add or 'weekly' in remove:
+                    get_weekly_store().update(participant.id, weekly_pairs(add), weekly_pairs(remove), replace=replace)
+                if {'dates', 'date_ranges'} & (set(add) | set(remove)):
+                    get_date_store().update(
+                        participant.id, add.get('dates', []), remove.get('dates', []), replace=replace,
+                        add_ranges=date_pairs(add), remove_ranges=date_pairs(remove),
+                    )
+        except ValueError as exc:
+            return Response({'weekly': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        participant = self.get_queryset().get(pk=participant.pk)
+        return Response(self.get_serializer(participant).data)
+
 
 # Availability ViewSets
-class WeeklyAvailabilityViewSet(viewsets.ModelViewSet):
+class WeeklyAvailabilityViewSet(AtomicWritesMixin, viewsets.ModelViewSet):
+    """Reads and writes go through the configured weekly store (rows or packed bitset)"""
     queryset = WeeklyAvailability.objects.all()
     serializer_class = WeeklyAvailabilitySerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = IdCursorPagination
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # create and remove go through the write buffer themselves
+        if self.action not in ('create', 'remove_availability'):
+            writebuffer.flush()
+
+    def get_serializer_class(self):
+        return weekly_availability_serializer_class()
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        if writebuffer.enabled():
+            # Held by the write buffer, not stored yet
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def list(self, request, *args, **kwargs):
+        store = get_weekly_store()
+        if not store.packed:
+            return super().list(request, *args, **kwargs)
+        # Packed mode pages over masks, so a page holds every slot of up to page_size participants
+        masks = self.paginate_queryset(WeeklyAvailabilityMask.objects.only('participant_id'))
+        slots = store.event_slots([mask.participant_id for mask in masks])
+        return self.get_paginated_response(self.get_serializer(slots, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        store = get_weekly_store()
+        if not store.packed:
+            return super().retrieve(request, *args, **kwargs)
+        slot = store.get(kwargs['pk'])
+        if slot is None:
+            raise NotFound()
+        return Response(self.get_serializer(slot).data)
+
+    def update(self, request, *args, **kwargs):
+        if get_weekly_store().packed:
+            # Packed slots have no row to update; clients add and remove slots instead
+            raise MethodNotAllowed(request.method)
+        return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        store = get_weekly_store()
+        if not store.packed:
+            return super().destroy(request, *args, **kwargs)
+        slot = store.get(kwargs['pk'])
+        if slot is None:
+            raise NotFound()
+        store.remove(slot.participant_id, slot.selected_day, slot.selected_start_time)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['delete'], url_path='remove')
     def remove_availability(self, request):
@@ -175,32 +575,70 @@ class WeeklyAvailabilityViewSet(viewsets.ModelViewSet):
         selected_day = data.get('selected_day')
         selected_start_time = data.get('selected_start_time')
 
-        try:
-            availability = WeeklyAvailability.objects.get(
-                participant_id=participant_id,
-                selected_day=selected_day,
-                selected_start_time=selected_start_time
-            )
-            availability.delete()
+        start_time = parse_time(str(selected_start_time)) if selected_start_time else None
+        if start_time and writebuffer.get_weekly_writer().remove(participant_id, selected_day, start_time):
+            if writebuffer.enabled():
+                return Response({'message': 'Accepted'}, status=status.HTTP_202_ACCEPTED)
             return Response({'message': 'Deleted'}, status=status.HTTP_204_NO_CONTENT)
-        except WeeklyAvailability.DoesNotExist:
-            return Response({'error': 'Availability not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'error': 'Availability not found'}, status=status.HTTP_404_NOT_FOUND)
 
-class DateAvailabilityViewSet(viewsets.ModelViewSet):
+class DateAvailabilityViewSet(AtomicWritesMixin, viewsets.ModelViewSet):
+    """Reads and writes go through the configured date store (rows or date ranges)"""
     queryset = DateAvailability.objects.all()
     serializer_class = DateAvailabilitySerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = IdCursorPagination
+
+    def get_serializer_class(self):
+        return date_availability_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        store = get_date_store()
+        if not store.packed:
+            return super().list(request, *args, **kwargs)
+        # Range mode pages over participants with runs, so a page holds every date of up to page_size participants
+        participants = self.paginate_queryset(
+            Participant.objects.filter(date_ranges__isnull=False).distinct().only('id')
+        )
+        dates = store.event_dates([participant.id for participant in participants])
+        return self.get_paginated_response(self.get_serializer(dates, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        store = get_date_store()
+        if not store.packed:
+            return super().retrieve(request, *args, **kwargs)
+        slot = store.get(kwargs['pk'])
+        if slot is None:
+            raise NotFound()
+        return Response(self.get_serializer(slot).data)
+
+    def update(self, request, *args, **kwargs):
+        if get_date_store().packed:
+            # Dates inside a run have no row to update; clients add and remove dates instead
+            raise MethodNotAllowed(request.method)
+        return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        store = get_date_store()
+        if not store.packed:
+            return super().destroy(request, *args, **kwargs)
+        slot = store.get(kwargs['pk'])
+        if slot is None:
+            raise NotFound()
+        store.remove(slot.participant_id, slot.selected_date)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['post'], url_path='remove')
     def delete(self, request):
         participant_id = request.data.get('participant')
-        DateAvailability.objects.filter(participant_id=participant_id).delete()
+        get_date_store().clear(participant_id)
         return Response({'status': 'deleted'})
 
-class RsvpStatusViewSet(viewsets.ModelViewSet):
+class RsvpStatusViewSet(AtomicWritesMixin, viewsets.ModelViewSet):
     queryset = RsvpStatus.objects.all()
     serializer_class = RsvpStatusSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = IdCursorPagination
 
     def create(self, request, *args, **kwargs):
         participant = request.data.get('participant')
@@ -208,9 +646,9 @@ class RsvpStatusViewSet(viewsets.ModelViewSet):
 
         try:
             instance = RsvpStatus.objects.get(participant=participant)
-            instance.status = status_value
-            instance.save()
-            serializer = self.get_serializer(instance)
+            serializer = self.get_serializer(instance, data={'status': status_value}, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         except RsvpStatus.DoesNotExist:
             return super().create(request, *args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Write-behind buffer for single weekly slot toggles.
+
+Dragging across the weekly grid sends a burst of create / remove calls for one
+participant, many of which cancel out. With WEEKLY_WRITE_BUFFER_MS > 0 and the
+bitset store, WeeklyAvailabilityViewSet hands those toggles to this buffer
+instead of the store: each participant's mask is read once, toggles are
+applied to it in memory (so duplicate and missing slots are still reported),
+and the net added / removed slots are written with one store.update() when the
+participant has been idle for the window, after WEEKLY_WRITE_BUFFER_MAX_OPS
+toggles, or at interpreter exit. A burst that ends where it started writes
+nothing. Row storage stays write-through, since its responses carry the new
+row's id.
+
+A toggle only reaches the buffer when the request's transaction commits
+(transaction.on_commit), so a rolled-back request leaves no pending change.
+Flushes take the pending entries under the buffer's lock and write them after
+releasing it; a participant toggling while their previous flush is still
+being written builds on that flush's result, and their next write waits for
+it. Because buffered toggles are not yet stored, the views answer them with
+202 Accepted rather than 201 / 204.
+
+The buffer lives in one process, like InProcessBroker: read-your-writes holds
+only within that process (requests that could read a participant's slots
+call flush() first, see the views), and toggles still pending when the
+process is killed without a graceful shutdown are lost.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import bitsets
+from .cache import participant_event_link
+from .storage import get_weekly_store
+
+logger = logging.getLogger('myapp.writebuffer')
+
+
+class _Pending:
+    def __init__(self, link, slot_minutes, bits, after=None):
+        self.link = link
+        self.slot_minutes = slot_minutes
+        self.loaded = bits
+        self.bits = bits
+        self.ops = 0
+        self.timer = None
+        # The flush still being written when this entry was loaded; this entry's write has to follow it
+        self.after = after
+        self.written = threading.Event()
+
+
+class WeeklyWriteBuffer:
+    def __init__(self):
+        self._pending = {}
+        # Entries popped by a flush and not written yet, so new toggles start from their bits, not the stale mask
+        self._writing = {}
+        # Guards the two dicts; never held during a database write
+        self._lock = threading.RLock()
+
+    def _entry(self, participant_id):
+        entry = self._pending.get(participant_id)
+        if entry is None:
+            writing = self._writing.get(participant_id)
+            if writing is not None:
+                entry = _Pending(writing.link, writing.slot_minutes, writing.bits, after=writing)
+            else:
+                link = participant_event_link(participant_id)
+                if link is None:
+                    raise ValueError(f'Participant {participant_id} does not exist.')
+                store = get_weekly_store()
+                mask = store.masks([participant_id]).values_list('slot_minutes', 'bits').first()
+                slot_minutes, bits = mask or (store.slot_minutes, b'')
+                entry = _Pending(link, slot_minutes, bitsets.from_bytes(bits))
+            self._pending[participant_id] = entry
+        return entry
+
+    def _toggle(self, participant_id, day, start_time, selected):
+        """Returns whether the slot changes; raises ValueError when the time is not aligned to the slot size"""
+        with self._lock:
+            entry = self._entry(participant_id)
+            bit = 1 << bitsets.slot_index(day, start_time, entry.slot_minutes)
+            changed = bool(entry.bits & bit) != selected
+        if changed:
+            transaction.on_commit(lambda: self._apply(participant_id, bit, selected))
+        return changed
+
+    def _apply(self, participant_id, bit, selected):
+        """The committed half of _toggle"""
+        with self._lock:
+            entry = self._entry(participant_id)
+            bits = entry.bits | bit if selected else entry.bits & ~bit
+            if bits != entry.bits:
+                entry.bits = bits
+                entry.ops += 1
+            full = entry.ops >= getattr(settings, 'WEEKLY_WRITE_BUFFER_MAX_OPS', 64)
+            if not full:
+                self._schedule(participant_id, entry)
+        if full:
+            self.flush(participant_id)
+
+    def _schedule(self, participant_id, entry):
+        if entry.timer is not None:
+            entry.timer.cancel()
+        entry.timer = threading.Timer(
+            getattr(settings, 'WEEKLY_WRITE_BUFFER_MS', 0) / 1000, self._flush_idle, args=[participant_id]
+        )
+        entry.timer.daemon = True
+        entry.timer.start()
+
+    def _flush_idle(self, participant_id):
+        try:
+            self.flush(participant_id)
+        except Exception:
+            logger.exception('Flushing buffered weekly slots of participant %s failed', participant_id)
+        finally:
+            # Timer threads are not request threads; nothing else closes their connections
+            connections.close_all()
+
+    def add(self, participant, day, start_time):
+        """Same contract as the store's add: (slot, created)"""
+        participant_id = getattr(participant, 'pk', participant)
+        created = self._toggle(participant_id, day, start_time, True)
+        return bitsets.WeeklySlot(bitsets.slot_id(participant_id, day, start_time), participant_id, day, start_time), created
+
+    def remove(self, participant_id, day, start_time):
+        try:
+            return self._toggle(int(participant_id), day, start_time, False)
+        except (TypeError, ValueError):
+            return False
+
+    def flush(self, participant_id=None, event_link=None):
+        """
+        Write the pending toggles of one participant, one event's participants,
+        or everyone; returns once those participants' writes, including ones
+        another thread had already started, are stored.
+        """
+        if not (self._pending or self._writing):
+            return
+        with self._lock:
+            in_flight = [self._writing[pk] for pk in self._select(self._writing, participant_id, event_link)]
+            entries = []
+            for pk in self._select(self._pending, participant_id, event_link):
+                entry = self._pending.pop(pk)
+                if entry.timer is not None:
+                    entry.timer.cancel()
+                if entry.bits != entry.loaded:
+                    self._writing[pk] = entry
+                    entries.append((pk, entry))
+        for pk, entry in entries:
+            try:
+                self._write(pk, entry)
+            finally:
+                entry.written.set()
+                with self._lock:
+                    if self._writing.get(pk) is entry:
+                        del self._writing[pk]
+        for entry in in_flight:
+            entry.written.wait()
+
+    @staticmethod
+    def _select(entries, participant_id, event_link):
+        if participant_id is not None:
+            return [participant_id] if participant_id in entries else []
+        if event_link is not None:
+            return [pk for pk, entry in entries.items() if str(entry.link) == str(event_link)]
+        return list(entries)
+
+    def _write(self, participant_id, entry):
+        if entry.after is not None:
+            entry.after.written.wait()
+            entry.after = None
+        added, removed = entry.bits & ~entry.loaded, entry.loaded & ~entry.bits
+        with transaction.atomic():
+            get_weekly_store().update(
+                participant_id,
+                [slot[2:] for slot in bitsets.decode(participant_id, added, entry.slot_minutes)],
+                [slot[2:] for slot in bitsets.decode(participant_id, removed, entry.slot_minutes)],
+            )
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_buffer():
+    """The process-wide buffer; created on first use and flushed at exit"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WeeklyWriteBuffer()
+            atexit.register(_buffer.flush)
+    return _buffer
+
+
+def enabled():
+    return getattr(settings, 'WEEKLY_WRITE_BUFFER_MS', 0) > 0 and get_weekly_store().packed
+
+
+def get_weekly_writer():
+    """Where single-slot toggles go: the write buffer when enabled, otherwise the weekly store itself"""
+    return get_write_buffer() if enabled() else get_weekly_store()
+
+
+def pending():
+    return _buffer is not None and bool(_buffer._pending or _buffer._writing)
+
+
+def flush(participant_id=None, event_link=None):
+    """Apply buffered toggles a read is about to see; a no-op when nothing is pending"""
+    if _buffer is not None:
+        _buffer.flush(participant_id, event_link)
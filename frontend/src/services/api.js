@@ -45,6 +45,11 @@ export default {
   getMyEvents() {
     return api.get('my-events/');
   },
+
+  // Summary rows (name, type, dates, counts) for the event list page
+  getMyEventsDashboard() {
+    return api.get('my-events/dashboard/');
+  },
   updateEvent(link, data) {
     return api.patch(`events/${link}/`, data);
   },
@@ -96,6 +101,9 @@ export default {
         data: payload
     });
   },  
+  replaceAvailability(participantID, payload) {
+    return api.put(`participants/${participantID}/availability/`, payload);
+  },
   addRsvpStatus(payload) {
     return api.post('rsvp-statuses/', payload);
   },